@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""Catalogue load time and resident memory: pd.read_csv and InMemoryCatalogue vs. the column store.
+
+Each mode runs in a fresh subprocess so its RSS is measured in isolation
+(VmRSS after loading minus VmRSS after imports). The column store mode also
+does one ID lookup and one name search, so the pages those touch are counted.
+
+Usage: python benchmarks/bench_catalogue_store.py [--rows 1000000]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import pandas as pd
+
+from catalogue import InMemoryCatalogue
+from catalogue_gen import make_catalogue
+from catalogue_store import ColumnarCatalogue, write_store
+
+MODES = ['read_csv', 'read_csv+index', 'column_store']
+
+def rss_mb():
+    with open('/proc/self/status') as status:
+        for line in status:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) / 1024
+    return float('nan')
+
+def measure(mode, csv_path, store_path, probe_id):
+    """Load the catalogue one way; returns (seconds, RSS growth in MB)"""
+    baseline = rss_mb()
+    start = time.perf_counter()
+    if mode == 'read_csv':
+        catalogue = pd.read_csv(csv_path)
+    elif mode == 'read_csv+index':
+        catalogue = InMemoryCatalogue(pd.read_csv(csv_path))
+        catalogue.get(probe_id)
+    else:
+        catalogue = ColumnarCatalogue(store_path)
+        catalogue.get(probe_id)['price']
+        catalogue.search_names('marina heights 12', k=5)
+    elapsed = time.perf_counter() - start
+    return elapsed, rss_mb() - baseline
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--measure', choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument('--csv', help=argparse.SUPPRESS)
+    parser.add_argument('--store', help=argparse.SUPPRESS)
+    parser.add_argument('--probe', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        seconds, rss = measure(args.measure, args.csv, args.store, args.probe)
+        print(json.dumps({'seconds': seconds, 'rss_mb': rss}))
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        csv_path = os.path.join(directory, 'properties.csv')
+        store_path = os.path.join(directory, 'properties.colstore')
+        df = make_catalogue(args.rows)
+        df.to_csv(csv_path, index=False)
+        probe = df['listing_id'].iloc[len(df) // 2]
+        del df
+        start = time.perf_counter()
+        write_store(pd.read_csv(csv_path), store_path)
+        convert = time.perf_counter() - start
+        print(f"{args.rows:,} rows: CSV {os.path.getsize(csv_path) / 1e6:.0f} MB, "
+              f"column store {os.path.getsize(store_path) / 1e6:.0f} MB (one-off conversion {convert:.1f} s)")
+        print(f"{'mode':<16} {'load (s)':>9} {'RSS growth (MB)':>16}")
+        for mode in MODES:
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '--measure', mode,
+                 '--csv', csv_path, '--store', store_path, '--probe', probe],
+                check=True, capture_output=True, text=True
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            print(f"{mode:<16} {result['seconds']:>9.2f} {result['rss_mb']:>16.0f}")
+
+if __name__ == "__main__":
+    main()
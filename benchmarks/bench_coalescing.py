@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""Upstream LLM calls and polish latency under a burst of concurrent requests for popular listings.
+
+Concurrent callers polish listing templates drawn with Zipf-like popularity
+(a few listings get most of the traffic) through one gateway against the fake
+LLM, with the response cache off so only in-flight sharing is measured. "off"
+sends every request upstream, "coalesce" lets identical requests share one
+in-flight call, and "batch" also packs distinct requests arriving within
+--window-ms of each other into one upstream request.
+
+Usage: python benchmarks/bench_coalescing.py [--requests 500] [--callers 100] [--listings 50] [--llm-delay 0.3]
+       [--max-concurrency 8] [--window-ms 20] [--max-batch 8]
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+os.environ.setdefault('GROQ_API_KEY', 'benchmark')
+
+from catalogue_gen import make_catalogue
+from fake_llm import FakeGroqClient
+from helpers import PropertyHelper
+from llm_cache import ResponseCache
+from llm_gateway import LLMGateway
+from metrics import REGISTRY
+
+def upstream_counters():
+    counters = {}
+    for (name, _), value in REGISTRY.counters().items():
+        if name.startswith('llm_'):
+            counters[name] = counters.get(name, 0) + value
+    return counters
+
+async def burst(helper, templates, callers):
+    """Run every template through apolish_with_llm with at most callers in flight; per-request seconds"""
+    queue = list(templates)
+    latencies = []
+
+    async def caller():
+        while queue:
+            text = queue.pop()
+            start = time.perf_counter()
+            await helper.apolish_with_llm(text)
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(caller() for _ in range(callers)))
+    return latencies
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--callers', type=int, default=100, help="concurrent requests")
+    parser.add_argument('--listings', type=int, default=50, help="distinct listings asked about")
+    parser.add_argument('--llm-delay', type=float, default=0.3, help="fake LLM seconds per reply")
+    parser.add_argument('--max-concurrency', type=int, default=8, help="gateway concurrency limit")
+    parser.add_argument('--window-ms', type=float, default=20)
+    parser.add_argument('--max-batch', type=int, default=8)
+    args = parser.parse_args()
+
+    catalogue = make_catalogue(args.listings, seed=7)
+    rng = random.Random(7)
+    weights = [1 / rank for rank in range(1, args.listings + 1)]
+    rows = rng.choices(range(args.listings), weights=weights, k=args.requests)
+
+    helper = PropertyHelper(cache=ResponseCache(max_entries=0))
+    templates = [helper.render_template(catalogue.iloc[row]) for row in rows]
+    print(f"{args.requests} requests from {args.callers} concurrent callers over {args.listings} listings, "
+          f"fake LLM {args.llm_delay * 1e3:.0f} ms, gateway concurrency {args.max_concurrency}")
+    print(f"{'mode':<9} {'upstream':>9} {'coalesced':>10} {'batched':>8} {'saved':>6} "
+          f"{'p50 (ms)':>9} {'p99 (ms)':>9} {'wall (s)':>9}")
+    for mode in ('off', 'coalesce', 'batch'):
+        helper.llm = LLMGateway(client=FakeGroqClient(first_token_delay=args.llm_delay),
+                                max_concurrency=args.max_concurrency, timeout=600,
+                                coalesce=mode != 'off',
+                                batch_window=args.window_ms / 1000 if mode == 'batch' else 0,
+                                max_batch=args.max_batch)
+        before = upstream_counters()
+        start = time.perf_counter()
+        latencies = asyncio.run(burst(helper, templates, args.callers))
+        wall = time.perf_counter() - start
+        after = upstream_counters()
+        delta = {name: after.get(name, 0) - before.get(name, 0) for name in after}
+        quantiles = statistics.quantiles(latencies, n=100)
+        print(f"{mode:<9} {delta.get('llm_upstream_calls', 0):>9} {delta.get('llm_coalesced', 0):>10} "
+              f"{delta.get('llm_batched', 0):>8} {delta.get('llm_calls_saved', 0):>6} "
+              f"{statistics.median(latencies) * 1e3:>9.0f} {quantiles[98] * 1e3:>9.0f} {wall:>9.1f}")
+
+if __name__ == "__main__":
+    main()
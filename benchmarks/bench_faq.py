@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""FAQ retrieval latency and recall on a few thousand synthetic FAQs.
+
+Each FAQ is indexed from a handful of phrasings; recall is measured on held-out
+paraphrases (with and without typos) that never appear in the index. The old
+literal-key lookup is the baseline.
+
+Usage: python benchmarks/bench_faq.py [--faqs 3000] [--model all-MiniLM-L6-v2]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from faq_retrieval import FAQRetriever
+
+SUBJECTS = ['home loan', 'stamp duty', 'property tax', 'rental agreement', 'maintenance charges', 'security deposit',
+            'registration fee', 'brokerage', 'site visit', 'possession date', 'parking allotment', 'pet policy',
+            'power backup', 'water supply', 'floor plan', 'carpet area', 'resale value', 'lease renewal',
+            'tenant verification', 'society rules', 'power of attorney', 'title deed', 'encumbrance certificate',
+            'building approval', 'occupancy certificate', 'gst on property', 'capital gains', 'nri purchase',
+            'joint ownership', 'loan prepayment']
+CITIES = ['Mumbai', 'Dubai', 'Pune', 'Bangalore', 'Chennai', 'Hyderabad', 'Jaipur', 'Kolkata', 'Noida', 'Gurgaon',
+          'Delhi', 'Goa', 'Kochi', 'Indore', 'Lucknow', 'Nagpur', 'Surat', 'Mysore', 'Bhopal', 'Patna']
+ASPECTS = ['cost', 'process', 'documents', 'timeline', 'eligibility']
+INDEXED = ["What is the {subject} {aspect} in {city}?", "{subject} {aspect} for {city} properties",
+           "How does {subject} {aspect} work in {city}?"]
+HELD_OUT = ["Tell me the {aspect} of {subject}, {city}", "{city}: {subject} {aspect}?"]
+
+def make_faqs(count):
+    faqs = []
+    for subject in SUBJECTS:
+        for city in CITIES:
+            for aspect in ASPECTS:
+                if len(faqs) == count:
+                    return faqs
+                slots = {'subject': subject, 'city': city, 'aspect': aspect}
+                faqs.append({
+                    'key': f"{subject} {aspect} {city.lower()}",
+                    'answer': f"{subject} {aspect} in {city}: ...",
+                    'questions': [template.format(**slots) for template in INDEXED],
+                    'held_out': [template.format(**slots) for template in HELD_OUT],
+                })
+    return faqs
+
+def add_typo(text, rng):
+    position = int(rng.integers(1, len(text) - 1))
+    return text[:position] + text[position + 1:]
+
+def literal_lookup(faqs, question):
+    """The old FAQHelper: first key contained in the question"""
+    question_lower = question.lower()
+    return next((faq for faq in faqs if faq['key'] in question_lower), None)
+
+def evaluate(name, search, cases):
+    hits1 = hits3 = 0
+    latencies = []
+    for expected, question in cases:
+        start = time.perf_counter()
+        results = search(question)
+        latencies.append(time.perf_counter() - start)
+        keys = [faq['key'] for faq in results]
+        hits1 += keys[:1] == [expected]
+        hits3 += expected in keys[:3]
+    latencies = np.array(latencies) * 1e3
+    print(f"{name:<22} {hits1 / len(cases):>9.1%} {hits3 / len(cases):>9.1%} "
+          f"{np.percentile(latencies, 50):>9.3f} {np.percentile(latencies, 95):>9.3f}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--faqs', type=int, default=3000)
+    parser.add_argument('--model', help="also benchmark a sentence-transformers model")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    faqs = make_faqs(args.faqs)
+    indexed = [{key: value for key, value in faq.items() if key != 'held_out'} for faq in faqs]
+    cases = [(faq['key'], question) for faq in faqs for question in faq['held_out']]
+    cases += [(key, add_typo(question, rng)) for key, question in cases]
+
+    print(f"{len(faqs)} FAQs, {len(cases)} held-out questions")
+    with tempfile.TemporaryDirectory() as tmp:
+        for model in [None] + ([args.model] if args.model else []):
+            index_path = os.path.join(tmp, f"faq_index_{model or 'tfidf'}.npz")
+            start = time.perf_counter()
+            retriever = FAQRetriever.build(indexed, index_path, model)
+            build = time.perf_counter() - start
+            start = time.perf_counter()
+            FAQRetriever.build(indexed, index_path, model)
+            load = time.perf_counter() - start
+            print(f"{retriever.index.name}: encode+save {build:.2f} s, load persisted {load:.2f} s")
+
+            print(f"{'':<22} {'recall@1':>9} {'recall@3':>9} {'p50 (ms)':>9} {'p95 (ms)':>9}")
+            if model is None:
+                evaluate('literal keys', lambda q: [r for r in [literal_lookup(indexed, q)] if r], cases)
+            evaluate(retriever.index.name, lambda q: [faq for faq, _ in retriever.search(q, k=3)], cases)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""Streamlit rerun time vs. conversation length: rendering the whole history vs. the last window of messages.
+
+Each case opens src/app.py in AppTest with a logged-in session whose history
+already holds the given number of messages, then times plain reruns (what
+every new message or widget click costs before the turn itself). AppTest
+polls for the end of a run every 100 ms, so the script run is timed from the
+runner's start/stop events. "full" is the previous behaviour (every message,
+unbounded history); "windowed" renders CHAT_HISTORY_WINDOW messages from a
+ring buffer of CHAT_HISTORY_SIZE.
+
+Usage: python benchmarks/bench_history.py [--messages 10 1000 10000] [--window 50] [--history-size 200]
+       [--reruns 5]
+"""
+import argparse
+import gc
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.append(os.path.join(ROOT, 'src'))
+os.environ.setdefault('GROQ_API_KEY', 'benchmark')
+
+from chat_engine import ChatSession
+from chat_history import ChatHistory
+
+USER_INFO = {'name': 'Load Test', 'email': 'load@example.com', 'phone': '0'}
+REPLY = ("Here are the details: Marina Studio — Studio (420 sqft) in Dubai. Price: 95,000 USD. "
+         "Status: Available. Contact: agent3@zorever.com")
+
+def make_history(messages, history_size):
+    history = ChatHistory(history_size)
+    for i in range(messages):
+        history.append({'role': 'user' if i % 2 == 0 else 'assistant',
+                        'content': f"What is the price of P{i % 12 + 1:03d}?" if i % 2 == 0 else REPLY})
+    return history
+
+def find_session(session_id):
+    """The app's ChatSession object, which lives in the engine's session store inside the app's cache"""
+    return next(obj for obj in gc.get_objects() if isinstance(obj, ChatSession) and obj.session_id == session_id)
+
+def install_run_timer():
+    """Record the duration of every script run AppTest starts from now on"""
+    from streamlit.runtime.scriptrunner import ScriptRunnerEvent
+    from streamlit.testing.v1 import local_script_runner
+    runs = []
+
+    def record(sender, event, **kwargs):
+        if event == ScriptRunnerEvent.SCRIPT_STARTED:
+            runs.append(time.perf_counter())
+        elif event == ScriptRunnerEvent.SCRIPT_STOPPED_WITH_SUCCESS:
+            runs[-1] = time.perf_counter() - runs[-1]
+
+    runner_init = local_script_runner.LocalScriptRunner.__init__
+
+    def timed_init(self, *args, **kwargs):
+        runner_init(self, *args, **kwargs)
+        self.on_event.connect(record, weak=False)
+
+    local_script_runner.LocalScriptRunner.__init__ = timed_init
+    return runs
+
+def measure(runs, messages, window, history_size, reruns):
+    """Median rerun seconds and the number of messages held, for one history length"""
+    from streamlit.testing.v1 import AppTest
+    os.environ['CHAT_HISTORY_WINDOW'] = str(window)
+    at = AppTest.from_file(os.path.join(ROOT, 'src', 'app.py'), default_timeout=120)
+    at.session_state.user_logged_in = True
+    at.session_state.user_info = USER_INFO
+    at.run()  # first run: waits for the helpers and starts a session
+    session = find_session(at.session_state.session_id)
+    session.messages = make_history(messages, history_size)
+    del runs[:]
+    for _ in range(reruns):
+        at.run()
+    return statistics.median(runs), len(session.messages)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--messages', type=int, nargs='+', default=[10, 1000, 10000])
+    parser.add_argument('--window', type=int, default=50, help="messages rendered per rerun in windowed mode")
+    parser.add_argument('--history-size', type=int, default=200, help="messages kept in memory in windowed mode")
+    parser.add_argument('--reruns', type=int, default=5)
+    args = parser.parse_args()
+
+    runs = install_run_timer()
+    print(f"{'messages':>9} {'mode':<9} {'held':>7} {'rerun (ms)':>11}")
+    for messages in args.messages:
+        for mode, window, history_size in (('full', 0, 0), ('windowed', args.window, args.history_size)):
+            seconds, held = measure(runs, messages, window, history_size, args.reruns)
+            print(f"{messages:>9,} {mode:<9} {held:>7,} {seconds * 1e3:>11.1f}")
+
+if __name__ == "__main__":
+    main()
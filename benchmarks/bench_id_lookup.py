@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""Compare the listing_id hash index against the old boolean-mask scan.
+
+Usage: python benchmarks/bench_id_lookup.py [--sizes 1000 100000 1000000]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+os.environ.setdefault('GROQ_API_KEY', 'benchmark')
+
+from catalogue_gen import make_catalogue
+from helpers import PropertyHelper
+
+def mask_scan(properties_df, listing_id):
+    """The pre-index lookup: full boolean mask over listing_id"""
+    property_data = properties_df[properties_df['listing_id'] == listing_id]
+    return property_data.iloc[0] if not property_data.empty else None
+
+def time_lookups(lookup, ids):
+    start = time.perf_counter()
+    for listing_id in ids:
+        lookup(listing_id)
+    return (time.perf_counter() - start) / len(ids)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 100000, 1000000])
+    parser.add_argument('--lookups', type=int, default=200)
+    args = parser.parse_args()
+
+    helper = PropertyHelper()
+    rng = np.random.default_rng(0)
+    print(f"{'rows':>10} {'build (s)':>10} {'mask scan (us)':>15} {'index (us)':>11} {'speedup':>9}")
+    for size in args.sizes:
+        df = make_catalogue(size)
+        start = time.perf_counter()
+        helper.set_properties(df)
+        build = time.perf_counter() - start
+
+        ids = list(df['listing_id'].iloc[rng.integers(0, size, args.lookups)])
+        # The mask scan is O(N); cap its sample so 1M rows finishes in seconds
+        scan = time_lookups(lambda i: mask_scan(df, i), ids[:max(5, args.lookups // 10)])
+        indexed = time_lookups(lambda i: helper.id_index.get(i), ids)
+        print(f"{size:>10} {build:>10.2f} {scan * 1e6:>15.1f} {indexed * 1e6:>11.3f} {scan / indexed:>8.0f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""Intent/entity extraction: keyword loops + per-turn regexes vs. the single-pass extractor.
+
+Runs both over the labelled messages in data/intent_labels.csv and reports
+per-message latency and intent accuracy.
+
+Usage: python benchmarks/bench_intent.py [--repeat 200]
+"""
+import argparse
+import csv
+import os
+import re
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.append(os.path.join(ROOT, 'src'))
+os.environ.setdefault('GROQ_API_KEY', 'benchmark')
+
+from helpers import PropertyHelper
+from intent import IntentExtractor
+
+def legacy_detect_intent(user_input):
+    """detect_intent as it was: sequential keyword scans"""
+    user_input_lower = user_input.lower()
+    booking_keywords = ['book visit', 'schedule visit', 'visit booking', 'book a visit', 'schedule a visit']
+    if any(keyword in user_input_lower for keyword in booking_keywords):
+        return 'booking'
+    if 'P0' in user_input.upper() or any(word in user_input_lower for word in ['apartment', 'villa', 'studio', 'office', 'cottage', 'house']):
+        return 'property_query'
+    return 'faq'
+
+def legacy_extract(prompt):
+    """The old turn: detect_intent, then the ID regex and four name patterns from app.py"""
+    intent = legacy_detect_intent(prompt)
+    ids, names = [], []
+    if intent == 'property_query':
+        ids = re.findall(r'P\d{3}', prompt.upper())
+        for pattern in [r'price of (.+?)(?:\?|$)', r'details for (.+?)(?:\?|$)',
+                        r'information about (.+?)(?:\?|$)', r'tell me about (.+?)(?:\?|$)']:
+            names.extend(match.strip() for match in re.findall(pattern, prompt, re.IGNORECASE))
+    return intent, ids, names
+
+def separate_scans(extractor):
+    """The same token patterns, each compiled on its own and run as its own scan"""
+    patterns = [re.compile(pattern) for _, pattern in extractor.tokens]
+    def scan(text):
+        lowered = text.lower()
+        return [match for pattern in patterns for match in pattern.finditer(lowered)]
+    return scan
+
+def timed(function, texts, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for text in texts:
+            function(text)
+    return (time.perf_counter() - start) / (repeat * len(texts))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    with open(os.path.join(ROOT, 'data', 'intent_labels.csv'), newline='', encoding='utf-8') as file:
+        rows = list(csv.DictReader(file))
+    texts = [row['text'] for row in rows]
+    extractor = IntentExtractor(PropertyHelper().catalogue.search_vocabulary())
+
+    legacy_correct = sum(legacy_extract(row['text'])[0] == row['intent'] for row in rows)
+    new_correct = sum(extractor.extract(row['text']).intent == row['intent'] for row in rows)
+    legacy_time = timed(legacy_extract, texts, args.repeat)
+    new_time = timed(extractor.extract, texts, args.repeat)
+    scans_time = timed(separate_scans(extractor), texts, args.repeat)
+
+    print(f"{len(rows)} labelled messages")
+    print(f"{'':<22} {'us/message':>11} {'intent accuracy':>16}")
+    print(f"{'legacy (intent only)':<22} {legacy_time * 1e6:>11.1f} {legacy_correct / len(rows):>16.1%}")
+    print(f"{'one scan per pattern':<22} {scans_time * 1e6:>11.1f} {'(tokens only)':>16}")
+    print(f"{'single-pass extractor':<22} {new_time * 1e6:>11.1f} {new_correct / len(rows):>16.1%}")
+    print("(the extractor also returns cities, types, availability, price/area/room constraints and sort order)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""Per-call cost of the stage timers and counters, enabled vs. disabled, next to a listing_id lookup.
+
+Usage: python benchmarks/bench_metrics.py [--calls 200000]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+os.environ.setdefault('GROQ_API_KEY', 'benchmark')
+
+from metrics import Metrics
+
+def per_call(function, calls):
+    start = time.perf_counter()
+    for _ in range(calls):
+        function()
+    return (time.perf_counter() - start) / calls * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--calls', type=int, default=200000)
+    args = parser.parse_args()
+
+    from helpers import PropertyHelper
+    from write_behind import WriteBehindQueue
+    helper = PropertyHelper(write_queue=WriteBehindQueue())
+    print(f"{'':<28} {'enabled (us)':>13} {'disabled (us)':>14}")
+    for label, make_call in [
+        ('timer()', lambda metrics: lambda: metrics.timer('lookup_id').__enter__().__exit__()),
+        ('count()', lambda metrics: lambda: metrics.count('turns', intent='faq')),
+    ]:
+        enabled = per_call(make_call(Metrics()), args.calls)
+        disabled = per_call(make_call(Metrics(enabled=False)), args.calls)
+        print(f"{label:<28} {enabled:>13.2f} {disabled:>14.2f}")
+    lookup = per_call(lambda: helper.get_property_by_id('P003'), args.calls // 10)
+    print(f"{'get_property_by_id (timed)':<28} {lookup:>13.2f}")
+
+if __name__ == "__main__":
+    main()
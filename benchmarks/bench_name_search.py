@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""Time the trigram NameIndex against the old iterrows() name loop.
+
+Usage: python benchmarks/bench_name_search.py [--sizes 1000 100000 1000000]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from catalogue_gen import make_catalogue
+from name_index import NameIndex
+
+def iterrows_lookup(properties_df, property_name):
+    """The pre-index lookup: lowercase every name on every call"""
+    property_name = property_name.lower()
+    for _, row in properties_df.iterrows():
+        if property_name in row['property_name'].lower():
+            return row
+    return None
+
+def median_us(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return samples[len(samples) // 2] * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 100000, 1000000])
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        df = make_catalogue(size)
+        start = time.perf_counter()
+        index = NameIndex(df['property_name'].tolist(), df['listing_id'].tolist())
+        print(f"\n{size} rows: index built in {time.perf_counter() - start:.2f}s")
+
+        last_name = df['property_name'].iloc[-1]
+        queries = {
+            'exact': last_name,
+            'prefix': last_name[:len(last_name) - 2],
+            'substring': last_name.split(' ', 1)[1],
+            'typo': last_name.replace('a', 'e', 1),
+            'miss': 'Nonexistent Castle',
+        }
+        for label, query in queries.items():
+            latency = median_us(lambda: index.search(query, k=5), args.repeat)
+            print(f"  {label:<10} top-5 search: {latency:>10.1f} us  ({query!r})")
+
+        compat = median_us(lambda: index.first_match(last_name), args.repeat)
+        print(f"  {'compat':<10} first match:  {compat:>10.1f} us")
+        if size <= 100000:
+            # Worst case for the old loop: the match is the last row
+            old = median_us(lambda: iterrows_lookup(df, last_name), 3)
+            print(f"  {'iterrows':<10} first match:  {old:>10.1f} us")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""Catalogue reload cost: incremental row delta vs. rebuilding every index.
+
+Usage: python benchmarks/bench_reload.py [--sizes 10000 100000 1000000] [--edits 100]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from catalogue import InMemoryCatalogue
+from catalogue_gen import make_catalogue
+
+def edit_catalogue(df, edits, rng):
+    """Reprice edits rows, drop edits rows and append edits new ones"""
+    df = df.copy()
+    positions = rng.choice(len(df), size=2 * edits, replace=False)
+    df.iloc[positions[:edits], df.columns.get_loc('price')] += 1000
+    df = df.drop(df.index[positions[edits:]])
+    added = df.iloc[:edits].copy()
+    added['listing_id'] = [f"N{i:07d}" for i in range(edits)]
+    added['property_name'] = [f"Fresh Listing {i}" for i in range(edits)]
+    return pd.concat([df, added], ignore_index=True)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--edits', type=int, default=100)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'rows':>10} {'full rebuild (ms)':>18} {'incremental (ms)':>17} {'speedup':>9}")
+    for size in args.sizes:
+        df = make_catalogue(size)
+        catalogue = InMemoryCatalogue(df)
+        edited = edit_catalogue(df, args.edits, rng)
+
+        start = time.perf_counter()
+        InMemoryCatalogue(edited)
+        full = time.perf_counter() - start
+
+        start = time.perf_counter()
+        _, delta = catalogue.updated(edited)
+        incremental = time.perf_counter() - start
+        assert len(delta['added']) == len(delta['changed']) == len(delta['removed']) == args.edits
+        print(f"{size:>10} {full * 1e3:>18.1f} {incremental * 1e3:>17.1f} {full / incremental:>8.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""Turn routing cost (handler selection plus the handler, no LLM) as plugin intents are registered.
+
+Every plugin adds one intent pattern to the single extraction pass and one
+entry to the handler tables, so selecting a handler stays one regex pass and
+one dict lookup however many are registered. Each message of a mix of ID,
+name, search, FAQ and plugin queries is routed with the built-in handlers
+plus 0-N synthetic plugins; the last table is the per-handler timing the
+registry records.
+
+Usage: python benchmarks/bench_routing.py [--plugins 0 1 10 50] [--rounds 200]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+os.environ.setdefault('GROQ_API_KEY', 'benchmark')
+
+from chat_engine import ChatEngine, default_handlers
+from handlers import reply
+from helpers import FAQHelper, PropertyHelper
+from llm_cache import ResponseCache
+from metrics import REGISTRY
+from session_store import MemorySessionStore
+from write_behind import WriteBehindQueue
+
+MESSAGES = [
+    "What is the price of P001?",
+    "Tell me about Marina Studio",
+    "2BHK apartments in Dubai under 300k",
+    "What are your working hours?",
+    "Can you help me sell my house?",
+    "compare P001 and P003",
+]
+
+def synthetic_plugin(registry, i):
+    @registry.register(f"plugin{i}", requires=['listing_ids'], pattern=rf"\bkeyword{i}\b")
+    def handle(engine, session, prompt, extraction):
+        return reply(f"plugin {i}", f"plugin{i}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--plugins', type=int, nargs='+', default=[0, 1, 10, 50])
+    parser.add_argument('--rounds', type=int, default=200)
+    args = parser.parse_args()
+
+    helper = PropertyHelper(cache=ResponseCache(max_entries=0), write_queue=WriteBehindQueue())
+    faq_helper = FAQHelper()
+    print(f"{'plugins':>8} {'route p50 (µs)':>15} {'route p99 (µs)':>15}")
+    for plugins in args.plugins:
+        handlers = default_handlers(plugins=['compare_plugin'] if plugins else [])
+        for i in range(plugins - 1):
+            synthetic_plugin(handlers, i)
+        engine = ChatEngine(helper, faq_helper, log_transcripts=False, sessions=MemorySessionStore(),
+                            handlers=handlers)
+        session = engine.new_session()
+        for message in MESSAGES:
+            engine.route(session, message)  # build the extractor for this set of patterns
+        times = []
+        for _ in range(args.rounds):
+            for message in MESSAGES:
+                start = time.perf_counter()
+                engine.route(session, message)
+                times.append(time.perf_counter() - start)
+        quantiles = statistics.quantiles(times, n=100)
+        print(f"{plugins:>8} {statistics.median(times) * 1e6:>15.1f} {quantiles[98] * 1e6:>15.1f}")
+
+    print(f"\n{'handler':<16} {'calls':>7} {'mean (µs)':>10} {'p99 (µs)':>9}")
+    for row in REGISTRY.stage_summary():
+        if row['stage'].startswith('handler_'):
+            print(f"{row['stage'][8:]:<16} {row['count']:>7} {row['mean'] * 1e6:>10.1f} {row['p99'] * 1e6:>9.1f}")
+
+if __name__ == "__main__":
+    main()
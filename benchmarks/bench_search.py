@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""Structured search latency: column indexes vs. pandas boolean masks.
+
+Usage: python benchmarks/bench_search.py [--sizes 10000 100000 1000000]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from catalogue_gen import make_catalogue
+from intent import IntentExtractor
+from search_engine import SearchEngine
+
+QUERIES = [
+    "2BHK apartments in Dubai under 300k that are available",
+    "cheapest villas in Pune",
+    "largest offices over 3000 sqft",
+    "properties between 100k and 150k with 3 bedrooms",
+    "show me all properties",
+]
+
+def pandas_search(df, query, page_size=5):
+    """The straightforward approach: a mask per filter, then sort the matches"""
+    mask = None
+    for col, (low, high) in query.ranges.items():
+        if low is not None:
+            mask = (df[col] >= low) if mask is None else mask & (df[col] >= low)
+        if high is not None:
+            mask = (df[col] <= high) if mask is None else mask & (df[col] <= high)
+    for col, labels in query.categories.items():
+        hit = df[col].isin(labels)
+        mask = hit if mask is None else mask & hit
+    matched = df if mask is None else df[mask]
+    return matched.sort_values(query.sort_by, ascending=not query.descending).head(page_size)
+
+def timed(function, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - start) / repeat
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        df = make_catalogue(size)
+        start = time.perf_counter()
+        engine = SearchEngine(df)
+        build = time.perf_counter() - start
+        query_parser = IntentExtractor(engine.vocabulary())
+        print(f"\n{size:,} rows (index build {build:.2f} s)")
+        print(f"{'query':<58} {'matches':>9} {'pandas (ms)':>12} {'index (ms)':>11}")
+        for text in QUERIES:
+            query = query_parser.parse(text)
+            page = engine.search(query)
+            old = timed(lambda: pandas_search(df, query), max(1, args.repeat // 10))
+            new = timed(lambda: engine.search(query), args.repeat)
+            print(f"{text:<58} {page.total:>9,} {old * 1e3:>12.2f} {new * 1e3:>11.3f}")
+
+if __name__ == "__main__":
+    main()
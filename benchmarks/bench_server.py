@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""Scaling of the async server (src/server.py) against the Streamlit path, on the same catalogue and messages.
+
+Streamlit reruns all of app.py for every message; that path is measured with
+AppTest, one session at a time. A rerun holds the GIL for most of its run, so
+one process cannot do much better than 1 / rerun time turns/s. The server
+runs in a subprocess and is driven by 1..N concurrent WebSocket sessions.
+Both use a SQLite copy of a generated catalogue. The default mix has no
+property answers because the Streamlit path cannot use the fake LLM; add
+id=/name= to --mix to include server turns polished by the fake LLM.
+
+Usage: python benchmarks/bench_server.py [--rows 10000] [--sessions 1 10 100 1000] [--turns 20]
+       [--mix faq=2,search=1,booking=1] [--llm-delay 0.3]
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.append(os.path.join(ROOT, 'src'))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault('GROQ_API_KEY', 'benchmark')
+
+from loadtest import REPORT_QUANTILES, Workload, parse_mix, session_script
+from metrics import LatencyHistogram
+
+def serve(db_path, port, llm_delay):
+    """The server process: src/server.py's app over the SQLite catalogue and the fake LLM"""
+    from chat_engine import ChatEngine
+    from fake_llm import FakeGroqClient
+    from helpers import FAQHelper, PropertyHelper
+    from llm_gateway import LLMGateway
+    from server import serve as run_server
+    from session_store import MemorySessionStore
+    from storage import SQLiteStorage
+
+    llm = LLMGateway(client=FakeGroqClient(first_token_delay=llm_delay), max_concurrency=256)
+    engine = ChatEngine(PropertyHelper(storage=SQLiteStorage(db_path), llm=llm), FAQHelper(),
+                        sessions=MemorySessionStore(max_sessions=100000))
+    asyncio.run(run_server(engine, port))
+
+def measure_streamlit(script):
+    """Seconds per turn of one Streamlit session: every message reruns app.py.
+
+    AppTest polls for the end of a run every 100 ms, so the script run itself
+    is timed from the runner's start/stop events instead of around run().
+    """
+    from streamlit.runtime.scriptrunner import ScriptRunnerEvent
+    from streamlit.testing.v1 import AppTest, local_script_runner
+    runs = []
+
+    def record(sender, event, **kwargs):
+        if event == ScriptRunnerEvent.SCRIPT_STARTED:
+            runs.append(time.perf_counter())
+        elif event == ScriptRunnerEvent.SCRIPT_STOPPED_WITH_SUCCESS:
+            runs[-1] = time.perf_counter() - runs[-1]
+
+    runner_init = local_script_runner.LocalScriptRunner.__init__
+
+    def timed_init(self, *args, **kwargs):
+        runner_init(self, *args, **kwargs)
+        self.on_event.connect(record, weak=False)
+
+    local_script_runner.LocalScriptRunner.__init__ = timed_init
+    at = AppTest.from_file(os.path.join(ROOT, 'src', 'app.py'), default_timeout=60).run()
+    at.session_state.user_logged_in = True
+    at.session_state.user_info = {'name': 'Load Test', 'email': 'load@example.com', 'phone': '0'}
+    at.run()
+    del runs[:]
+    for _, prompt in script:
+        at.chat_input[0].set_value(prompt).run()
+    return runs
+
+async def drive_server(port, scripts):
+    """Play every script over its own WebSocket at once; returns (histogram, seconds)"""
+    from tornado.websocket import websocket_connect
+    histogram = LatencyHistogram()
+
+    async def session(number, script):
+        ws = await websocket_connect(f"ws://127.0.0.1:{port}/ws?name=Load+Test+{number}")
+        await ws.read_message()  # session id
+        for _, prompt in script:
+            start = time.perf_counter()
+            await ws.write_message(json.dumps({'message': prompt}))
+            while json.loads(await ws.read_message())['type'] != 'done':
+                pass
+            histogram.record(time.perf_counter() - start)
+        ws.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(session(number, script) for number, script in enumerate(scripts)))
+    return histogram, time.perf_counter() - start
+
+def rss_mb(pid):
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) / 1024
+    return float('nan')
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def summary(histogram):
+    quantiles = histogram.quantiles(REPORT_QUANTILES)
+    return ' '.join(f"{quantiles[q] * 1e3:>9.1f}" for q in REPORT_QUANTILES)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--sessions', type=int, nargs='+', default=[1, 10, 100, 1000])
+    parser.add_argument('--turns', type=int, default=20, help="messages per session")
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix('faq=2,search=1,booking=1'))
+    parser.add_argument('--llm-delay', type=float, default=0.3)
+    parser.add_argument('--serve', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--streamlit', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--db', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.db, args.serve, args.llm_delay)
+        return
+
+    from catalogue_gen import make_catalogue
+    properties_df = make_catalogue(args.rows)
+    with open(os.path.join(ROOT, 'data', 'faqs.json'), encoding='utf-8') as file:
+        workload = Workload(properties_df, json.load(file))
+    if args.streamlit:
+        print(json.dumps(measure_streamlit(session_script(0, workload, args.mix, args.turns))))
+        return
+
+    from storage import SQLiteStorage
+    with tempfile.TemporaryDirectory() as directory:
+        db_path = os.path.join(directory, 'zorever.db')
+        storage = SQLiteStorage(db_path)
+        storage.replace_properties(properties_df)
+        storage.close()
+        env = dict(os.environ, SQLITE_DB_PATH=db_path, LLM_TIMEOUT='1')
+        mix = ','.join(f"{kind}={weight:g}" for kind, weight in args.mix.items())
+        command = [sys.executable, os.path.abspath(__file__), '--rows', str(args.rows), '--mix', mix,
+                   '--turns', str(args.turns), '--db', db_path]
+
+        output = subprocess.run(command + ['--streamlit'], env=env, check=True, capture_output=True, text=True).stdout
+        streamlit = LatencyHistogram()
+        timings = json.loads(output.strip().splitlines()[-1])
+        for seconds in timings:
+            streamlit.record(seconds)
+
+        port = free_port()
+        server = subprocess.Popen(command + ['--serve', str(port), '--llm-delay', str(args.llm_delay)], env=env,
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            for _ in range(600):
+                try:
+                    urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1)
+                    break
+                except OSError:
+                    time.sleep(0.1)
+            print(f"{args.rows:,} rows, {args.turns} messages per session, mix {mix}")
+            print(f"{'':<28} {'turns/s':>9} {'p50 (ms)':>9} {'p95 (ms)':>9} {'p99 (ms)':>9} {'server RSS (MB)':>16}")
+            print(f"{'Streamlit, 1 session':<28} {len(timings) / sum(timings):>9.1f} {summary(streamlit)}")
+            number = 0
+            for sessions in args.sessions:
+                scripts = [session_script(number + i, workload, args.mix, args.turns) for i in range(sessions)]
+                number += sessions
+                histogram, seconds = asyncio.run(drive_server(port, scripts))
+                turns = histogram.snapshot()['count']
+                print(f"{f'server, {sessions:,} sessions':<28} {turns / seconds:>9.1f} {summary(histogram)} "
+                      f"{rss_mb(server.pid):>16.0f}")
+        finally:
+            server.terminate()
+            server.wait()
+
+if __name__ == "__main__":
+    main()
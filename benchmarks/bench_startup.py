@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""Cold start breakdown: time to the login page and to a ready catalogue, CSV vs. column store snapshot.
+
+Every measurement runs in a fresh interpreter, so imports are cold (apart from
+the OS file cache). "login page" is the first AppTest run of src/app.py, which
+now renders before the helpers finish loading in the background.
+
+Usage: python benchmarks/bench_startup.py [--rows 1000000]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.append(os.path.join(ROOT, 'src'))
+
+def measure_helpers(csv_path):
+    """Phases of building the helpers the way app.load_helpers() does"""
+    from startup import StartupTimer
+    timer = StartupTimer()
+    with timer.phase('import streamlit'):
+        import streamlit  # noqa: F401
+    with timer.phase('import helpers'):
+        from helpers import FAQHelper, PropertyHelper
+        from write_behind import WriteBehindQueue
+    with timer.phase('catalogue'):
+        helper = PropertyHelper(csv_path=csv_path, write_queue=WriteBehindQueue())
+    with timer.phase('FAQ index'):
+        FAQHelper()
+    with timer.phase('first lookup'):
+        helper.get_property_by_name('marina heights 12')
+    return dict(timer.phases)
+
+def measure_login():
+    from streamlit.testing.v1 import AppTest
+    start = time.perf_counter()
+    AppTest.from_file(os.path.join(ROOT, 'src', 'app.py'), default_timeout=60).run()
+    return {'login page': time.perf_counter() - start}
+
+def run(args, env=None):
+    output = subprocess.run([sys.executable, os.path.abspath(__file__)] + args, check=True, capture_output=True,
+                            text=True, env=dict(os.environ, **(env or {}))).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--measure', choices=['helpers', 'login'], help=argparse.SUPPRESS)
+    parser.add_argument('--csv', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    os.environ.setdefault('GROQ_API_KEY', 'benchmark')
+    if args.measure:
+        print(json.dumps(measure_helpers(args.csv) if args.measure == 'helpers' else measure_login()))
+        return
+
+    from catalogue_gen import make_catalogue
+    with tempfile.TemporaryDirectory() as directory:
+        csv_path = os.path.join(directory, 'properties.csv')
+        store_path = os.path.join(directory, 'properties.colstore')
+        make_catalogue(args.rows).to_csv(csv_path, index=False)
+        snapshot = {'CATALOGUE_STORE_PATH': store_path}
+        results = {'login page (app.py)': run(['--measure', 'login'])}
+        results['CSV'] = run(['--measure', 'helpers', '--csv', csv_path])
+        results['snapshot, first run (converts)'] = run(['--measure', 'helpers', '--csv', csv_path], snapshot)
+        results['snapshot'] = run(['--measure', 'helpers', '--csv', csv_path], snapshot)
+        os.utime(csv_path)  # touched but unchanged: the checksum confirms the snapshot
+        results['snapshot, CSV touched'] = run(['--measure', 'helpers', '--csv', csv_path], snapshot)
+
+    print(f"{args.rows:,} rows; seconds per phase, each in a fresh interpreter")
+    phases = ['login page', 'import streamlit', 'import helpers', 'catalogue', 'FAQ index', 'first lookup']
+    print(f"{'':<32}" + ''.join(f"{phase:>17}" for phase in phases))
+    for name, timings in results.items():
+        print(f"{name:<32}" + ''.join(f"{timings[phase]:>17.2f}" if phase in timings else f"{'':>17}"
+                                      for phase in phases))
+
+if __name__ == "__main__":
+    sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+    main()
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""Time-to-first-token for blocking vs. streamed property answers against the fake LLM.
+
+Usage: python benchmarks/bench_streaming.py [--first-token-delay 0.3] [--chunk-delay 0.02]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+os.environ.setdefault('GROQ_API_KEY', 'benchmark')
+
+from fake_llm import FakeGroqClient
+from helpers import PropertyHelper
+from llm_cache import ResponseCache
+from llm_gateway import LLMGateway
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--first-token-delay', type=float, default=0.3)
+    parser.add_argument('--chunk-delay', type=float, default=0.02)
+    args = parser.parse_args()
+
+    client = FakeGroqClient(first_token_delay=args.first_token_delay, chunk_delay=args.chunk_delay)
+    helper = PropertyHelper(cache=ResponseCache(max_entries=0), llm=LLMGateway(client=client))
+
+    print(f"{'listing':<8} {'blocking (ms)':>14} {'stream TTFT (ms)':>17} {'stream total (ms)':>18}")
+    for listing_id in helper.properties_df['listing_id']:
+        prop = helper.get_property_by_id(listing_id)
+        start = time.perf_counter()
+        helper.format_property_details(prop)
+        blocking = time.perf_counter() - start
+
+        start = time.perf_counter()
+        stream = helper.stream_property_details(prop)
+        next(stream)
+        ttft = time.perf_counter() - start
+        for _ in stream:
+            pass
+        total = time.perf_counter() - start
+        print(f"{listing_id:<8} {blocking * 1e3:>14.0f} {ttft * 1e3:>17.0f} {total * 1e3:>18.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""Property answer latency per render tier, and what a latency budget does when the LLM is slow.
+
+Answers are rendered for the sample listings against the fake LLM: "template"
+never calls it, "cached" serves polished text already in the cache, "llm"
+polishes live with the cache off, and "budget" is the same live tier with
+--budget-ms while the LLM takes --llm-delay: once the recent p95 is known to
+be over budget, answers drop to the cached tier (here always the template,
+while the misses are polished in the background). "live calls" counts every
+upstream call, background ones included; the llm tier stops after 20 answers.
+
+The last line compares rendering the template string on every answer with the
+per-listing templates rendered once per catalogue version.
+
+Usage: python benchmarks/bench_tiers.py [--answers 200] [--llm-delay 0.3] [--budget-ms 100]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+os.environ.setdefault('GROQ_API_KEY', 'benchmark')
+
+from fake_llm import FakeGroqClient
+from helpers import PropertyHelper
+from llm_cache import ResponseCache
+from llm_gateway import LLMGateway
+
+def answer_times(helper, props, answers, **options):
+    """Seconds per format_property_details() call, cycling through props"""
+    times = []
+    for i in range(answers):
+        start = time.perf_counter()
+        helper.format_property_details(props[i % len(props)], **options)
+        times.append(time.perf_counter() - start)
+    return times
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--answers', type=int, default=200)
+    parser.add_argument('--llm-delay', type=float, default=0.3, help="fake LLM seconds per reply")
+    parser.add_argument('--budget-ms', type=float, default=100)
+    args = parser.parse_args()
+
+    clients = {}
+
+    def make_helper(cache):
+        client = FakeGroqClient(first_token_delay=args.llm_delay)
+        helper = PropertyHelper(cache=cache, llm=LLMGateway(client=client))
+        clients[id(helper)] = client
+        return helper
+
+    live = make_helper(ResponseCache(max_entries=0))
+    props = [live.get_property_by_id(listing_id) for listing_id in live.properties_df['listing_id']]
+    cached = make_helper(ResponseCache())
+    for prop in props:
+        cached.format_property_details(prop)  # warm the cache
+
+    print(f"{args.answers} answers over {len(props)} listings, fake LLM {args.llm_delay * 1e3:.0f} ms")
+    print(f"{'tier':<9} {'p50 (ms)':>10} {'p99 (ms)':>10} {'live calls':>11}")
+    cases = [('template', live, {'tier': 'template'}), ('cached', cached, {'tier': 'cached'}),
+             ('llm', live, {'tier': 'llm'}), ('budget', make_helper(ResponseCache(max_entries=0)),
+                                              {'budget': args.budget_ms / 1000})]
+    for name, helper, options in cases:
+        answers = args.answers if name != 'llm' else min(args.answers, 20)
+        calls = clients[id(helper)].calls
+        times = answer_times(helper, props, answers, **options)
+        quantiles = statistics.quantiles(times, n=100)
+        print(f"{name:<9} {statistics.median(times) * 1e3:>10.3f} {quantiles[98] * 1e3:>10.3f} "
+              f"{clients[id(helper)].calls - calls:>11}")
+
+    rounds = 20000
+    start = time.perf_counter()
+    for i in range(rounds):
+        live.render_template(props[i % len(props)])
+    every = (time.perf_counter() - start) / rounds
+    start = time.perf_counter()
+    for i in range(rounds):
+        live.listing_template(props[i % len(props)])
+    once = (time.perf_counter() - start) / rounds
+    print(f"template rendered per answer: {every * 1e6:.2f} µs; rendered once per catalogue version: {once * 1e6:.2f} µs")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""Per-message logging cost as visits.csv grows: TranscriptWriter vs. read-modify-write.
+
+Usage: python benchmarks/bench_transcript.py [--sizes 1000 100000 1000000]
+"""
+import argparse
+import csv
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from transcript import TRANSCRIPT_FIELDS, TranscriptWriter
+
+def make_row(i):
+    return {
+        'timestamp': '2025-08-29 22:11:00', 'listing_id': 'P003', 'property_name': 'Marina Studio',
+        'name': 'Bench User', 'email': 'bench@zorever.com', 'phone': '8011546271',
+        'user_query': f"What is the price of P003? ({i})",
+        'bot_response': "Marina Studio — Studio (420 sqft) in Dubai.\nPrice: 95,000 USD."
+    }
+
+def prefill(path, rows):
+    with open(path, 'w', newline='', encoding='utf-8') as file:
+        writer = csv.DictWriter(file, fieldnames=TRANSCRIPT_FIELDS)
+        writer.writeheader()
+        row = make_row(0)
+        for _ in range(rows):
+            writer.writerow(row)
+
+def read_modify_write(path, row):
+    """The old save_user_query: O(file size) per message"""
+    df = pd.read_csv(path)
+    df = pd.concat([df, pd.DataFrame([row])], ignore_index=True)
+    df.to_csv(path, index=False)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 100000, 1000000])
+    parser.add_argument('--messages', type=int, default=2000)
+    args = parser.parse_args()
+
+    print(f"{'existing rows':>14} {'read-modify-write (ms/msg)':>27} {'writer (us/msg)':>16} {'writer unbatched (us/msg)':>26}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            path = os.path.join(tmp, f"visits_{size}.csv")
+            prefill(path, size)
+
+            # The old path rewrites the whole file; a few messages are enough to see the trend
+            samples = 3 if size <= 100000 else 1
+            start = time.perf_counter()
+            for i in range(samples):
+                read_modify_write(path, make_row(i))
+            old = (time.perf_counter() - start) / samples
+
+            results = []
+            for batch_size in (50, 1):
+                writer = TranscriptWriter(path, batch_size=batch_size, flush_interval=0)
+                start = time.perf_counter()
+                for i in range(args.messages):
+                    writer.write(make_row(i))
+                writer.close()
+                results.append((time.perf_counter() - start) / args.messages)
+            print(f"{size:>14} {old * 1e3:>27.1f} {results[0] * 1e6:>16.1f} {results[1] * 1e6:>26.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""Per-worker memory of a pre-forked pool vs. catalogue size: a CSV copy per worker vs. the shared column store.
+
+The pool is forked the way src/server.py --workers does it: the parent
+converts the catalogue once, then each worker builds its helpers after the fork
+and runs the same lookups (IDs, name search, a structured search sorted by
+every numeric column), so the pages a worker really touches are counted.
+"private" is the memory only that worker holds (Private_Clean + Private_Dirty
+from /proc/<pid>/smaps_rollup); "PSS" also charges it its share of pages
+mapped by every worker, such as the column store in the page cache.
+
+Usage: python benchmarks/bench_workers.py [--rows 10000 100000 1000000] [--workers 2]
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import traceback
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+os.environ.setdefault('GROQ_API_KEY', 'benchmark')
+
+from catalogue_gen import make_catalogue
+from helpers import PropertyHelper
+from llm_cache import ResponseCache
+from search_engine import NUMERIC_COLUMNS, make_query
+from storage import ColumnarStorage, CSVStorage
+from write_behind import WriteBehindQueue
+
+MODES = ['csv', 'colstore']
+
+def memory_mb(pid='self'):
+    """(private, PSS) of a process in MB"""
+    fields = {}
+    with open(f'/proc/{pid}/smaps_rollup') as rollup:
+        for line in rollup:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == 'kB':
+                fields[parts[0].rstrip(':')] = int(parts[1]) / 1024
+    return fields['Private_Clean'] + fields['Private_Dirty'], fields['Pss']
+
+def make_storage(mode, directory):
+    csv_path = os.path.join(directory, 'properties.csv')
+    visits_path = os.path.join(directory, 'visits.csv')
+    if mode == 'csv':
+        return CSVStorage(csv_path, visits_path)
+    return ColumnarStorage(os.path.join(directory, 'properties.colstore'), csv_path, visits_path)
+
+def work(mode, directory, probe_ids):
+    """A worker's life: build the helpers after the fork and serve some lookups"""
+    helper = PropertyHelper(storage=make_storage(mode, directory), cache=ResponseCache(max_entries=0),
+                            write_queue=WriteBehindQueue())
+    for listing_id in probe_ids:
+        helper.get_property_by_id(listing_id)['price']
+    for query in ['marina heights 12', 'palm grove', 'sunrise apartments 7']:
+        helper.search_properties_by_name(query, k=5)
+    for col in NUMERIC_COLUMNS:
+        helper.catalogue.search(make_query({'bedrooms': (2, 3)}, {'city': ['Dubai']}, sort_by=col, descending=True))
+
+def run_pool(mode, directory, workers, probe_ids):
+    """Fork the workers; returns each one's (private, PSS) in MB, read once all of them are ready"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        if mode == 'colstore':
+            make_storage(mode, directory).catalogue()  # converted once, before forking
+    pids, pipes = [], []
+    for _ in range(workers):
+        ready_read, ready_write = os.pipe()
+        go_read, go_write = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            status = 0
+            try:
+                os.dup2(os.open(os.devnull, os.O_WRONLY), 1)
+                work(mode, directory, probe_ids)
+                os.write(ready_write, b'x')
+                os.read(go_read, 1)  # stay alive while the others are measured, so shared pages are shared
+            except BaseException:
+                traceback.print_exc()
+                status = 1
+            finally:
+                os._exit(status)
+        os.close(ready_write)
+        os.close(go_read)
+        pids.append(pid)
+        pipes.append((ready_read, go_write))
+
+    for ready_read, _ in pipes:
+        if not os.read(ready_read, 1):
+            raise RuntimeError(f"a {mode} worker failed")
+        os.close(ready_read)
+    reports = [memory_mb(pid) for pid in pids]
+    for _, go_write in pipes:
+        os.write(go_write, b'x')
+        os.close(go_write)
+    for pid in pids:
+        os.waitpid(pid, 0)
+    return reports
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--workers', type=int, default=2)
+    args = parser.parse_args()
+
+    baseline_private, _ = memory_mb()
+    print(f"{args.workers} workers forked from a parent holding {baseline_private:.0f} MB (imports)")
+    print(f"{'rows':>10} {'mode':<9} {'private/worker (MB)':>20} {'PSS/worker (MB)':>16} {'pool PSS (MB)':>14}")
+    for rows in args.rows:
+        with tempfile.TemporaryDirectory() as directory:
+            properties_df = make_catalogue(rows)
+            properties_df.to_csv(os.path.join(directory, 'properties.csv'), index=False)
+            probe_ids = properties_df['listing_id'].sample(200, random_state=1, replace=True).tolist()
+            del properties_df
+            for mode in MODES:
+                sys.stdout.flush()  # the forked workers must not inherit unwritten output
+                reports = run_pool(mode, directory, args.workers, probe_ids)
+                private = sum(report[0] for report in reports) / len(reports)
+                pss = sum(report[1] for report in reports)
+                print(f"{rows:>10,} {mode:<9} {private:>20.1f} {pss / len(reports):>16.1f} {pss:>14.0f}")
+
+if __name__ == "__main__":
+    main()
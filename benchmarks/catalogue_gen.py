@@ -0,0 +1,37 @@
+import numpy as np
+import pandas as pd
+
+CITIES = ['Dubai', 'Mumbai', 'Bangalore', 'Hyderabad', 'Jaipur', 'Pune', 'Gurgaon', 'Kolkata', 'Noida', 'Chennai']
+PROPERTY_TYPES = ['Apartment', 'Villa', 'Studio', 'Office', 'Cottage', 'House', 'Commercial']
+AVAILABILITY = ['Available', 'On Request', 'Sold']
+NAME_PREFIXES = ['Sunrise', 'Desert View', 'Marina', 'City Center', 'Green Meadows', 'Lakeside',
+                 'Old Town', 'TechPark', 'Riverfront', 'Midtown', 'Corner', 'Suburban', 'Palm Grove',
+                 'Silver Oak', 'Harbour', 'Skyline', 'Maple', 'Royal', 'Bayview', 'Hilltop']
+NAME_SUFFIXES = ['Apartments', 'Villa', 'Studio', 'Office', 'Cottage', 'Residence', 'Flat', 'House',
+                 'Heights', 'Towers', 'Gardens', 'Enclave']
+
+def make_catalogue(n_rows, seed=42):
+    """Generate a synthetic properties.csv-shaped DataFrame with n_rows listings"""
+    rng = np.random.default_rng(seed)
+    ids = np.arange(1, n_rows + 1)
+    width = max(3, len(str(n_rows)))
+    prefixes = np.array(NAME_PREFIXES)[rng.integers(0, len(NAME_PREFIXES), n_rows)]
+    suffixes = np.array(NAME_SUFFIXES)[rng.integers(0, len(NAME_SUFFIXES), n_rows)]
+    cities = np.array(CITIES)[rng.integers(0, len(CITIES), n_rows)]
+    bedrooms = rng.integers(0, 6, n_rows)
+    return pd.DataFrame({
+        'id': ids,
+        'listing_id': [f"P{i:0{width}d}" for i in ids],
+        'property_name': [f"{p} {s} {i}" for p, s, i in zip(prefixes, suffixes, ids)],
+        'address': [f"{i} Palm St" for i in ids],
+        'city': cities,
+        'area_sqft': rng.integers(300, 5000, n_rows),
+        'bedrooms': bedrooms,
+        'bathrooms': np.maximum(1, bedrooms),
+        'price': rng.integers(50, 2000, n_rows) * 1000,
+        'price_currency': 'USD',
+        'property_type': np.array(PROPERTY_TYPES)[rng.integers(0, len(PROPERTY_TYPES), n_rows)],
+        'availability': np.array(AVAILABILITY)[rng.integers(0, len(AVAILABILITY), n_rows)],
+        'short_description': 'Synthetic listing for benchmarks',
+        'agent_email': [f"agent{i % 50}@zorever.com" for i in ids],
+    })
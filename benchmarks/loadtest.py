@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""Headless load test of the chat pipeline, driving the same ChatEngine as app.py.
+
+Every simulated session runs on its own thread, as Streamlit sessions do
+(or, with --mode async, as a task on one event loop via ahandle_turn()), and
+plays scenarios picked from --mix: an ID query, a name query, an FAQ, a
+search followed by "more", or a four-step visit booking. Property answers are
+polished by the fake LLM (--llm-delay seconds to the first token), and every
+turn is queued to a scratch visits.csv like the app does. For each catalogue
+size the report gives turns/sec and p50/p95/p99 per scenario.
+
+--save-baseline records the results in --baseline (one entry per catalogue
+size and configuration); later runs with the same configuration are compared
+against it and exit with status 1 if throughput or a p99 regressed by more
+than --tolerance.
+
+Usage: python benchmarks/loadtest.py [--rows 1000 100000 1000000] [--sessions 16] [--turns 50]
+       [--mix id=4,name=3,faq=2,search=1,booking=1] [--llm-delay 0.3] [--stream] [--mode threads|async]
+       [--baseline benchmarks/baselines/loadtest.json] [--save-baseline] [--tolerance 0.25]
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.append(os.path.join(ROOT, 'src'))
+os.environ.setdefault('GROQ_API_KEY', 'benchmark')
+
+from catalogue_gen import CITIES, make_catalogue
+from chat_engine import ChatEngine
+from fake_llm import FakeGroqClient
+from helpers import FAQHelper, PropertyHelper
+from llm_cache import ResponseCache
+from llm_gateway import LLMGateway
+from metrics import LatencyHistogram
+from storage import CSVStorage, ColumnarStorage
+from write_behind import WriteBehindQueue
+
+SCENARIOS = ('id', 'name', 'faq', 'search', 'booking')
+REPORT_QUANTILES = (0.5, 0.95, 0.99)
+SEARCHES = ['{bedrooms}BHK apartments in {city} under {price}k', 'villas in {city}',
+            'studios in {city} sorted by price', 'show me properties under {price}k']
+
+class Workload:
+    """Generates the messages of each scenario from a sample of the catalogue"""
+
+    def __init__(self, properties_df, faqs, seed=0):
+        sample = properties_df.sample(min(len(properties_df), 5000), random_state=seed)
+        self.listing_ids = sample['listing_id'].tolist()
+        self.names = sample['property_name'].tolist()
+        self.questions = [question for faq in faqs for question in faq.get('questions', [faq['key']])]
+        self.seed = seed
+
+    def scenario(self, kind, rng, session_number):
+        """The user messages of one scenario"""
+        if kind == 'id':
+            return [rng.choice(["What is the price of {}?", "Is {} available?", "Tell me about {}"])
+                    .format(rng.choice(self.listing_ids))]
+        if kind == 'name':
+            return [f"Show details for {rng.choice(self.names)}"]
+        if kind == 'faq':
+            return [rng.choice(self.questions)]
+        if kind == 'search':
+            query = rng.choice(SEARCHES).format(bedrooms=rng.randint(1, 4), city=rng.choice(CITIES),
+                                                price=rng.choice([200, 300, 500, 1000]))
+            return [query, 'more']
+        return ["I want to book a visit", f"Load Test {session_number}", f"+971 50 {session_number:07d}",
+                rng.choice(self.listing_ids)]
+
+def parse_mix(text):
+    """'id=4,name=3' -> {'id': 4.0, 'name': 3.0}"""
+    mix = {}
+    for part in text.split(','):
+        kind, _, weight = part.partition('=')
+        if kind.strip() not in SCENARIOS:
+            raise argparse.ArgumentTypeError(f"unknown scenario {kind!r}; choose from {', '.join(SCENARIOS)}")
+        mix[kind.strip()] = float(weight or 1)
+    return mix
+
+def session_script(number, workload, mix, turns):
+    """(scenario, message) pairs one simulated user sends: whole scenarios until `turns` messages"""
+    rng = random.Random(workload.seed * 1000003 + number)
+    kinds, weights = zip(*mix.items())
+    script = []
+    while len(script) < turns:
+        kind = rng.choices(kinds, weights)[0]
+        script.extend((kind, prompt) for prompt in workload.scenario(kind, rng, number))
+    return script
+
+def user_info(number):
+    return {'name': f"Load Test {number}", 'email': f"load{number}@example.com", 'phone': f"{number:07d}"}
+
+def run_session(number, engine, script, histograms, barrier):
+    """One simulated user on its own thread, like a Streamlit session"""
+    session = engine.new_session(user_info(number))
+    barrier.wait()
+    for kind, prompt in script:
+        start = time.perf_counter()
+        result = engine.handle_turn(session, prompt)
+        if result.response_stream is not None:
+            for _ in result.response_stream:
+                pass
+        elapsed = time.perf_counter() - start
+        histograms[kind].record(elapsed)
+        histograms['all'].record(elapsed)
+
+async def run_async_session(number, engine, script, histograms):
+    """One simulated user as a task on the shared event loop"""
+    session = engine.new_session(user_info(number))
+    for kind, prompt in script:
+        start = time.perf_counter()
+        result = await engine.ahandle_turn(session, prompt)
+        if result.response_stream is not None:
+            async for _ in result.response_stream:
+                pass
+        elapsed = time.perf_counter() - start
+        histograms[kind].record(elapsed)
+        histograms['all'].record(elapsed)
+
+def run_load(engine, workload, mix, sessions, turns, mode='threads'):
+    """Drive `sessions` concurrent sessions; returns {'turns', 'seconds', 'turns_per_second', 'latency'}"""
+    histograms = {kind: LatencyHistogram() for kind in list(mix) + ['all']}
+    scripts = [session_script(number, workload, mix, turns) for number in range(sessions)]
+    if mode == 'async':
+        async def run_all():
+            await asyncio.gather(*(run_async_session(number, engine, script, histograms)
+                                   for number, script in enumerate(scripts)))
+        start = time.perf_counter()
+        asyncio.run(run_all())
+    else:
+        barrier = threading.Barrier(sessions + 1)
+        threads = [threading.Thread(target=run_session, name=f'session-{number}',
+                                    args=(number, engine, script, histograms, barrier))
+                   for number, script in enumerate(scripts)]
+        for thread in threads:
+            thread.start()
+        barrier.wait()
+        start = time.perf_counter()
+        for thread in threads:
+            thread.join()
+    seconds = time.perf_counter() - start
+    total = histograms['all'].snapshot()['count']
+    latency = {}
+    for kind, histogram in histograms.items():
+        if histogram.snapshot()['count']:
+            quantiles = histogram.quantiles(REPORT_QUANTILES)
+            latency[kind] = {'turns': histogram.snapshot()['count'],
+                             **{f"p{round(q * 100)}": quantiles[q] for q in REPORT_QUANTILES}}
+    return {'turns': total, 'seconds': seconds, 'turns_per_second': total / seconds, 'latency': latency}
+
+def config_key(args, rows):
+    mix = ','.join(f"{kind}={weight:g}" for kind, weight in args.mix.items())
+    return (f"rows={rows} sessions={args.sessions} turns={args.turns} mix={mix} llm_delay={args.llm_delay} "
+            f"chunk_delay={args.chunk_delay} stream={int(args.stream)} cache={args.cache_size} storage={args.storage} "
+            f"mode={args.mode}")
+
+def compare(result, baseline, tolerance, min_delta):
+    """Human-readable regressions of result against baseline (empty if none)"""
+    regressions = []
+    floor = baseline['turns_per_second'] * (1 - tolerance)
+    if result['turns_per_second'] < floor:
+        regressions.append(f"throughput {result['turns_per_second']:.1f} turns/s < {floor:.1f} "
+                           f"(baseline {baseline['turns_per_second']:.1f})")
+    for kind, latency in result['latency'].items():
+        before = baseline['latency'].get(kind)
+        if before is None:
+            continue
+        limit = max(before['p99'] * (1 + tolerance), before['p99'] + min_delta)
+        if latency['p99'] > limit:
+            regressions.append(f"{kind} p99 {latency['p99'] * 1e3:.1f} ms > {limit * 1e3:.1f} ms "
+                               f"(baseline {before['p99'] * 1e3:.1f} ms)")
+    return regressions
+
+def print_result(rows, result):
+    print(f"\n{rows:,} rows: {result['turns']:,} turns in {result['seconds']:.1f} s = "
+          f"{result['turns_per_second']:.1f} turns/s")
+    print(f"{'scenario':<10} {'turns':>7} {'p50 (ms)':>10} {'p95 (ms)':>10} {'p99 (ms)':>10}")
+    for kind, latency in result['latency'].items():
+        print(f"{kind:<10} {latency['turns']:>7,} {latency['p50'] * 1e3:>10.1f} "
+              f"{latency['p95'] * 1e3:>10.1f} {latency['p99'] * 1e3:>10.1f}")
+
+def make_helper(args, csv_path, directory):
+    visits_path = os.path.join(directory, 'visits.csv')
+    if args.storage == 'colstore':
+        storage = ColumnarStorage(os.path.join(directory, 'properties.colstore'), csv_path, visits_path)
+    else:
+        storage = CSVStorage(csv_path, visits_path)
+    client = FakeGroqClient(first_token_delay=args.llm_delay, chunk_delay=args.chunk_delay, seed=0)
+    llm = LLMGateway(client=client, max_concurrency=args.llm_concurrency)
+    return PropertyHelper(storage=storage, cache=ResponseCache(max_entries=args.cache_size), llm=llm,
+                          write_queue=WriteBehindQueue())
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000, 100000])
+    parser.add_argument('--sessions', type=int, default=16, help="concurrent simulated sessions")
+    parser.add_argument('--turns', type=int, default=50, help="messages sent by each session")
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix('id=4,name=3,faq=2,search=1,booking=1'),
+                        help="scenario weights (scenarios: %s)" % ', '.join(SCENARIOS))
+    parser.add_argument('--llm-delay', type=float, default=0.3, help="fake LLM seconds to the first token")
+    parser.add_argument('--chunk-delay', type=float, default=0.0, help="fake LLM seconds between tokens")
+    parser.add_argument('--llm-concurrency', type=int, default=8)
+    parser.add_argument('--cache-size', type=int, default=1024, help="polish cache entries (0 disables it)")
+    parser.add_argument('--stream', action='store_true', help="consume property answers as token streams")
+    parser.add_argument('--storage', choices=['csv', 'colstore'], default='csv')
+    parser.add_argument('--mode', choices=['threads', 'async'], default='threads',
+                        help="a thread per session (like Streamlit) or one event loop for all (ahandle_turn)")
+    parser.add_argument('--baseline', default=os.path.join(ROOT, 'benchmarks', 'baselines', 'loadtest.json'))
+    parser.add_argument('--save-baseline', action='store_true', help="record this run as the baseline")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="allowed relative regression")
+    parser.add_argument('--min-delta-ms', type=float, default=10.0,
+                        help="p99 increases smaller than this are never regressions")
+    args = parser.parse_args()
+
+    baselines = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as file:
+            baselines = json.load(file)
+    faq_helper = FAQHelper()
+    regressions = []
+    for rows in args.rows:
+        properties_df = make_catalogue(rows)
+        with tempfile.TemporaryDirectory() as directory:
+            csv_path = os.path.join(directory, 'properties.csv')
+            properties_df.to_csv(csv_path, index=False)
+            helper = make_helper(args, csv_path, directory)
+            engine = ChatEngine(helper, faq_helper, stream=args.stream)
+            workload = Workload(properties_df, faq_helper.retriever.faqs)
+            result = run_load(engine, workload, args.mix, args.sessions, args.turns, args.mode)
+            helper.write_queue.close()
+        print_result(rows, result)
+
+        key = config_key(args, rows)
+        if args.save_baseline:
+            baselines[key] = dict(result, machine=platform.node(), recorded=datetime.now().isoformat(timespec='seconds'))
+        elif key in baselines:
+            found = compare(result, baselines[key], args.tolerance, args.min_delta_ms / 1e3)
+            print("baseline: " + ("; ".join(found) if found else f"OK (recorded {baselines[key]['recorded']})"))
+            regressions.extend(found)
+        else:
+            print("baseline: none for this configuration (record one with --save-baseline)")
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, 'w', encoding='utf-8') as file:
+            json.dump(baselines, file, indent=2, sort_keys=True)
+        print(f"\nSaved baseline to {args.baseline}")
+    if regressions:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
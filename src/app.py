@@ -1,82 +1,87 @@
 import streamlit as st
 import os
 import sys
-import pandas as pd
-from datetime import datetime
 sys.path.append('src')
 
-from helpers import PropertyHelper, FAQHelper, detect_intent
+from metrics import REGISTRY, get_logger, start_exporter
+from startup import BackgroundLoader, StartupTimer
 
-# Initialize helpers
-@st.cache_resource
-def load_helpers():
-    return PropertyHelper(), FAQHelper()
+log = get_logger('app')
 
-property_helper, faq_helper = load_helpers()
+# Stream polished property answers token by token (set LLM_STREAMING=0 to wait for the full text)
+STREAM_RESPONSES = os.getenv('LLM_STREAMING', '1') != '0'
+# Chat messages rendered per rerun; "Load older messages" adds another window's worth (0 renders all)
+HISTORY_WINDOW = int(os.getenv('CHAT_HISTORY_WINDOW', '50'))
+
+def load_helpers(startup_timer):
+    """Import and build the chat engine (catalogue, FAQ index, LLM gateway), timing each phase"""
+    with startup_timer.phase('import helpers'):
+        from helpers import PropertyHelper, FAQHelper
+        from catalogue_watcher import start_watcher
+        from chat_engine import ChatEngine
+    with startup_timer.phase('catalogue'):
+        property_helper = PropertyHelper()
+    with startup_timer.phase('FAQ index'):
+        faq_helper = FAQHelper()
+    with startup_timer.phase('watcher'):
+        # Pick up properties.csv edits without a restart (and without dropping warm caches)
+        start_watcher(property_helper)
+        # Prometheus text file / endpoint, when METRICS_PATH or METRICS_PORT is set
+        start_exporter()
+        # Rows spilled by a previous run (WRITE_QUEUE_POLICY=spill) go out now that every sink is registered
+        property_helper.write_queue.replay_spill()
+    engine = ChatEngine(property_helper, faq_helper, stream=STREAM_RESPONSES)
+    # Live sessions and their bytes on the metrics panel and exporter
+    engine.sessions.register_gauges()
+    log.info("%s", startup_timer.report())
+    return engine
+
+# Initialize helpers in the background on the first page view, so the login form
+# renders without waiting for pandas, the catalogue or the FAQ index
+@st.cache_resource(show_spinner=False)
+def start_loading_helpers():
+    return BackgroundLoader(lambda: load_helpers(StartupTimer()), name='helpers-loader')
+
+helpers_loader = start_loading_helpers()
 
 # Initialize session state
 if 'user_logged_in' not in st.session_state:
     st.session_state.user_logged_in = False
 if 'user_info' not in st.session_state:
     st.session_state.user_info = {}
-if 'booking_state' not in st.session_state:
-    st.session_state.booking_state = None
-if 'booking_data' not in st.session_state:
-    st.session_state.booking_data = {}
-if 'messages' not in st.session_state:
-    st.session_state.messages = []
 
-def save_user_query(user_info, query, response, property_id="", property_name=""):
-    """Save user query and response to visits.csv"""
-    try:
-        # Get the current script directory and try to find the CSV file
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        project_root = os.path.abspath(os.path.join(current_dir, os.pardir))
-        
-        # Define potential paths for visits.csv
-        potential_paths = [
-            os.path.join(project_root, 'data', 'visits.csv'),
-            os.path.join(current_dir, 'data', 'visits.csv'),
-            os.path.join(current_dir, '..', 'data', 'visits.csv'),
-            'data/visits.csv'
-        ]
-        
-        visits_file = None
-        for path in potential_paths:
-            if os.path.exists(path):
-                visits_file = path
-                break
-        
-        if visits_file is None:
-            st.error("Could not find visits.csv file")
-            return
-        
-        # Create new entry
-        new_entry = {
-            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-            'listing_id': property_id,
-            'property_name': property_name,
-            'name': user_info.get('name', ''),
-            'email': user_info.get('email', ''),
-            'phone': user_info.get('phone', ''),
-            'user_query': query,
-            'bot_response': response
-        }
-        
-        # Read existing data or create new DataFrame
-        try:
-            df = pd.read_csv(visits_file)
-        except (FileNotFoundError, pd.errors.EmptyDataError):
-            df = pd.DataFrame(columns=['timestamp', 'listing_id', 'property_name', 'name', 'email', 'phone', 'user_query', 'bot_response'])
-        
-        # Add new entry
-        df = pd.concat([df, pd.DataFrame([new_entry])], ignore_index=True)
-        
-        # Save back to file
-        df.to_csv(visits_file, index=False)
-        
-    except Exception as e:
-        st.error(f"Error saving query: {e}")
+# Users who see the metrics panel in the sidebar (or everyone with METRICS_PANEL=1)
+ADMIN_EMAILS = {email.strip().lower() for email in os.getenv('ADMIN_EMAILS', '').split(',') if email.strip()}
+
+def write_stream(chunks):
+    """Render a token stream progressively and return the assembled text"""
+    placeholder = st.empty()
+    response = ""
+    for chunk in chunks:
+        response += chunk
+        placeholder.markdown(response + "▌")
+    placeholder.markdown(response)
+    return response
+
+def show_older_messages():
+    st.session_state.history_window += HISTORY_WINDOW
+
+def show_metrics_panel():
+    """Per-stage latency percentiles and counters for admins"""
+    with st.expander("📈 Metrics"):
+        rows = [{
+            'stage': row['stage'], 'count': row['count'],
+            'p50 (ms)': round(row['p50'] * 1000, 2), 'p90 (ms)': round(row['p90'] * 1000, 2),
+            'p99 (ms)': round(row['p99'] * 1000, 2), 'max (ms)': round(row['max'] * 1000, 2),
+        } for row in REGISTRY.stage_summary()]
+        if rows:
+            st.table(rows)
+        else:
+            st.write("No turns recorded yet.")
+        for (name, labels), value in sorted({**REGISTRY.counters(), **REGISTRY.gauges()}.items()):
+            label_text = ', '.join(f"{key}={label}" for key, label in labels)
+            st.write(f"**{name}**{f' ({label_text})' if label_text else ''}: {value:,}")
+        st.write(f"**LLM cache:** {engine.property_helper.cache.stats()}")
 
 # Login Page
 if not st.session_state.user_logged_in:
@@ -105,6 +110,21 @@ if not st.session_state.user_logged_in:
 
 # Main Chatbot Interface
 else:
+    if not helpers_loader.ready():
+        with st.spinner("Loading the property catalogue..."):
+            helpers_loader.result()
+    if helpers_loader.failed():
+        start_loading_helpers.clear()  # retry on the next rerun instead of caching the failure
+    engine = helpers_loader.result()
+    # The conversation (booking progress, paging, history) lives in the engine's session store, which
+    # bounds and expires sessions across all tabs; this tab only remembers its session ID
+    chat_session = engine.session(st.session_state.get('session_id'))
+    if chat_session is None:
+        chat_session = engine.new_session(st.session_state.user_info)
+        st.session_state.session_id = chat_session.session_id
+    if 'history_window' not in st.session_state:
+        st.session_state.history_window = HISTORY_WINDOW
+
     st.title("Zorever Real Estate Chatbot")
     st.write(f"Welcome, {st.session_state.user_info['name']}! Ask me about properties, book visits, or general FAQs!")
     
@@ -118,9 +138,8 @@ else:
         if st.button("Logout"):
             st.session_state.user_logged_in = False
             st.session_state.user_info = {}
-            st.session_state.messages = []
-            st.session_state.booking_state = None
-            st.session_state.booking_data = {}
+            engine.sessions.delete(st.session_state.pop('session_id'))
+            del st.session_state.history_window
             st.rerun()
         
         st.header("Sample Queries")
@@ -138,124 +157,30 @@ else:
         st.write("- I want to book a visit")
         st.write("- Schedule a visit")
 
-    # Display chat messages
-    for message in st.session_state.messages:
-        with st.chat_message(message["role"]):
-            st.write(message["content"])
+        if os.getenv('METRICS_PANEL') == '1' or st.session_state.user_info.get('email', '').lower() in ADMIN_EMAILS:
+            show_metrics_panel()
+
+    # Display the most recent chat messages; each rerun renders at most the window, not the whole history
+    history = chat_session.messages
+    shown = history.window(st.session_state.history_window)
+    hidden = len(history) - len(shown)
+    if hidden:
+        st.button(f"Load older messages ({hidden:,} more)", on_click=show_older_messages)
+    elif history.spilled:
+        st.caption(f"{history.spilled:,} earlier messages are kept in the chat log only.")
+    for message in shown:
+        with st.chat_message(message.role):
+            st.write(message.content)
 
     # Handle user input
     if prompt := st.chat_input("Type your message here..."):
-        # Add user message to chat
-        st.session_state.messages.append({"role": "user", "content": prompt})
         with st.chat_message("user"):
             st.write(prompt)
         
-        # Process user input
+        # The engine answers, updates the session and logs the turn; this script only renders it
         with st.chat_message("assistant"):
-            response = ""
-            property_id = ""
-            property_name = ""
-            
-            # Handle booking flow
-            if st.session_state.booking_state == 'waiting_name':
-                st.session_state.booking_data['name'] = prompt
-                st.session_state.booking_state = 'waiting_phone'
-                response = "Please share your phone number:"
-                
-            elif st.session_state.booking_state == 'waiting_phone':
-                st.session_state.booking_data['phone'] = prompt
-                st.session_state.booking_state = 'waiting_property'
-                response = "Which property would you like to visit? (You can provide listing ID like P001 or property name, or say 'any' to skip):"
-                
-            elif st.session_state.booking_state == 'waiting_property':
-                if prompt.lower() != 'any':
-                    # Try to find property
-                    if prompt.upper().startswith('P'):
-                        prop = property_helper.get_property_by_id(prompt.upper())
-                        if prop is not None:
-                            property_id = prompt.upper()
-                            property_name = prop['property_name']
-                    else:
-                        prop = property_helper.get_property_by_name(prompt)
-                        if prop is not None:
-                            property_id = prop['listing_id']
-                            property_name = prop['property_name']
-                
-                # Save booking
-                property_helper.save_visit_booking(
-                    name=st.session_state.booking_data['name'],
-                    phone=st.session_state.booking_data['phone'],
-                    property_id=property_id,
-                    property_name=property_name,
-                    user_message=f"Visit booking for {property_name or 'any property'}"
-                )
-                
-                response = f"Visit booking confirmed!\n\n**Booking Details:**\n- Name: {st.session_state.booking_data['name']}\n- Phone: {st.session_state.booking_data['phone']}\n- Property: {property_name or 'Any property'}\n\nOur agent will contact you shortly to schedule the visit."
-                
-                # Reset booking state
-                st.session_state.booking_state = None
-                st.session_state.booking_data = {}
-            
+            result = engine.handle_turn(chat_session, prompt)
+            if result.response_stream is not None:
+                write_stream(result.response_stream)
             else:
-                # Regular intent detection
-                intent = detect_intent(prompt)
-                
-                if intent == 'booking':
-                    st.session_state.booking_state = 'waiting_name'
-                    response = "I'll help you book a property visit! Please share your full name:"
-                    
-                elif intent == 'property_query':
-                    # Extract property ID or name from prompt
-                    prompt_upper = prompt.upper()
-                    property_found = False
-                    
-                    # Try to find by listing ID first (look for P followed by 3 digits)
-                    import re
-                    property_ids = re.findall(r'P\d{3}', prompt_upper)
-                    
-                    for prop_id in property_ids:
-                        prop = property_helper.get_property_by_id(prop_id)
-                        if prop is not None:
-                            response = property_helper.format_property_details(prop)
-                            property_id = prop_id
-                            property_name = prop['property_name']
-                            property_found = True
-                            break
-                    
-                    # If not found by ID, try by name (extract property names from common patterns)
-                    if not property_found:
-                        # Look for property names after keywords like "price of", "details for", etc.
-                        name_patterns = [
-                            r'price of (.+?)(?:\?|$)', 
-                            r'details for (.+?)(?:\?|$)',
-                            r'information about (.+?)(?:\?|$)',
-                            r'tell me about (.+?)(?:\?|$)'
-                        ]
-                        
-                        for pattern in name_patterns:
-                            matches = re.findall(pattern, prompt, re.IGNORECASE)
-                            if matches:
-                                prop_name = matches[0].strip()
-                                prop = property_helper.get_property_by_name(prop_name)
-                                if prop is not None:
-                                    response = property_helper.format_property_details(prop)
-                                    property_id = prop['listing_id']
-                                    property_name = prop['property_name']
-                                    property_found = True
-                                    break
-                    
-                    if not property_found:
-                        response = "Sorry, I couldn't find that property. Please check the listing ID (like P001) or property name and try again."
-                
-                else:  # FAQ
-                    faq_answer = faq_helper.get_faq_answer(prompt)
-                    if faq_answer:
-                        response = faq_answer
-                    else:
-                        response = "I can help you with:\n- Property information (try 'What is the price of P001?')\n- Booking visits (say 'I want to book a visit')\n- General FAQs about office location, working hours, contact info"
-            
-            st.write(response)
-            st.session_state.messages.append({"role": "assistant", "content": response})
-            
-            # Save the query and response to visits.csv
-            save_user_query(st.session_state.user_info, prompt, response, property_id, property_name)
+                st.write(result.response)
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""Offline job that polishes every listing ahead of time.
+
+Each listing's template is rendered and keyed by make_cache_key(), so only
+listings whose shown fields changed since the last run (or that failed last
+time) are sent to the LLM. Requests run concurrently through the LLM gateway
+under a requests-per-second limit, and results are committed in small batches,
+so an interrupted run resumes where it stopped. Point the chatbot at the same
+file with POLISHED_STORE_PATH to serve the precomputed text.
+
+Usage: python src/batch_polish.py --store data/polished.sqlite [--rate 5] [--concurrency 8]
+       [--fake [--fake-delay 0.2] [--fake-failure-rate 0.05]]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from fake_llm import FakeGroqClient
+from helpers import LLM_MODEL, LLM_TEMPERATURE, PropertyHelper
+from llm_cache import PolishedStore, ResponseCache, make_cache_key
+from llm_gateway import CircuitOpenError, GatewayError, LLMGateway
+from metrics import get_logger
+from write_behind import WriteBehindQueue
+
+log = get_logger('batch_polish')
+
+class RateLimiter:
+    """Spaces request starts at least 1/rate seconds apart (rate <= 0 means unlimited)"""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next = 0.0
+
+    async def acquire(self):
+        if not self.interval:
+            return
+        now = asyncio.get_running_loop().time()
+        start = max(now, self._next)
+        self._next = start + self.interval
+        if start > now:
+            await asyncio.sleep(start - now)
+
+def pending_work(helper, store):
+    """(work, current_keys, skipped): (key, listing_id, template) still to polish, and every listing's key"""
+    work, current_keys, skipped = [], [], 0
+    batch = []
+
+    def flush():
+        nonlocal skipped
+        done = store.existing(key for key, _, _ in batch)
+        skipped += len(done)
+        work.extend(item for item in batch if item[0] not in done)
+        batch.clear()
+
+    for record in helper.catalogue.records():
+        template = helper.render_template(record)
+        key = make_cache_key(template, LLM_MODEL, LLM_TEMPERATURE)
+        current_keys.append(key)
+        batch.append((key, record['listing_id'], template))
+        if len(batch) >= 5000:
+            flush()
+    flush()
+    return work, current_keys, skipped
+
+async def polish_all(helper, store, work, rate=5.0, concurrency=8, commit_every=50, max_failures=100,
+                     progress_interval=5.0):
+    """Polish work items concurrently; returns {'polished', 'failed', 'aborted'}"""
+    queue = asyncio.Queue()
+    for item in work:
+        queue.put_nowait(item)
+    limiter = RateLimiter(rate)
+    stats = {'polished': 0, 'failed': 0, 'aborted': False}
+    results = []
+    started = time.perf_counter()
+    last_report = started
+
+    def commit():
+        if results:
+            store.put_many(results)
+            results.clear()
+
+    async def worker():
+        nonlocal last_report
+        while not stats['aborted']:
+            try:
+                key, listing_id, template = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            await limiter.acquire()
+            try:
+                text = await helper.llm.complete(**helper._polish_params(template))
+            except CircuitOpenError:
+                # The provider is failing; wait for the breaker to let a trial through, then retry
+                queue.put_nowait((key, listing_id, template))
+                await asyncio.sleep(min(helper.llm.breaker.reset_timeout, 1.0))
+                continue
+            except GatewayError as e:
+                stats['failed'] += 1
+                log.warning("Polish failed for %s: %s", listing_id, e)
+                if stats['failed'] >= max_failures:
+                    stats['aborted'] = True
+                continue
+            if not text:
+                stats['failed'] += 1
+                continue
+            results.append((key, listing_id, text))
+            stats['polished'] += 1
+            if len(results) >= commit_every:
+                commit()
+            now = time.perf_counter()
+            if now - last_report >= progress_interval:
+                last_report = now
+                log.info("Polished %d/%d (%.1f/s), %d failed", stats['polished'], len(work),
+                         stats['polished'] / (now - started), stats['failed'])
+
+    try:
+        await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+    finally:
+        commit()  # keep finished work even if the run is interrupted
+    return stats
+
+def run(helper, store, rate=5.0, concurrency=8, max_failures=100, prune=True):
+    """Polish everything not yet in store; returns a report dict"""
+    start = time.perf_counter()
+    work, current_keys, skipped = pending_work(helper, store)
+    stats = asyncio.run(polish_all(helper, store, work, rate, concurrency, max_failures=max_failures))
+    elapsed = time.perf_counter() - start
+    # Only prune after a complete pass, so an aborted run never drops text it could still serve
+    pruned = store.prune(current_keys) if prune and not stats['aborted'] else 0
+    return {
+        'listings': len(current_keys), 'skipped': skipped, 'polished': stats['polished'],
+        'failed': stats['failed'], 'pruned': pruned, 'aborted': stats['aborted'], 'seconds': elapsed,
+        'per_second': stats['polished'] / elapsed if elapsed else 0.0,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Polish every listing ahead of time")
+    parser.add_argument('--store', default=os.getenv('POLISHED_STORE_PATH'), help="SQLite file for polished text")
+    parser.add_argument('--csv', help="properties.csv (default: the app's catalogue storage)")
+    parser.add_argument('--rate', type=float, default=5.0, help="max LLM requests started per second (0: no limit)")
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--max-failures', type=int, default=100, help="stop the run after this many failures")
+    parser.add_argument('--fake', action='store_true', help="use the offline stub LLM instead of Groq")
+    parser.add_argument('--fake-delay', type=float, default=0.2, help="stub LLM seconds per reply")
+    parser.add_argument('--fake-failure-rate', type=float, default=0.0)
+    args = parser.parse_args()
+    if not args.store:
+        parser.error("--store (or POLISHED_STORE_PATH) is required")
+
+    client = FakeGroqClient(first_token_delay=args.fake_delay, failure_rate=args.fake_failure_rate) if args.fake else None
+    os.environ['LLM_MAX_CONCURRENCY'] = str(args.concurrency)
+    llm = LLMGateway.from_env(client=client)
+    store = PolishedStore(args.store)
+    helper = PropertyHelper(csv_path=args.csv, cache=ResponseCache(max_entries=0), llm=llm,
+                            write_queue=WriteBehindQueue(), polished=store)
+    report = run(helper, store, args.rate, args.concurrency, args.max_failures)
+    print(f"{report['listings']:,} listings: {report['polished']:,} polished, {report['skipped']:,} already up to date, "
+          f"{report['failed']:,} failed, {report['pruned']:,} stale entries pruned")
+    print(f"{report['seconds']:.1f} s, {report['per_second']:.1f} listings/s"
+          + (" (stopped early after too many failures; rerun to resume)" if report['aborted'] else ""))
+    store.close()
+    if report['failed']:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
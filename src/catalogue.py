@@ -0,0 +1,199 @@
+import copy
+import gc
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from name_index import NameIndex
+from search_engine import SearchEngine
+
+@contextmanager
+def paused_gc():
+    """Pause the cyclic GC while bulk-building millions of acyclic index objects"""
+    was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if was_enabled:
+            gc.enable()
+
+class PropertyRecord(tuple):
+    """Compact, read-only property row that supports row['column'] access"""
+    __slots__ = ()
+    _fields = ()
+    _positions = {}
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            try:
+                key = self._positions[key]
+            except KeyError:
+                raise KeyError(key) from None
+        return tuple.__getitem__(self, key)
+
+    def get(self, key, default=None):
+        position = self._positions.get(key)
+        return default if position is None else tuple.__getitem__(self, position)
+
+    def keys(self):
+        return self._fields
+
+    def to_dict(self):
+        return dict(zip(self._fields, self))
+
+def make_record_type(columns):
+    """Create a PropertyRecord subclass bound to the given column layout"""
+    fields = tuple(columns)
+    return type('PropertyRecord', (PropertyRecord,), {
+        '__slots__': (),
+        '_fields': fields,
+        '_positions': {name: i for i, name in enumerate(fields)},
+    })
+
+def row_hashes(properties_df, stable=False):
+    """One 64-bit content hash per row, indexed by listing_id.
+
+    Text is hashed with the built-in str hash, which is stable within a process
+    only; stable=True uses pandas' keyed hash instead, so the hashes can be stored.
+    """
+    combined = np.zeros(len(properties_df), dtype=np.uint64)
+    for name in properties_df.columns:
+        column = properties_df[name]
+        if column.dtype == object and not stable:
+            # Built-in str hashing is several times faster than pandas' siphash of objects
+            values = column.fillna('').tolist() if column.hasnans else column.tolist()
+            hashes = np.fromiter(map(hash, values), dtype=np.int64, count=len(values)).view(np.uint64)
+        else:
+            hashes = pd.util.hash_array(column.to_numpy())
+        combined = (combined * np.uint64(1000003)) ^ hashes
+    return pd.Series(combined, index=pd.Index(properties_df['listing_id']))
+
+def row_delta(old_hashes, new_hashes):
+    """{'added', 'changed', 'removed'} listing_ids between two row_hashes() results with unique IDs"""
+    if not old_hashes.index.is_unique or not new_hashes.index.is_unique:
+        # Without unique IDs rows cannot be paired up; treat every shared ID as changed
+        old_ids, new_ids = set(old_hashes.index), set(new_hashes.index)
+        return {
+            'added': [listing_id for listing_id in dict.fromkeys(new_hashes.index) if listing_id not in old_ids],
+            'changed': [listing_id for listing_id in dict.fromkeys(new_hashes.index) if listing_id in old_ids],
+            'removed': [listing_id for listing_id in dict.fromkeys(old_hashes.index) if listing_id not in new_ids],
+        }
+    positions = old_hashes.index.get_indexer(new_hashes.index)
+    present = positions >= 0
+    differs = np.zeros(len(positions), dtype=bool)
+    differs[present] = new_hashes.to_numpy()[present] != old_hashes.to_numpy()[positions[present]]
+    kept = np.zeros(len(old_hashes), dtype=bool)
+    kept[positions[present]] = True
+    return {
+        'added': new_hashes.index[~present].tolist(),
+        'changed': new_hashes.index[differs].tolist(),
+        'removed': old_hashes.index[~kept].tolist(),
+    }
+
+class InMemoryCatalogue:
+    """The whole catalogue as a DataFrame plus listing_id and name indexes.
+
+    Lookups go through get(), search_names() and first_name_match(), the same
+    interface the SQLite storage backend implements, so PropertyHelper does not
+    care whether the catalogue lives in RAM or on disk.
+    """
+
+    def __init__(self, properties_df):
+        self.properties_df = properties_df
+        record_type = make_record_type(properties_df.columns)
+        columns = [properties_df[name].tolist() for name in record_type._fields]
+        with paused_gc():
+            records = list(map(record_type, zip(*columns)))
+        ids = properties_df['listing_id'].tolist()
+        self.id_index = dict(zip(ids, records))
+        if len(self.id_index) != len(ids):
+            # Keep the first row for duplicated IDs, like the old mask scan did
+            self.id_index = dict(zip(reversed(ids), reversed(records)))
+        with paused_gc():
+            self.name_index = NameIndex(properties_df['property_name'].tolist(), ids)
+        self.row_hashes = row_hashes(properties_df)
+        self._search_engine = None
+        self._search_lock = threading.Lock()
+
+    @property
+    def search_engine(self):
+        """Column indexes for structured search, built on first use"""
+        if self._search_engine is None:
+            with self._search_lock:
+                if self._search_engine is None:
+                    self._search_engine = SearchEngine(self.properties_df)
+        return self._search_engine
+
+    def updated(self, properties_df):
+        """Return (catalogue, delta) for properties_df, rebuilding only the rows that differ.
+
+        delta maps 'added', 'changed' and 'removed' to lists of listing_ids. This
+        catalogue is left untouched, so readers holding it keep a consistent view.
+        A new column layout or duplicated IDs fall back to a full rebuild.
+        """
+        new_hashes = row_hashes(properties_df)
+        old_hashes = self.row_hashes
+        if (list(properties_df.columns) != list(self.properties_df.columns)
+                or not new_hashes.index.is_unique or not old_hashes.index.is_unique):
+            catalogue = InMemoryCatalogue(properties_df)
+            removed = [listing_id for listing_id in self.id_index if catalogue.get(listing_id) is None]
+            changed = [listing_id for listing_id, record in self.id_index.items()
+                       if catalogue.get(listing_id) not in (None, record)]
+            added = [listing_id for listing_id in catalogue.id_index if listing_id not in self.id_index]
+            return catalogue, {'added': added, 'changed': changed, 'removed': removed}
+
+        delta = row_delta(old_hashes, new_hashes)
+
+        record_type = type(next(iter(self.id_index.values()))) if self.id_index else make_record_type(properties_df.columns)
+        touched = properties_df[properties_df['listing_id'].isin(delta['added'] + delta['changed'])]
+        columns = [touched[name].tolist() for name in record_type._fields]
+        records = dict(zip(touched['listing_id'].tolist(), map(record_type, zip(*columns))))
+
+        catalogue = copy.copy(self)
+        catalogue.properties_df = properties_df
+        catalogue.row_hashes = new_hashes
+        catalogue._search_lock = threading.Lock()
+        # Sorted columns shift with any edit; rebuild them here, off the request path, if they were in use
+        catalogue._search_engine = None if self._search_engine is None else SearchEngine(properties_df)
+        catalogue.id_index = dict(self.id_index)
+        for listing_id in delta['removed']:
+            del catalogue.id_index[listing_id]
+        catalogue.id_index.update(records)
+
+        renamed = [listing_id for listing_id in delta['changed']
+                   if records[listing_id]['property_name'] != self.id_index[listing_id]['property_name']]
+        catalogue.name_index = self.name_index.with_changes(
+            removed=[(listing_id, self.id_index[listing_id]['property_name']) for listing_id in delta['removed'] + renamed],
+            added=[(listing_id, records[listing_id]['property_name']) for listing_id in delta['added'] + renamed]
+        )
+        return catalogue, delta
+
+    def __len__(self):
+        return len(self.id_index)
+
+    def get(self, listing_id):
+        return self.id_index.get(listing_id)
+
+    def records(self):
+        """Every listing, in catalogue order"""
+        return iter(self.id_index.values())
+
+    def search_names(self, query, k=5):
+        """Ranked (record, NameMatch) candidates for a name query"""
+        return [(self.id_index[match.key], match) for match in self.name_index.search(query, k=k)]
+
+    def first_name_match(self, query):
+        """First listing in catalogue order whose name contains query"""
+        listing_id = self.name_index.first_match(query)
+        return None if listing_id is None else self.id_index[listing_id]
+
+    def search_vocabulary(self):
+        return self.search_engine.vocabulary()
+
+    def search(self, query, page=0, page_size=5):
+        """A SearchPage of records matching a SearchQuery"""
+        result = self.search_engine.search(query, page, page_size)
+        return result._replace(results=[self.id_index[listing_id] for listing_id in result.results])
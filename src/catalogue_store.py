@@ -0,0 +1,455 @@
+#!/usr/bin/env python3
+"""Columnar, memory-mapped catalogue store converted from properties.csv.
+
+Every column is kept as a fixed-width NumPy array in a single file: numbers
+in the narrowest integer type that fits (float64 when values are missing),
+repetitive text (city, property type, availability, currency, agent email and
+any other low-cardinality column) as small integer codes into a label table,
+and free text as one UTF-8 blob plus row offsets. The file is memory-mapped, so
+opening it reads only the header and pages are shared between processes through
+the OS page cache instead of being parsed into Python objects per process. The
+listing_id order, the name index and the search indexes are stored too, so nothing
+is rebuilt on open and every process reading the file shares one copy of them.
+A content hash per row lets a reload find the changed rows without decoding
+the old catalogue.
+
+Usage: python src/catalogue_store.py --store data/properties.colstore [--csv data/properties.csv]
+"""
+import argparse
+import json
+import mmap
+import os
+import sys
+import threading
+from bisect import bisect_left
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from catalogue import row_delta, row_hashes
+from catalogue_watcher import file_digest
+from name_index import NameIndex, Permuted
+from search_engine import CATEGORICAL_COLUMNS, NUMERIC_COLUMNS, SearchEngine
+
+MAGIC = b'ZCATSTORE1\n'
+ALIGNMENT = 64
+# Always dictionary-encoded; other text columns are when at most half their values are distinct
+STORE_CATEGORICAL_COLUMNS = ('city', 'property_type', 'availability', 'price_currency', 'agent_email')
+NAN = float('nan')
+
+def _narrowest_int(values):
+    """Smallest signed integer dtype that holds every value"""
+    if not len(values):
+        return np.dtype(np.int8)
+    low, high = int(values.min()), int(values.max())
+    for dtype in (np.int8, np.int16, np.int32, np.int64):
+        info = np.iinfo(dtype)
+        if info.min <= low and high <= info.max:
+            return np.dtype(dtype)
+    raise ValueError(f"integer values out of int64 range: {low}..{high}")
+
+def _text_values(name, column):
+    values = column.tolist()
+    for value in values:
+        if not isinstance(value, str) and not pd.isna(value):
+            raise ValueError(f"column {name!r} mixes text with {type(value).__name__} values")
+    return values
+
+def _encode_strings(values):
+    """(blob, offsets, nulls) for a list of str/NaN values"""
+    nulls = np.fromiter((not isinstance(value, str) for value in values), dtype=bool, count=len(values))
+    encoded = [value.encode('utf-8') if isinstance(value, str) else b'' for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum(np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded)), out=offsets[1:])
+    if offsets[-1] <= np.iinfo(np.int32).max:
+        offsets = offsets.astype(np.int32)
+    return np.frombuffer(b''.join(encoded), dtype=np.uint8), offsets, nulls
+
+def encode_columns(properties_df):
+    """(column descriptions, {array name: array}) for a properties.csv-shaped DataFrame"""
+    columns, arrays = [], {}
+    rows = len(properties_df)
+    for name in properties_df.columns:
+        column = properties_df[name]
+        kind = column.dtype.kind
+        if kind == 'b' and not column.hasnans:
+            columns.append({'name': name, 'kind': 'numeric'})
+            arrays[name] = column.to_numpy(dtype=bool)
+        elif kind in 'iu':
+            values = column.to_numpy()
+            columns.append({'name': name, 'kind': 'numeric'})
+            arrays[name] = values.astype(_narrowest_int(values)) if kind == 'i' else values
+        elif kind == 'f':
+            columns.append({'name': name, 'kind': 'numeric'})
+            arrays[name] = column.to_numpy(dtype=np.float64)
+        elif kind == 'O':
+            values = _text_values(name, column)
+            codes, labels = pd.factorize(column)
+            if name in STORE_CATEGORICAL_COLUMNS or len(labels) * 2 <= rows:
+                columns.append({'name': name, 'kind': 'categorical', 'labels': labels.tolist()})
+                arrays[f"{name}.codes"] = codes.astype(_narrowest_int(np.array([-1, len(labels)])))
+            else:
+                columns.append({'name': name, 'kind': 'string'})
+                arrays[f"{name}.blob"], arrays[f"{name}.offsets"], nulls = _encode_strings(values)
+                if nulls.any():
+                    arrays[f"{name}.nulls"] = nulls
+        else:
+            raise ValueError(f"column {name!r} has unsupported dtype {column.dtype}")
+    return columns, arrays
+
+def write_store(properties_df, path, source_sha256=None, source_stat=None):
+    """Convert a properties DataFrame into a column store file at path (replaced atomically).
+
+    source_sha256 and source_stat ([size, mtime_ns]) describe the CSV it was
+    converted from, so a later start can tell whether the store is stale.
+    """
+    for name in ('listing_id', 'property_name'):
+        if name not in properties_df.columns:
+            raise ValueError(f"properties data is missing column {name!r}")
+    columns, arrays = encode_columns(properties_df)
+
+    listing_ids = properties_df['listing_id']
+    positions = np.flatnonzero(listing_ids.notna().to_numpy())
+    ids = listing_ids.to_numpy()[positions]
+    # Stable, so the first of any duplicated IDs is found first, like the in-memory id_index
+    arrays['listing_id.order'] = positions[np.argsort(ids, kind='stable')].astype(np.int32)
+
+    arrays['row_hashes'] = row_hashes(properties_df, stable=True).to_numpy()
+
+    name_index = NameIndex(properties_df['property_name'].tolist(), range(len(properties_df)))
+    arrays['names.blob'], arrays['names.offsets'], _ = _encode_strings(name_index._names)
+    for key, array in name_index.to_arrays().items():
+        arrays[f"names.{key}"] = array
+    search_meta = None
+    if set(NUMERIC_COLUMNS + CATEGORICAL_COLUMNS) <= set(properties_df.columns):
+        search_arrays, search_meta = SearchEngine(properties_df).to_arrays()
+        for key, array in search_arrays.items():
+            arrays[f"search.{key}"] = array
+
+    layout, offset = {}, 0
+    for key, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        arrays[key] = array
+        layout[key] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset}
+        offset += -(-array.nbytes // ALIGNMENT) * ALIGNMENT
+    header = json.dumps({
+        'version': 1, 'rows': len(properties_df), 'source_sha256': source_sha256, 'source_stat': source_stat,
+        'columns': columns, 'search': search_meta, 'arrays': layout,
+    }).encode('utf-8')
+
+    # Per process, so workers converting the same CSV at once never write into each other's file
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    with open(temp_path, 'wb') as file:
+        file.write(MAGIC)
+        file.write(len(header).to_bytes(8, 'little'))
+        file.write(header)
+        data_start = -(-file.tell() // ALIGNMENT) * ALIGNMENT
+        for key, array in arrays.items():
+            file.seek(data_start + layout[key]['offset'])
+            file.write(array.tobytes())
+        file.truncate(data_start + offset)
+    # Readers that already mapped the old file keep its inode; new opens see the new one
+    os.replace(temp_path, path)
+    return path
+
+def open_store(path):
+    """(mmap, header, {array name: read-only array view}) for a column store file"""
+    with open(path, 'rb') as file:
+        mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    if mapped[:len(MAGIC)] != MAGIC:
+        mapped.close()
+        raise ValueError(f"{path} is not a catalogue store")
+    header_length = int.from_bytes(mapped[len(MAGIC):len(MAGIC) + 8], 'little')
+    header_start = len(MAGIC) + 8
+    header = json.loads(mapped[header_start:header_start + header_length].decode('utf-8'))
+    data_start = -(-(header_start + header_length) // ALIGNMENT) * ALIGNMENT
+    arrays = {}
+    for key, spec in header['arrays'].items():
+        dtype = np.dtype(spec['dtype'])
+        count = int(np.prod(spec['shape'], dtype=np.int64))
+        arrays[key] = np.frombuffer(mapped, dtype=dtype, count=count,
+                                    offset=data_start + spec['offset']).reshape(spec['shape'])
+    return mapped, header, arrays
+
+def file_stat(path):
+    """[size, mtime_ns] of a file, the cheap first check for a stale store"""
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+def is_current(catalogue, source_path):
+    """True if the store was converted from source_path as it is now.
+
+    An unchanged size and mtime is trusted without reading the CSV; otherwise
+    the CSV is hashed, so a touched but unedited file does not force a rebuild.
+    """
+    if catalogue.source_stat is not None and catalogue.source_stat == file_stat(source_path):
+        return True
+    return catalogue.source_sha256 is not None and catalogue.source_sha256 == file_digest(source_path)
+
+class NumericColumn:
+    __slots__ = ('values',)
+
+    def __init__(self, values):
+        self.values = values
+
+    def __len__(self):
+        return len(self.values)
+
+    def __getitem__(self, row):
+        return self.values[row].item()
+
+    def tolist(self):
+        return self.values.tolist()
+
+class CategoricalColumn:
+    __slots__ = ('codes', 'labels')
+
+    def __init__(self, codes, labels):
+        self.codes = codes
+        self.labels = labels
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, row):
+        code = int(self.codes[row])
+        return NAN if code < 0 else self.labels[code]
+
+    def tolist(self):
+        return np.array(list(self.labels) + [NAN], dtype=object)[self.codes].tolist()
+
+class StringColumn:
+    __slots__ = ('blob', 'offsets', 'nulls')
+
+    def __init__(self, blob, offsets, nulls=None):
+        self.blob = blob
+        self.offsets = offsets
+        self.nulls = nulls
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, row):
+        if self.nulls is not None and self.nulls[row]:
+            return NAN
+        start, stop = self.offsets[row:row + 2].tolist()
+        return self.blob[start:stop].tobytes().decode('utf-8')
+
+    def tolist(self):
+        data = self.blob.tobytes()
+        offsets = self.offsets.tolist()
+        values = [data[start:stop].decode('utf-8') for start, stop in zip(offsets, offsets[1:])]
+        if self.nulls is not None:
+            for row in np.flatnonzero(self.nulls).tolist():
+                values[row] = NAN
+        return values
+
+class PropertyRow:
+    """Read-only view of one stored row; values are decoded from the columns on access"""
+    __slots__ = ('_catalogue', '_row')
+
+    def __init__(self, catalogue, row):
+        self._catalogue = catalogue
+        self._row = row
+
+    def __getitem__(self, key):
+        columns = self._catalogue._columns
+        if isinstance(key, str):
+            try:
+                return columns[key][self._row]
+            except KeyError:
+                raise KeyError(key) from None
+        return self._catalogue._column_list[key][self._row]
+
+    def get(self, key, default=None):
+        column = self._catalogue._columns.get(key)
+        return default if column is None else column[self._row]
+
+    def keys(self):
+        return self._catalogue.columns
+
+    def __iter__(self):
+        return (column[self._row] for column in self._catalogue._column_list)
+
+    def __len__(self):
+        return len(self._catalogue.columns)
+
+    def to_dict(self):
+        return dict(zip(self._catalogue.columns, self))
+
+    def __eq__(self, other):
+        if isinstance(other, (PropertyRow, tuple)):
+            return tuple(self) == tuple(other)
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(tuple(self))
+
+    def __repr__(self):
+        return f"PropertyRow({self.to_dict()!r})"
+
+class ColumnarCatalogue:
+    """The catalogue served straight from a memory-mapped column store.
+
+    Implements the same lookup interface as InMemoryCatalogue (get,
+    search_names, first_name_match, search, search_vocabulary) but hands out
+    PropertyRow views instead of holding a Python object per row.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._mmap, header, arrays = open_store(path)
+        self.source_sha256 = header.get('source_sha256')
+        self.source_stat = header.get('source_stat')
+        self._rows = header['rows']
+        self._kinds = {}
+        self._columns = {}
+        for spec in header['columns']:
+            name = spec['name']
+            self._kinds[name] = spec['kind']
+            if spec['kind'] == 'numeric':
+                self._columns[name] = NumericColumn(arrays[name])
+            elif spec['kind'] == 'categorical':
+                self._columns[name] = CategoricalColumn(arrays[f"{name}.codes"], spec['labels'])
+            else:
+                self._columns[name] = StringColumn(arrays[f"{name}.blob"], arrays[f"{name}.offsets"],
+                                                   arrays.get(f"{name}.nulls"))
+        self.columns = tuple(self._columns)
+        self._column_list = list(self._columns.values())
+        self._row_hashes = arrays.get('row_hashes')
+        self._id_order = Permuted(self._columns['listing_id'], arrays['listing_id.order'])
+        names = {key[len('names.'):]: array for key, array in arrays.items() if key.startswith('names.')}
+        self.name_index = NameIndex.from_arrays(
+            self._columns['property_name'], StringColumn(names['blob'], names['offsets']),
+            range(self._rows), names
+        )
+        self._search_engine = None
+        self._search_lock = threading.Lock()
+        if header.get('search'):
+            search = {key[len('search.'):]: array for key, array in arrays.items() if key.startswith('search.')}
+            self._search_engine = SearchEngine.from_arrays(range(self._rows), search, header['search'])
+
+    def __len__(self):
+        return self._rows
+
+    def row(self, position):
+        return PropertyRow(self, position)
+
+    def get(self, listing_id):
+        try:
+            position = bisect_left(self._id_order, listing_id)
+        except TypeError:
+            return None  # e.g. an int looked up among string IDs
+        if position < len(self._id_order) and self._id_order[position] == listing_id:
+            return PropertyRow(self, int(self._id_order._positions[position]))
+        return None
+
+    def records(self):
+        """Every row, in catalogue order"""
+        return (PropertyRow(self, position) for position in range(self._rows))
+
+    def search_names(self, query, k=5):
+        """Ranked (row, NameMatch) candidates for a name query"""
+        listing_ids = self._columns['listing_id']
+        return [(PropertyRow(self, match.key), match._replace(key=listing_ids[match.key]))
+                for match in self.name_index.search(query, k=k)]
+
+    def first_name_match(self, query):
+        """First listing in catalogue order whose name contains query"""
+        position = self.name_index.first_match(query)
+        return None if position is None else PropertyRow(self, position)
+
+    def _numeric_values(self, name):
+        if self._kinds.get(name) == 'numeric':
+            return self._columns[name].values.astype(np.float64)
+        column = self._columns.get(name)
+        values = [] if column is None else [column[row] for row in range(self._rows)]
+        return pd.to_numeric(pd.Series(values, dtype=object), errors='coerce').to_numpy(dtype=np.float64)
+
+    def _categorical_codes(self, name):
+        if self._kinds.get(name) == 'categorical':
+            column = self._columns[name]
+            return column.codes, column.labels
+        column = self._columns.get(name)
+        values = [NAN] * self._rows if column is None else [column[row] for row in range(self._rows)]
+        codes, labels = pd.factorize(pd.Series(values, dtype=object))
+        return codes, labels.tolist()
+
+    @property
+    def search_engine(self):
+        """Column indexes for structured search: the stored ones, or (older stores) built on first use"""
+        if self._search_engine is None:
+            with self._search_lock:
+                if self._search_engine is None:
+                    self._search_engine = SearchEngine.from_columns(
+                        range(self._rows),
+                        {col: self._numeric_values(col) for col in NUMERIC_COLUMNS},
+                        {col: self._categorical_codes(col) for col in CATEGORICAL_COLUMNS}
+                    )
+        return self._search_engine
+
+    def search_vocabulary(self):
+        return self.search_engine.vocabulary()
+
+    def search(self, query, page=0, page_size=5):
+        """A SearchPage of rows matching a SearchQuery"""
+        result = self.search_engine.search(query, page, page_size)
+        return result._replace(results=[PropertyRow(self, position) for position in result.results])
+
+    def to_dataframe(self):
+        """The stored catalogue as a DataFrame, as pd.read_csv would have produced it"""
+        data = {}
+        for name, column in self._columns.items():
+            kind = self._kinds[name]
+            if kind == 'numeric':
+                # Integers were narrowed on disk; pandas reads them back as int64
+                data[name] = column.values.astype(np.int64 if column.values.dtype.kind == 'i' else column.values.dtype)
+            elif kind == 'categorical':
+                labels = np.array(list(column.labels) + [NAN], dtype=object)
+                data[name] = labels[column.codes]
+            else:
+                data[name] = np.array(column.tolist(), dtype=object)
+        return pd.DataFrame(data, columns=list(self.columns))
+
+    def row_hashes(self):
+        """The stored per-row content hashes, indexed by listing_id, as row_hashes(df, stable=True)"""
+        if self._row_hashes is None:
+            # A store written before the hashes were kept
+            return row_hashes(self.to_dataframe(), stable=True)
+        return pd.Series(self._row_hashes, index=pd.Index(self._columns['listing_id'].tolist()))
+
+    def updated(self, properties_df):
+        """Rewrite the store from properties_df and return (catalogue, delta).
+
+        The new file replaces the old one atomically; this catalogue keeps its
+        mapping of the old file, so turns holding it stay consistent. The store
+        no longer records a source checksum, so the next start re-converts once.
+        """
+        write_store(properties_df, self.path)
+        return self.reopened()
+
+    def reopened(self):
+        """(catalogue, delta) for the store file as it is now, e.g. after another process rewrote it"""
+        catalogue = ColumnarCatalogue(self.path)
+        return catalogue, row_delta(self.row_hashes(), catalogue.row_hashes())
+
+def main():
+    from storage import find_properties_file  # storage imports this module
+
+    parser = argparse.ArgumentParser(description="Convert properties.csv into a memory-mapped column store")
+    parser.add_argument('--store', required=True, help="path of the column store file to write")
+    parser.add_argument('--csv', help="properties.csv to convert (default: the usual data/properties.csv)")
+    args = parser.parse_args()
+    csv_path = args.csv or next((path for path in find_properties_file() if os.path.exists(path)), None)
+    if csv_path is None:
+        raise SystemExit("Could not find properties.csv; pass --csv")
+    write_store(pd.read_csv(csv_path), args.store, source_sha256=file_digest(csv_path), source_stat=file_stat(csv_path))
+    print(f"Wrote {len(ColumnarCatalogue(args.store)):,} properties from {csv_path} to {args.store} "
+          f"({os.path.getsize(args.store) / 1e6:.1f} MB)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+import hashlib
+import os
+import threading
+
+from metrics import get_logger
+
+log = get_logger('catalogue_watcher')
+
+def file_digest(path, chunk_size=1 << 20):
+    """sha256 of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class CatalogueWatcher:
+    """Polls properties.csv and hot-reloads PropertyHelper's catalogue when it changes.
+
+    Each poll is a stat(); only when the mtime or size moved is the file hashed,
+    and only when the hash differs is it re-read and applied through
+    reload_properties(), which re-indexes just the changed rows and swaps the
+    catalogue in atomically. Touching the file without editing it costs one hash.
+    """
+
+    def __init__(self, helper, interval=2.0):
+        self.helper = helper
+        self.interval = interval
+        self.reloads = 0
+        self.last_delta = None
+        self._stamp = self._stat()
+        self._digest = file_digest(self.path) if self._stamp else None
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def path(self):
+        return self.helper.csv_path
+
+    def _stat(self):
+        try:
+            stat = os.stat(self.path)
+        except (OSError, TypeError):
+            return None
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+    def _apply(self):
+        return self.helper.reload_properties()
+
+    def check(self):
+        """Poll once; returns the applied row delta, or None when nothing changed"""
+        stamp = self._stat()
+        if stamp is None or stamp == self._stamp:
+            return None
+        digest = file_digest(self.path)
+        self._stamp = stamp
+        if digest == self._digest:
+            return None
+        try:
+            delta = self._apply()
+        except Exception as e:
+            # A half-written or malformed file: keep serving the current catalogue and retry on the next edit
+            log.warning("Catalogue reload failed, keeping the current catalogue: %s", e)
+            return None
+        self._digest = digest
+        self.reloads += 1
+        self.last_delta = delta
+        return delta
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.check()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='catalogue-watcher', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+class StoreWatcher(CatalogueWatcher):
+    """Polls a column store file and reopens it when another process replaced it.
+
+    Used by pre-forked server workers: one worker watches properties.csv and
+    rewrites the shared store, the others only notice the new file and map it.
+    """
+
+    @property
+    def path(self):
+        return self.helper.storage.store_path
+
+    def _apply(self):
+        catalogue, delta = self.helper.catalogue.reopened()
+        self.helper.swap_catalogue(catalogue, delta)
+        return delta
+
+def start_watcher(helper, store_only=False):
+    """Watch the helper's properties.csv every CATALOGUE_POLL_INTERVAL seconds (0 disables).
+
+    With store_only, watch its column store for a rewrite by another process instead.
+    """
+    interval = float(os.getenv('CATALOGUE_POLL_INTERVAL', '2'))
+    if store_only:
+        return StoreWatcher(helper, interval).start() if interval > 0 else None
+    if interval <= 0 or not helper.csv_path:
+        return None
+    return CatalogueWatcher(helper, interval).start()
@@ -0,0 +1,293 @@
+import asyncio
+import os
+import time
+import uuid
+from collections import namedtuple
+from datetime import datetime
+
+from chat_history import ChatHistory, ChatMessage
+from handlers import HandlerRegistry, Route, load_plugins, reply
+from metrics import REGISTRY, count, get_logger, timer
+from session_store import session_store_from_env
+
+log = get_logger('chat_engine')
+
+# Follow-ups that page through the previous search results
+MORE_RESULTS_COMMANDS = {'more', 'show more', 'next', 'next page', 'more results'}
+
+NOT_FOUND_RESPONSE = "Sorry, I couldn't find that property. Please check the listing ID (like P001) or property name and try again."
+HELP_RESPONSE = "I can help you with:\n- Property information (try 'What is the price of P001?')\n- Property search (try '2BHK apartments in Dubai under 300k')\n- Booking visits (say 'I want to book a visit')\n- General FAQs about office location, working hours, contact info"
+
+class TurnResult(namedtuple('TurnResult', ['response', 'response_stream', 'property_id', 'property_name', 'kind'])):
+    """What one turn produced: the reply text, or a token stream when the answer is being polished live.
+
+    kind is the turn's intent ('booking', 'search', 'property_query', 'faq'
+    or a plugin's), 'booking_flow' for the follow-up steps of a booking or
+    'more' for paging.
+    response_stream is a generator (an async generator from ahandle_turn());
+    response is then '' and the turn is logged once the stream is exhausted.
+    """
+    __slots__ = ()
+
+
+class ChatSession:
+    """Everything the engine remembers about one conversation.
+
+    messages is a ChatHistory holding the last history_size messages (all of
+    them for 0 or None); older ones are only in the transcript store. version
+    changes whenever a persistent session store writes the session.
+    """
+    __slots__ = ('session_id', 'user_info', 'booking_state', 'booking_data', 'last_search', 'messages', 'version')
+
+    def __init__(self, user_info=None, session_id=None, history_size=None):
+        self.session_id = session_id or uuid.uuid4().hex
+        self.user_info = dict(user_info or {})
+        self.booking_state = None
+        self.booking_data = {}
+        self.last_search = None
+        self.messages = ChatHistory(history_size)
+        self.version = None
+
+def transcript_entry(user_info, query, response, property_id="", property_name=""):
+    """The visits.csv row logged for one turn"""
+    return {
+        'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'listing_id': property_id,
+        'property_name': property_name,
+        'name': user_info.get('name', ''),
+        'email': user_info.get('email', ''),
+        'phone': user_info.get('phone', ''),
+        'user_query': query,
+        'bot_response': response
+    }
+
+class ChatEngine:
+    """The chatbot's turn logic, independent of any UI.
+
+    One engine (and so one catalogue, cache and LLM gateway) serves any number
+    of ChatSession objects. handle_turn() blocks the calling thread on the LLM;
+    ahandle_turn() awaits it, so a single event loop can interleave many
+    sessions. Routing and lookups run inline in both cases: they take
+    microseconds, while the LLM takes hundreds of milliseconds; handlers
+    registered as expensive (search, paging, FAQ retrieval) run on a worker
+    thread under ahandle_turn(), so a large catalogue does not stall the loop.
+    Every turn is appended to the session's messages, queued to the transcript
+    log and counted in the metrics registry. Sessions keep their last
+    history_size messages (default CHAT_HISTORY_SIZE, 200; 0 keeps all) and
+    live in a session store (default: session_store_from_env()), which every
+    turn writes through, so booking progress survives a restart when the
+    store is persistent. Turns are dispatched through a HandlerRegistry
+    (default: default_handlers(), the built-ins plus CHAT_PLUGINS).
+    """
+
+    def __init__(self, property_helper, faq_helper, stream=False, log_transcripts=True, history_size=None,
+                 sessions=None, handlers=None):
+        self.property_helper = property_helper
+        self.faq_helper = faq_helper
+        self.stream = stream
+        self.log_transcripts = log_transcripts
+        if history_size is None:
+            history_size = int(os.getenv('CHAT_HISTORY_SIZE', '200'))
+        self.history_size = history_size
+        self.sessions = sessions if sessions is not None else session_store_from_env()
+        self.handlers = handlers if handlers is not None else default_handlers()
+
+    def new_session(self, user_info=None):
+        return self.sessions.add(ChatSession(user_info, history_size=self.history_size))
+
+    def session(self, session_id):
+        """The stored session with this ID, or None once it expired or was evicted"""
+        return self.sessions.get(session_id)
+
+    def find_property(self, text):
+        """The listing a booking step refers to, by listing ID first and then by name"""
+        extraction = self.property_helper.extract(text)
+        for listing_id in extraction.listing_ids:
+            prop = self.property_helper.get_property_by_id(listing_id)
+            if prop is not None:
+                return prop
+        return self.property_helper.get_property_by_name(text)
+
+    def book_visit(self, name, phone, property_text='any'):
+        """Queue a visit booking for the listing property_text names ('any' for none); returns (id, name, confirmation)"""
+        property_id = ""
+        property_name = ""
+        if property_text and property_text.lower() != 'any':
+            prop = self.find_property(property_text)
+            if prop is not None:
+                property_id = prop['listing_id']
+                property_name = prop['property_name']
+
+        # Save booking
+        self.property_helper.save_visit_booking(
+            name=name,
+            phone=phone,
+            property_id=property_id,
+            property_name=property_name,
+            user_message=f"Visit booking for {property_name or 'any property'}"
+        )
+        response = f"Visit booking confirmed!\n\n**Booking Details:**\n- Name: {name}\n- Phone: {phone}\n- Property: {property_name or 'Any property'}\n\nOur agent will contact you shortly to schedule the visit."
+        return property_id, property_name, response
+
+    def route(self, session, prompt):
+        """Advance the booking/paging state for prompt and decide the answer, short of polishing it"""
+        handler, extraction = self.handlers.select(self, session, prompt)
+        return self.handlers.run(handler, self, session, prompt, extraction)
+
+    async def aroute(self, session, prompt):
+        """route() for coroutines: an expensive handler runs on a worker thread, off the event loop"""
+        handler, extraction = self.handlers.select(self, session, prompt)
+        if handler.cost == 'expensive':
+            return await asyncio.get_running_loop().run_in_executor(
+                None, self.handlers.run, handler, self, session, prompt, extraction)
+        return self.handlers.run(handler, self, session, prompt, extraction)
+
+    def handle_turn(self, session, prompt, stream=None, tier=None, budget=None):
+        """Answer one user message in session; returns a TurnResult.
+
+        With stream=True (default: the engine's setting) a found property is
+        answered with a token generator, which the caller must consume. tier
+        and budget (seconds) choose how a property answer is rendered; see
+        PropertyHelper.choose_tier().
+        """
+        start = time.perf_counter()
+        session.messages.append(ChatMessage('user', prompt))
+        route = self.route(session, prompt)
+        if route.prop is None:
+            return self._finish(session, prompt, route, route.response, start)
+        if self.stream if stream is None else stream:
+            tokens = self.property_helper.stream_property_details(route.prop, tier, budget)
+            return TurnResult("", self._finish_stream(session, prompt, route, tokens, start),
+                              route.property_id, route.property_name, route.kind)
+        response = self.property_helper.format_property_details(route.prop, tier, budget)
+        return self._finish(session, prompt, route, response, start)
+
+    async def ahandle_turn(self, session, prompt, stream=None, tier=None, budget=None):
+        """handle_turn() for coroutines: the LLM is awaited, and a stream is an async generator"""
+        start = time.perf_counter()
+        session.messages.append(ChatMessage('user', prompt))
+        route = await self.aroute(session, prompt)
+        if route.prop is None:
+            return self._finish(session, prompt, route, route.response, start)
+        if self.stream if stream is None else stream:
+            tokens = self.property_helper.astream_property_details(route.prop, tier, budget)
+            return TurnResult("", self._afinish_stream(session, prompt, route, tokens, start),
+                              route.property_id, route.property_name, route.kind)
+        response = await self.property_helper.aformat_property_details(route.prop, tier, budget)
+        return self._finish(session, prompt, route, response, start)
+
+    def _finish_stream(self, session, prompt, route, tokens, start):
+        parts = []
+        try:
+            for token in tokens:
+                parts.append(token)
+                yield token
+        finally:
+            # Log whatever was delivered, even if the reader stopped early
+            self._finish(session, prompt, route, ''.join(parts), start)
+
+    async def _afinish_stream(self, session, prompt, route, tokens, start):
+        parts = []
+        try:
+            async for token in tokens:
+                parts.append(token)
+                yield token
+        finally:
+            self._finish(session, prompt, route, ''.join(parts), start)
+
+    def _finish(self, session, prompt, route, response, start):
+        session.messages.append(ChatMessage('assistant', response))
+        with timer('save_session'):
+            try:
+                self.sessions.save(session)
+            except Exception as e:
+                # The answer still goes out; the session keeps its state in memory
+                log.error("Error saving session %s: %s", session.session_id, e)
+        if self.log_transcripts:
+            self.save_user_query(session.user_info, prompt, response, route.property_id, route.property_name)
+        count('turns', intent=route.kind)
+        REGISTRY.observe('turn', time.perf_counter() - start)
+        return TurnResult(response, None, route.property_id, route.property_name, route.kind)
+
+    def save_user_query(self, user_info, query, response, property_id="", property_name=""):
+        """Queue user query and response for appending to visits.csv"""
+        with timer('save_user_query'):
+            try:
+                self.property_helper.write_queue.submit(
+                    'transcripts', transcript_entry(user_info, query, response, property_id, property_name))
+            except Exception as e:
+                log.error("Error saving query: %s", e)
+
+def ask_phone(engine, session, prompt, extraction):
+    session.booking_data['name'] = prompt
+    session.booking_state = 'waiting_phone'
+    return reply("Please share your phone number:", 'booking_flow')
+
+def ask_property(engine, session, prompt, extraction):
+    session.booking_data['phone'] = prompt
+    session.booking_state = 'waiting_property'
+    return reply("Which property would you like to visit? (You can provide listing ID like P001 or property name, or say 'any' to skip):",
+                 'booking_flow')
+
+def confirm_booking(engine, session, prompt, extraction):
+    property_id, property_name, response = engine.book_visit(
+        session.booking_data['name'], session.booking_data['phone'], prompt)
+
+    # Reset booking state
+    session.booking_state = None
+    session.booking_data = {}
+    return reply(response, 'booking_flow', property_id, property_name)
+
+def next_results(engine, session, prompt, extraction):
+    query, page = session.last_search
+    query, results = engine.property_helper.search_properties(query, page=page + 1)
+    session.last_search = (query, page + 1)
+    return reply(engine.property_helper.format_search_results(query, results), 'more')
+
+def start_booking(engine, session, prompt, extraction):
+    session.booking_state = 'waiting_name'
+    return reply("I'll help you book a property visit! Please share your full name:", 'booking')
+
+def search(engine, session, prompt, extraction):
+    query, results = engine.property_helper.search_properties(extraction.query)
+    session.last_search = (query, 0)
+    return reply(engine.property_helper.format_search_results(query, results), 'search')
+
+def property_query(engine, session, prompt, extraction):
+    # Try to find by listing ID first, then by the names mentioned after "price of", "details for", etc.
+    property_helper = engine.property_helper
+    prop = None
+    for prop_id in extraction.listing_ids:
+        prop = property_helper.get_property_by_id(prop_id)
+        if prop is not None:
+            break
+    if prop is None:
+        for prop_name in extraction.names:
+            prop = property_helper.get_property_by_name(prop_name)
+            if prop is not None:
+                break
+    if prop is not None:
+        return Route(None, prop, prop['listing_id'], prop['property_name'], 'property_query')
+    return reply(NOT_FOUND_RESPONSE, 'property_query')
+
+def faq(engine, session, prompt, extraction):
+    return reply(engine.faq_helper.get_faq_answer(prompt) or HELP_RESPONSE, 'faq')
+
+def register_builtin_handlers(registry):
+    """The booking flow, result paging, booking, search, property and FAQ handlers"""
+    registry.register('booking_name', states=['waiting_name'])(ask_phone)
+    registry.register('booking_phone', states=['waiting_phone'])(ask_property)
+    registry.register('booking_property', states=['waiting_property'])(confirm_booking)
+    registry.register('more', commands=MORE_RESULTS_COMMANDS, requires=['last_search'], cost='expensive')(next_results)
+    registry.register('booking')(start_booking)
+    registry.register('search', cost='expensive')(search)
+    # A property word without an ID or name ("Can you help me sell my house?") is really an FAQ
+    registry.register('property_query', requires=['listing_ids', 'names'])(property_query)
+    registry.register('faq', cost='expensive')(faq)
+    return registry
+
+def default_handlers(plugins=None):
+    """A registry of the built-in handlers plus the plugin modules named by plugins (default: CHAT_PLUGINS)"""
+    registry = register_builtin_handlers(HandlerRegistry(fallback='faq'))
+    load_plugins(registry, os.getenv('CHAT_PLUGINS', '') if plugins is None else plugins)
+    return registry
@@ -0,0 +1,76 @@
+import sys
+from collections import deque
+from itertools import islice
+
+class ChatMessage:
+    """One chat message; indexable like the {'role', 'content'} dicts it replaces"""
+    __slots__ = ('role', 'content')
+
+    def __init__(self, role, content):
+        self.role = role
+        self.content = content
+
+    def __getitem__(self, key):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __eq__(self, other):
+        if isinstance(other, ChatMessage):
+            return (self.role, self.content) == (other.role, other.content)
+        if isinstance(other, dict):
+            return other == {'role': self.role, 'content': self.content}
+        return NotImplemented
+
+    def __repr__(self):
+        return f"ChatMessage({self.role!r}, {self.content!r})"
+
+    def nbytes(self):
+        return sys.getsizeof(self) + sys.getsizeof(self.content)
+
+class ChatHistory:
+    """A conversation's messages, keeping only the most recent max_messages in memory.
+
+    Messages live in a ring buffer: once it is full, appending drops the
+    oldest one, so a session's memory no longer grows with the length of the
+    conversation. Every turn is already written to the transcript store
+    (visits.csv or the transcripts table), which is where the dropped messages
+    remain; spilled counts them. max_messages of 0 or None keeps everything.
+    """
+
+    def __init__(self, max_messages=None):
+        self.max_messages = max_messages or None
+        self._messages = deque(maxlen=self.max_messages)
+        self.total = 0
+        self.nbytes = 0  # approximate memory held by the retained messages
+
+    @property
+    def spilled(self):
+        """Messages no longer held in memory"""
+        return self.total - len(self._messages)
+
+    def append(self, message):
+        """Add a message (a ChatMessage or a {'role', 'content'} dict)"""
+        if not isinstance(message, ChatMessage):
+            message = ChatMessage(message['role'], message['content'])
+        if self.max_messages is not None and len(self._messages) == self.max_messages:
+            self.nbytes -= self._messages[0].nbytes()
+        self._messages.append(message)
+        self.nbytes += message.nbytes()
+        self.total += 1
+
+    def __len__(self):
+        return len(self._messages)
+
+    def __iter__(self):
+        return iter(self._messages)
+
+    def __getitem__(self, index):
+        return self._messages[index]
+
+    def window(self, count):
+        """The last count retained messages, oldest first (all of them for count 0 or None)"""
+        if not count or count >= len(self._messages):
+            return list(self._messages)
+        # From the newest end, so a short window costs O(count) however long the buffer is
+        return list(islice(reversed(self._messages), count))[::-1]
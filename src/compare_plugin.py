@@ -0,0 +1,29 @@
+"""Chat plugin comparing listings side by side: "compare P001 and P003".
+
+Enable it with CHAT_PLUGINS=compare_plugin; it registers a 'compare' intent
+that needs at least one listing ID in the message.
+"""
+from handlers import reply
+
+COMPARE_PATTERN = r"\b(?:compare|comparison|versus|vs)\b"
+
+def describe(prop):
+    per_sqft = prop['price'] / prop['area_sqft'] if prop['area_sqft'] else 0
+    bedrooms = f"{prop['bedrooms']} BHK" if prop['bedrooms'] > 0 else "Studio"
+    return (f"- {prop['listing_id']} {prop['property_name']} ({prop['city']}): {prop['price']:,} {prop['price_currency']}, "
+            f"{bedrooms}, {prop['area_sqft']} sqft ({per_sqft:,.0f} {prop['price_currency']}/sqft), {prop['availability']}")
+
+def compare(engine, session, prompt, extraction):
+    found = [prop for prop in map(engine.property_helper.get_property_by_id, dict.fromkeys(extraction.listing_ids))
+             if prop is not None]
+    if len(found) < 2:
+        return reply("Give me two or more listing IDs to compare, like 'compare P001 and P003'.", 'compare')
+    lines = [f"Comparing {len(found)} properties:"] + [describe(prop) for prop in found]
+    best = min((prop for prop in found if prop['area_sqft']), key=lambda prop: prop['price'] / prop['area_sqft'],
+               default=None)
+    if best is not None:
+        lines.append(f"Best value per sqft: {best['property_name']}.")
+    return reply("\n".join(lines), 'compare')
+
+def register(registry):
+    registry.register('compare', requires=['listing_ids'], pattern=COMPARE_PATTERN)(compare)
@@ -0,0 +1,71 @@
+import asyncio
+import random
+from types import SimpleNamespace
+
+def _completion(text):
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=text))])
+
+def _chunk(text):
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])
+
+def default_reply(messages):
+    """Echo the user prompt back, the way a polish pass roughly would"""
+    return f"Here are the details: {messages[-1]['content']}"
+
+class FakeGroqClient:
+    """Local stand-in for groq.AsyncGroq for offline tests and benchmarks.
+
+    Mirrors await client.chat.completions.create(..., stream=...). The reply is
+    split into word chunks; first_token_delay is slept before the first chunk
+    and chunk_delay before every following one, so a blocking call costs the
+    sum of all delays while a streamed one delivers its first token early.
+    Failures are injected with error (always raised) or failure_rate (random).
+    """
+
+    def __init__(self, reply=None, chunk_delay=0.0, first_token_delay=0.0,
+                 error=None, failure_rate=0.0, seed=None):
+        self.reply = reply or default_reply
+        self.chunk_delay = chunk_delay
+        self.first_token_delay = first_token_delay
+        self.error = error
+        self.failure_rate = failure_rate
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._random = random.Random(seed)
+        self.chat = SimpleNamespace(completions=self)
+
+    def _chunks(self, messages):
+        text = self.reply(messages) if callable(self.reply) else self.reply
+        words = text.split(' ')
+        return [word if i == 0 else ' ' + word for i, word in enumerate(words)]
+
+    def _maybe_fail(self):
+        if self.error is not None:
+            raise self.error
+        if self.failure_rate and self._random.random() < self.failure_rate:
+            raise ConnectionError("injected upstream failure")
+
+    async def _stream(self, chunks):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            for i, chunk in enumerate(chunks):
+                await asyncio.sleep(self.first_token_delay if i == 0 else self.chunk_delay)
+                yield _chunk(chunk)
+        finally:
+            self.in_flight -= 1
+
+    async def create(self, model, messages, stream=False, **kwargs):
+        self.calls += 1
+        self._maybe_fail()
+        chunks = self._chunks(messages)
+        if stream:
+            return self._stream(chunks)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.first_token_delay + self.chunk_delay * (len(chunks) - 1))
+        finally:
+            self.in_flight -= 1
+        return _completion(''.join(chunks))
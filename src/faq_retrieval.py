@@ -0,0 +1,216 @@
+import hashlib
+import json
+import os
+import re
+from collections import Counter
+
+import numpy as np
+
+from metrics import get_logger
+
+log = get_logger('faq_retrieval')
+
+_WORD = re.compile(r"[a-z0-9]+")
+# Function words that carry no topic; question words like "where"/"when" are kept on purpose
+STOPWORDS = frozenset(
+    "a an the is are was were be been am i me my we our us you your it its of to in on for at by with "
+    "do does did can could would should will shall may might this that these those there here and or "
+    "please hi hello".split()
+)
+
+def find_faq_file():
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(os.path.dirname(current_dir), 'data', 'faqs.json')
+
+def load_faqs(path=None):
+    """FAQ entries ({key, answer, questions}) from a JSON file"""
+    with open(path or find_faq_file(), encoding='utf-8') as file:
+        return json.load(file)
+
+def faq_texts(faqs):
+    """(texts, owners): every key and question phrasing, and the FAQ each one belongs to"""
+    texts, owners = [], []
+    for position, faq in enumerate(faqs):
+        for text in [faq['key']] + list(faq.get('questions', [])):
+            texts.append(text)
+            owners.append(position)
+    return texts, np.array(owners, dtype=np.int32)
+
+def tokenize(text):
+    """Content words plus character trigrams of each word, so small typos still overlap"""
+    words = [word[:-1] if len(word) > 3 and word.endswith('s') and not word.endswith('ss') else word
+             for word in _WORD.findall(text.lower()) if word not in STOPWORDS]
+    terms = [f"w:{word}" for word in words]
+    for word in words:
+        padded = f" {word} "
+        terms.extend(f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2))
+    return terms
+
+class TfidfIndex:
+    """Sparse TF-IDF vectors stored column-wise (term -> rows, weights) in NumPy arrays.
+
+    Scoring touches only the postings of the query's terms, so it stays cheap for
+    thousands of FAQ phrasings without a dense matrix or SciPy.
+    """
+    name = 'tfidf'
+    default_min_score = 0.4
+
+    def __init__(self, vocabulary, idf, indptr, rows, weights, row_count):
+        self.vocabulary = vocabulary
+        self.idf = idf
+        self.indptr = indptr
+        self.rows = rows
+        self.weights = weights
+        self.row_count = row_count
+
+    @classmethod
+    def fit(cls, texts):
+        counts = [Counter(tokenize(text)) for text in texts]
+        document_frequency = Counter(term for count in counts for term in count)
+        vocabulary = {term: i for i, term in enumerate(sorted(document_frequency))}
+        idf = np.log((1 + len(texts)) / (1 + np.array([document_frequency[term] for term in sorted(document_frequency)],
+                                                        dtype=np.float64))) + 1
+        postings = [[] for _ in vocabulary]
+        for row, count in enumerate(counts):
+            terms = [vocabulary[term] for term in count]
+            weights = np.array([(1 + np.log(count[term])) for term in count]) * idf[terms]
+            norm = np.linalg.norm(weights) or 1.0
+            for term, weight in zip(terms, weights / norm):
+                postings[term].append((row, weight))
+        indptr = np.cumsum([0] + [len(posting) for posting in postings]).astype(np.int64)
+        rows = np.array([row for posting in postings for row, _ in posting], dtype=np.int32)
+        weights = np.array([weight for posting in postings for _, weight in posting], dtype=np.float32)
+        return cls(vocabulary, idf.astype(np.float32), indptr, rows, weights, len(texts))
+
+    def scores(self, query):
+        """Cosine similarity of query against every indexed row"""
+        scores = np.zeros(self.row_count, dtype=np.float32)
+        count = Counter(term for term in tokenize(query) if term in self.vocabulary)
+        if not count:
+            return scores
+        terms = [self.vocabulary[term] for term in count]
+        weights = np.array([(1 + np.log(count[term])) for term in count], dtype=np.float32) * self.idf[terms]
+        weights /= np.linalg.norm(weights)
+        for term, weight in zip(terms, weights):
+            start, stop = self.indptr[term], self.indptr[term + 1]
+            scores[self.rows[start:stop]] += weight * self.weights[start:stop]
+        return scores
+
+    def to_arrays(self):
+        return {
+            'vocabulary': np.array(sorted(self.vocabulary, key=self.vocabulary.get)),
+            'idf': self.idf, 'indptr': self.indptr, 'rows': self.rows, 'weights': self.weights,
+            'row_count': np.array(self.row_count),
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        vocabulary = {term: i for i, term in enumerate(arrays['vocabulary'].tolist())}
+        return cls(vocabulary, arrays['idf'], arrays['indptr'], arrays['rows'], arrays['weights'], int(arrays['row_count']))
+
+class EmbeddingIndex:
+    """Dense sentence embeddings from a small local CPU model (needs sentence-transformers)"""
+    default_min_score = 0.55
+
+    def __init__(self, model_name, matrix, model=None):
+        self.model_name = model_name
+        self.name = f"embedding:{model_name}"
+        self.matrix = matrix
+        self._model = model
+
+    @staticmethod
+    def load_model(model_name):
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(model_name, device='cpu')
+
+    @classmethod
+    def fit(cls, texts, model_name):
+        model = cls.load_model(model_name)
+        matrix = model.encode(texts, batch_size=64, normalize_embeddings=True, convert_to_numpy=True)
+        return cls(model_name, matrix.astype(np.float32), model)
+
+    def scores(self, query):
+        if self._model is None:
+            self._model = self.load_model(self.model_name)
+        vector = self._model.encode([query], normalize_embeddings=True, convert_to_numpy=True)[0]
+        return self.matrix @ vector.astype(np.float32)
+
+    def to_arrays(self):
+        return {'matrix': self.matrix}
+
+    @classmethod
+    def from_arrays(cls, arrays, model_name):
+        return cls(model_name, arrays['matrix'])
+
+def _digest(faqs, backend):
+    payload = json.dumps({'backend': backend, 'faqs': faqs}, sort_keys=True).encode('utf-8')
+    return hashlib.sha256(payload).hexdigest()
+
+class FAQRetriever:
+    """Top-k FAQ lookup by cosine similarity, answering only above a confidence threshold"""
+
+    def __init__(self, faqs, index, owners, min_score=None):
+        self.faqs = faqs
+        self.index = index
+        self.owners = owners
+        self.min_score = index.default_min_score if min_score is None else min_score
+        # Phrasings are grouped per FAQ, so a reduceat over these starts gives each FAQ's best row
+        self._starts = np.flatnonzero(np.r_[True, owners[1:] != owners[:-1]]) if len(owners) else owners
+
+    @classmethod
+    def build(cls, faqs, index_path=None, model_name=None, min_score=None):
+        """Load the persisted index if it matches faqs and the backend, else encode and save it"""
+        backend = f"embedding:{model_name}" if model_name else 'tfidf'
+        digest = _digest(faqs, backend)
+        texts, owners = faq_texts(faqs)
+        index = None
+        if index_path and os.path.exists(index_path):
+            try:
+                with np.load(index_path, allow_pickle=False) as arrays:
+                    if str(arrays['digest']) == digest:
+                        index = (EmbeddingIndex.from_arrays(arrays, model_name) if model_name
+                                 else TfidfIndex.from_arrays(arrays))
+            except Exception as e:
+                log.warning("Ignoring unreadable FAQ index %s: %s", index_path, e)
+        if index is None:
+            if model_name:
+                try:
+                    index = EmbeddingIndex.fit(texts, model_name)
+                except ImportError:
+                    log.warning("sentence-transformers is not installed; using the TF-IDF FAQ index")
+                    return cls.build(faqs, index_path, None, min_score)
+            else:
+                index = TfidfIndex.fit(texts)
+            if index_path:
+                temp_path = f"{index_path}.tmp.npz"
+                np.savez(temp_path, digest=np.array(digest), **index.to_arrays())
+                os.replace(temp_path, index_path)
+        return cls(faqs, index, owners, min_score)
+
+    def search(self, question, k=3):
+        """Up to k (faq, score) pairs, best first"""
+        if not len(self.owners):
+            return []
+        best = np.maximum.reduceat(self.index.scores(question), self._starts)
+        faq_ids = self.owners[self._starts]
+        k = min(k, len(best))
+        top = np.argpartition(-best, k - 1)[:k]
+        top = top[np.argsort(-best[top], kind='stable')]
+        return [(self.faqs[faq_ids[i]], float(best[i])) for i in top if best[i] > 0]
+
+    def answer(self, question):
+        """The best FAQ answer, or None when nothing clears min_score"""
+        matches = self.search(question, k=1)
+        if matches and matches[0][1] >= self.min_score:
+            return matches[0][0]['answer']
+        return None
+
+def retriever_from_env():
+    """FAQRetriever configured from FAQ_* environment variables"""
+    min_score = os.getenv('FAQ_MIN_SCORE')
+    return FAQRetriever.build(
+        load_faqs(os.getenv('FAQ_PATH') or None),
+        index_path=os.getenv('FAQ_INDEX_PATH', os.path.join(os.path.dirname(find_faq_file()), 'faq_index.npz')) or None,
+        model_name=os.getenv('FAQ_EMBEDDING_MODEL') or None,
+        min_score=float(min_score) if min_score else None
+    )
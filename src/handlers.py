@@ -0,0 +1,103 @@
+import importlib
+from collections import namedtuple
+
+from metrics import get_logger, timer
+
+log = get_logger('handlers')
+
+HANDLER_COSTS = ('cheap', 'expensive')
+
+# A routed turn before any LLM call: either the final response, or the property to polish
+Route = namedtuple('Route', ['response', 'prop', 'property_id', 'property_name', 'kind'])
+
+def reply(response, kind, property_id="", property_name=""):
+    """A Route answering with response as is"""
+    return Route(response, None, property_id, property_name, kind)
+
+class Handler(namedtuple('Handler', ['name', 'function', 'triggers', 'states', 'commands', 'requires', 'cost',
+                                     'pattern'])):
+    """One registered intent handler; see HandlerRegistry.register()"""
+    __slots__ = ()
+
+    def ready(self, source):
+        """True if source (the extraction, or the session for commands) holds one of the required entities"""
+        return not self.requires or any(getattr(source, name, None) for name in self.requires)
+
+class HandlerRegistry:
+    """Turn handlers, each looked up by what triggers it.
+
+    A handler is function(engine, session, prompt, extraction) returning a
+    Route. It is triggered by an intent, by the session's booking state or by
+    an exact command such as "more"; a handler with a pattern adds its own
+    intent to the extractor, so it is recognised in the same single pass as the
+    built-in ones. select() looks the turn's handler up: a state handler, else
+    a command handler whose required entities the session holds, else (after
+    one extraction pass) the handler of the extracted intent, falling back to
+    the fallback intent's handler when its required entities are missing.
+    Registering a trigger again replaces the earlier handler, so a plugin can
+    override a built-in. Every handler is timed as stage handler_<name>.
+    """
+
+    def __init__(self, fallback='faq'):
+        self.fallback = fallback
+        self.handlers = {}
+        self._intents = {}
+        self._states = {}
+        self._commands = {}
+        self.patterns = ()  # (intent, pattern) pairs for the extractor
+
+    def register(self, name, triggers=None, states=(), commands=(), requires=(), cost='cheap', pattern=None):
+        """Decorator registering function(engine, session, prompt, extraction) as handler name.
+
+        triggers are the intents it answers (default: its own name, unless it
+        only answers states or commands); requires names entities (Extraction
+        fields, or ChatSession attributes for commands) of which at least one
+        must be present; cost is 'cheap' or 'expensive' (run off the event loop
+        by ChatEngine.ahandle_turn()); pattern is a regex, matched against the
+        lowercased message, that makes name the intent.
+        """
+        if cost not in HANDLER_COSTS:
+            raise ValueError(f"cost must be one of {', '.join(HANDLER_COSTS)}")
+        if pattern is not None and not name.isidentifier():
+            raise ValueError(f"handler {name!r} needs an identifier name to add a pattern")
+        if triggers is None:
+            triggers = () if states or commands else (name,)
+
+        def decorator(function):
+            handler = Handler(name, function, tuple(triggers), tuple(states), tuple(commands), tuple(requires), cost,
+                              pattern)
+            self.handlers[name] = handler
+            self._intents.update((trigger, handler) for trigger in handler.triggers)
+            self._states.update((state, handler) for state in handler.states)
+            self._commands.update((command.lower(), handler) for command in handler.commands)
+            if pattern is not None:
+                self.patterns = tuple((intent, p) for intent, p in self.patterns if intent != name) + ((name, pattern),)
+            return function
+        return decorator
+
+    def select(self, engine, session, prompt):
+        """(handler, extraction) for one turn; extraction is None for state and command handlers"""
+        if session.booking_state is not None:
+            handler = self._states.get(session.booking_state)
+            if handler is not None:
+                return handler, None
+        handler = self._commands.get(prompt.strip().lower())
+        if handler is not None and handler.ready(session):
+            return handler, None
+        extraction = engine.property_helper.extract(prompt, intents=self.patterns)
+        handler = self._intents.get(extraction.intent)
+        if handler is None or not handler.ready(extraction):
+            handler = self._intents[self.fallback]
+        return handler, extraction
+
+    def run(self, handler, engine, session, prompt, extraction):
+        with timer(f"handler_{handler.name}"):
+            return handler.function(engine, session, prompt, extraction)
+
+def load_plugins(registry, names):
+    """Import each plugin module in names (a list or comma-separated string) and call its register(registry)"""
+    if isinstance(names, str):
+        names = names.split(',')
+    for name in filter(None, (name.strip() for name in names)):
+        importlib.import_module(name).register(registry)
+        log.info("Loaded chat plugin %s", name)
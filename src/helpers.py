@@ -1,97 +1,430 @@
-import pandas as pd
-import csv
+import asyncio
 import os
+import time
 from datetime import datetime
-from groq import Groq
 from dotenv import load_dotenv
+from llm_cache import PolishedStore, ResponseCache, make_cache_key
+from llm_gateway import GatewayError, LLMGateway
+from catalogue import InMemoryCatalogue
+from search_engine import describe_query
+from intent import IntentExtractor, extract
+from faq_retrieval import retriever_from_env
+from metrics import REGISTRY, LatencyWindow, count, get_logger, timer
+from storage import open_storage
+from write_behind import default_queue
 
 load_dotenv()
 
+log = get_logger('helpers')
+
+LLM_MODEL = "mixtral-8x7b-32768"
+LLM_TEMPERATURE = 0.3
+LLM_MAX_TOKENS = 200
+# How a property answer is rendered: the raw template, polished text already on hand (else the template), or a live LLM call
+RENDER_TIERS = ('template', 'cached', 'llm')
+POLISH_SYSTEM_PROMPT = "You are a helpful real estate assistant. Polish this property information to make it sound natural and conversational while keeping all the facts intact."
+
+def make_default_cache():
+    """Build the polish cache from LLM_CACHE_* environment variables"""
+    return ResponseCache(
+        max_entries=int(os.getenv('LLM_CACHE_SIZE', '1024')),
+        ttl=float(os.getenv('LLM_CACHE_TTL', '3600')),
+        disk_path=os.getenv('LLM_CACHE_PATH') or None
+    )
+
+def make_default_polished_store():
+    """The batch-polished text store named by POLISHED_STORE_PATH, if any"""
+    path = os.getenv('POLISHED_STORE_PATH')
+    return PolishedStore(path) if path else None
+
 class PropertyHelper:
-    def __init__(self):
-        # Get the current script directory and try to find the CSV file
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        project_root = os.path.dirname(current_dir)  # Go up one level from src/
-        
-        # Try different paths for the CSV file
-        csv_paths = [
-            os.path.join(project_root, 'data', 'properties.csv'),  # From project root
-            os.path.join(current_dir, '..', 'data', 'properties.csv'),  # Relative from src
-            'data/properties.csv',  # Current directory
-            '../data/properties.csv'  # Relative path
-        ]
-        
-        self.properties_df = None
-        
-        for path in csv_paths:
-            try:
-                if os.path.exists(path):
-                    self.properties_df = pd.read_csv(path)
-                    print(f"Successfully loaded CSV from: {path}")
-                    break
-            except Exception as e:
-                print(f"Failed to load from {path}: {e}")
-                continue
-        
-        if self.properties_df is None:
-            raise FileNotFoundError(f"Could not find properties.csv file. Tried paths: {csv_paths}")
-            
-        self.groq_client = Groq(api_key=os.getenv('GROQ_API_KEY'))
+    def __init__(self, csv_path=None, cache=None, llm=None, write_queue=None, storage=None, polished=None,
+                 render_tier=None, latency_budget=None):
+        self.render_tier = render_tier or os.getenv('RENDER_TIER', 'llm')
+        if self.render_tier not in RENDER_TIERS:
+            raise ValueError(f"unknown render tier {self.render_tier!r}; expected one of {', '.join(RENDER_TIERS)}")
+        # Seconds a property answer may take; 0 means no budget
+        self.latency_budget = (float(os.getenv('RENDER_LATENCY_BUDGET_MS', '0')) / 1000
+                               if latency_budget is None else latency_budget)
+        # Recent live polish latencies: whole replies, and the first token of streamed ones
+        self.polish_latency = {'complete': LatencyWindow(), 'stream': LatencyWindow()}
+        self._templates = {}  # listing_id -> rendered template, for the current catalogue
+        self.storage = storage if storage is not None else open_storage(csv_path)
+        self.cache = cache if cache is not None else make_default_cache()
+        self.polished = polished if polished is not None else make_default_polished_store()
+        self.catalogue = self.storage.catalogue()
+        self.llm = llm if llm is not None else LLMGateway.from_env()
+        self.write_queue = write_queue if write_queue is not None else default_queue()
+        self.write_queue.register_sink('bookings', self.storage.bookings_sink())
+        self.write_queue.register_sink('transcripts', self.storage.transcripts_sink())
+    
+    @property
+    def csv_path(self):
+        return getattr(self.storage, 'properties_path', None)
+    
+    @property
+    def properties_df(self):
+        """The in-memory catalogue DataFrame (None when the catalogue is queried from SQLite)"""
+        return getattr(self.catalogue, 'properties_df', None)
+    
+    @property
+    def id_index(self):
+        return self.catalogue.id_index
+    
+    @property
+    def name_index(self):
+        return self.catalogue.name_index
+    
+    def set_properties(self, properties_df):
+        """Swap in a new catalogue DataFrame and drop stale polish cache entries; returns the row delta.
+
+        Only added, changed and removed rows are re-indexed. The swap is a single
+        attribute assignment, so a turn that already holds the old catalogue (or
+        records from it) finishes against that consistent snapshot.
+        """
+        old_catalogue = self.catalogue
+        if hasattr(old_catalogue, 'updated'):  # in-memory, column store or SQLite (rewritten in place)
+            catalogue, delta = old_catalogue.updated(properties_df)
+        else:
+            catalogue = InMemoryCatalogue(properties_df)
+            delta = {'added': list(catalogue.id_index), 'changed': [], 'removed': []}
+        return self.swap_catalogue(catalogue, delta)
+
+    def swap_catalogue(self, catalogue, delta):
+        """Serve catalogue from now on, dropping polish cache entries and rendered templates of the rows in delta"""
+        self.catalogue = catalogue
+        self._extractors = None  # a catalogue updated in place (SQLite) may have new cities or types
+        # Copied after the swap, so a template rendered from the old catalogue meanwhile is dropped with the rest
+        templates = dict(self._templates)
+        for listing_id in delta['added'] + delta['changed'] + delta['removed']:
+            templates.pop(listing_id, None)
+        self._templates = templates
+        for listing_id in delta['changed'] + delta['removed']:
+            self.cache.invalidate_tag(listing_id)
+        return delta
+    
+    def reload_properties(self, csv_path=None):
+        """Re-read properties.csv and apply the row delta to the lookup indexes"""
+        if csv_path is not None:
+            self.storage.properties_path = csv_path
+        start = time.perf_counter()
+        delta = self.set_properties(self.storage.load_properties())
+        elapsed = time.perf_counter() - start
+        REGISTRY.observe('catalogue_reload', elapsed)
+        log.info("Reloaded %d properties from %s in %.1f ms (%d added, %d changed, %d removed)",
+                 len(self.catalogue), self.csv_path, elapsed * 1000,
+                 len(delta['added']), len(delta['changed']), len(delta['removed']))
+        return delta
         
     def get_property_by_id(self, listing_id):
         """Get property by exact listing_id match"""
-        print(f"Searching for property ID: {listing_id}")
-        print(f"Available IDs: {list(self.properties_df['listing_id'])}")
-        property_data = self.properties_df[self.properties_df['listing_id'] == listing_id]
-        print(f"Found {len(property_data)} matches")
-        return property_data.iloc[0] if not property_data.empty else None
-    
-    def get_property_by_name(self, property_name):
-        """Get property by fuzzy name matching"""
-        print(f"🔍 Searching for property name: {property_name}")
-        print(f"Available names: {list(self.properties_df['property_name'])}")
-        property_name = property_name.lower()
-        for _, row in self.properties_df.iterrows():
-            if property_name in row['property_name'].lower():
-                print(f"Found match: {row['property_name']}")
-                return row
-        print("No matches found")
-        return None
-    
-    def format_property_details(self, property_data):
-        """Format property data into a readable template"""
-        if property_data is None:
-            return "Property not found."
-        
+        with timer('lookup_id'):
+            property_data = self.catalogue.get(listing_id)
+        log.debug("Searching for property ID: %s (%s)", listing_id, 'found' if property_data is not None else 'not found')
+        return property_data
+    
+    def get_property_by_name(self, property_name, first_match=False):
+        """Get the best-ranked property for a (possibly misspelt) name.
+
+        first_match=True keeps the old behaviour: the first listing in catalogue
+        order whose name contains property_name, case-insensitively.
+        """
+        with timer('lookup_name'):
+            if first_match:
+                row = self.catalogue.first_name_match(property_name)
+            else:
+                matches = self.catalogue.search_names(property_name, k=1)
+                row = matches[0][0] if matches else None
+        log.debug("Searching for property name: %s (%s)", property_name,
+                  'no matches' if row is None else f"found {row['property_name']}")
+        return row
+    
+    def search_properties_by_name(self, property_name, k=5):
+        """Get up to k ranked (property, NameMatch) candidates for a name query"""
+        return self.catalogue.search_names(property_name, k=k)
+    
+    def extract(self, text, intents=()):
+        """Intent and entities of a message, recognising the current catalogue's cities and types.
+
+        intents are extra (intent, pattern) pairs, e.g. HandlerRegistry.patterns.
+        """
+        catalogue = self.catalogue
+        cached = getattr(self, '_extractors', None)
+        if cached is None or cached[0] is not catalogue:
+            cached = (catalogue, {})
+            self._extractors = cached
+        extractor = cached[1].get(intents)
+        if extractor is None:
+            extractor = cached[1][intents] = IntentExtractor(catalogue.search_vocabulary(), intents=intents)
+        with timer('intent'):
+            return extractor.extract(text)
+    
+    def parse_search(self, text):
+        """Turn a free-text request into a SearchQuery"""
+        return self.extract(text).query
+    
+    def search_properties(self, query, page=0, page_size=5):
+        """Structured search by city, type, availability, bedrooms, bathrooms, price and area.
+
+        query is a SearchQuery or free text such as "2BHK apartments in Dubai under 300k".
+        Returns (SearchQuery, SearchPage) so callers can ask for the next page.
+        """
+        if isinstance(query, str):
+            query = self.parse_search(query)
+        with timer('search'):
+            result = self.catalogue.search(query, page=page, page_size=page_size)
+        log.debug("Search [%s] page %d: %d matches", describe_query(query), page, result.total)
+        return query, result
+    
+    def format_search_results(self, query, result):
+        """Render one page of search results as a numbered list"""
+        if result.total == 0:
+            return f"No properties match {describe_query(query)}. Try widening the price range or dropping a filter."
+        first = result.page * result.page_size + 1
+        last = first + len(result.results) - 1
+        lines = [f"Found {result.total:,} properties ({describe_query(query)}). Showing {first}–{last}:"]
+        for number, prop in enumerate(result.results, start=first):
+            bedrooms_text = f"{prop['bedrooms']} BHK " if prop['bedrooms'] > 0 else ""
+            lines.append(f"{number}. **{prop['property_name']}** ({prop['listing_id']}) — {bedrooms_text}{prop['property_type']} "
+                         f"in {prop['city']}, {prop['area_sqft']} sqft, {prop['price']:,} {prop['price_currency']}, {prop['availability']}")
+        if last < result.total:
+            lines.append("Say 'more' to see the next results.")
+        return "\n".join(lines)
+    
+    def render_template(self, property_data):
+        """Render the deterministic property template that the LLM polishes"""
         bedrooms_text = f"{property_data['bedrooms']} BHK" if property_data['bedrooms'] > 0 else "Studio"
-        template = f"""
+        return f"""
 {property_data['property_name']} — {bedrooms_text} ({property_data['area_sqft']} sqft) in {property_data['city']}. 
 Price: {property_data['price']:,} {property_data['price_currency']}. 
 Status: {property_data['availability']}. 
 Description: {property_data['short_description']} 
 Contact: {property_data['agent_email']}
         """.strip()
+    
+    def listing_template(self, property_data):
+        """The listing's template text, rendered once per catalogue version and then reused"""
+        listing_id = property_data['listing_id']
+        templates = self._templates
+        text = templates.get(listing_id)
+        if text is None:
+            current = self.catalogue.get(listing_id)
+            # Rendered from the current catalogue, so a record held across a reload is not memoised
+            text = self.render_template(property_data if current is None else current)
+            if current is not None:
+                templates[listing_id] = text
+        return text
+
+    def choose_tier(self, tier=None, budget=None, mode='complete'):
+        """The render tier for one answer: tier (default: RENDER_TIER), lowered to 'cached'
+        while the recent p95 of live polishing (first token for mode='stream') exceeds budget seconds"""
+        tier = tier or self.render_tier
+        if tier not in RENDER_TIERS:
+            raise ValueError(f"unknown render tier {tier!r}; expected one of {', '.join(RENDER_TIERS)}")
+        budget = self.latency_budget if budget is None else budget
+        if tier == 'llm' and budget:
+            p95 = self.polish_latency[mode].quantile(0.95)
+            if p95 is not None and p95 > budget:
+                count('render_over_budget')
+                tier = 'cached'
+        count('render_tier', tier=tier)
+        return tier
+
+    def _render_offline(self, template, tier, tag):
+        """The answer for the template and cached tiers, which never wait for the LLM"""
+        if tier == 'cached':
+            key = make_cache_key(template, LLM_MODEL, LLM_TEMPERATURE)
+            stored = self._stored_polish(key)
+            if stored is not None:
+                return stored
+            # Polish in the background: the next visitor gets polished text, and the latency window stays current
+            asyncio.run_coroutine_threadsafe(self._warm_polish(template, key, tag), self.llm.loop)
+        count('polish', source='template')
+        return template
+
+    async def _warm_polish(self, text, key, tag):
+        start = time.perf_counter()
+        try:
+            polished = await self.llm.complete(**self._polish_params(text), key=key)
+        except GatewayError as e:
+            log.debug("Background polish failed: %s", e)
+            return
+        finally:
+            self.polish_latency['complete'].record(time.perf_counter() - start)
+        if polished:
+            self.cache.set(key, polished, tag=tag)
+
+    def format_property_details(self, property_data, tier=None, budget=None):
+        """Format property data into a readable answer, rendered at the chosen tier (see choose_tier())"""
+        if property_data is None:
+            return "Property not found."
         
-        return self.polish_with_llm(template)
+        template = self.listing_template(property_data)
+        tier = self.choose_tier(tier, budget)
+        if tier != 'llm':
+            return self._render_offline(template, tier, property_data['listing_id'])
+        return self.polish_with_llm(template, tag=property_data['listing_id'])
     
-    def polish_with_llm(self, text):
-        """Use Groq to polish the response"""
+    def stream_property_details(self, property_data, tier=None, budget=None):
+        """Like format_property_details, but yields the polished text chunk by chunk"""
+        if property_data is None:
+            yield "Property not found."
+            return
+        
+        template = self.listing_template(property_data)
+        tier = self.choose_tier(tier, budget, mode='stream')
+        if tier != 'llm':
+            yield self._render_offline(template, tier, property_data['listing_id'])
+            return
+        yield from self.polish_with_llm_stream(template, tag=property_data['listing_id'])
+    
+    async def aformat_property_details(self, property_data, tier=None, budget=None):
+        """format_property_details() for async callers: awaits the LLM instead of blocking the thread"""
+        if property_data is None:
+            return "Property not found."
+        template = self.listing_template(property_data)
+        tier = self.choose_tier(tier, budget)
+        if tier != 'llm':
+            return self._render_offline(template, tier, property_data['listing_id'])
+        return await self.apolish_with_llm(template, tag=property_data['listing_id'])
+    
+    async def astream_property_details(self, property_data, tier=None, budget=None):
+        """stream_property_details() for async callers"""
+        if property_data is None:
+            yield "Property not found."
+            return
+        template = self.listing_template(property_data)
+        tier = self.choose_tier(tier, budget, mode='stream')
+        if tier != 'llm':
+            yield self._render_offline(template, tier, property_data['listing_id'])
+            return
+        async for token in self.apolish_with_llm_stream(template, tag=property_data['listing_id']):
+            yield token
+    
+    def _polish_messages(self, text):
+        return [
+            {"role": "system", "content": POLISH_SYSTEM_PROMPT},
+            {"role": "user", "content": text}
+        ]
+    
+    def _polish_params(self, text):
+        return dict(messages=self._polish_messages(text), model=LLM_MODEL, temperature=LLM_TEMPERATURE,
+                    max_tokens=LLM_MAX_TOKENS)
+    
+    def _stored_polish(self, key):
+        """Polished text from the batch store, else from the response cache"""
+        if self.polished is not None:
+            stored = self.polished.get(key)
+            if stored is not None:
+                count('polish', source='batch_store')
+                return stored
+        cached = self.cache.get(key)
+        if cached is not None:
+            count('polish', source='cache')
+        return cached
+
+    def _polish_failed(self, error):
+        count('polish', source='fallback')
+        log.warning("LLM polish skipped: %s", error)
+
+    def _polished(self, key, polished, tag):
+        count('polish', source='llm')
+        if polished:
+            self.cache.set(key, polished, tag=tag)
+
+    def polish_with_llm(self, text, tag=None):
+        """Use Groq to polish the response, serving batch-polished text and repeats without a call.
+
+        Concurrent calls for the same text share one in-flight request (the cache key is the gateway's key).
+        """
+        key = make_cache_key(text, LLM_MODEL, LLM_TEMPERATURE)
+        cached = self._stored_polish(key)
+        if cached is not None:
+            return cached
+        start = time.perf_counter()
+        try:
+            with timer('polish_llm'):
+                polished = self.llm.complete_sync(**self._polish_params(text), key=key)
+        except GatewayError as e:
+            self._polish_failed(e)
+            return text  # Fallback to original text if API fails or the circuit is open
+        finally:
+            self.polish_latency['complete'].record(time.perf_counter() - start)
+        self._polished(key, polished, tag)
+        return polished
+    
+    async def apolish_with_llm(self, text, tag=None):
+        """polish_with_llm() for async callers"""
+        key = make_cache_key(text, LLM_MODEL, LLM_TEMPERATURE)
+        cached = self._stored_polish(key)
+        if cached is not None:
+            return cached
+        start = time.perf_counter()
+        try:
+            with timer('polish_llm'):
+                polished = await self.llm.complete_async(**self._polish_params(text), key=key)
+        except GatewayError as e:
+            self._polish_failed(e)
+            return text
+        finally:
+            self.polish_latency['complete'].record(time.perf_counter() - start)
+        self._polished(key, polished, tag)
+        return polished
+    
+    def polish_with_llm_stream(self, text, tag=None):
+        """Streaming polish: yield tokens as Groq produces them, caching the assembled text"""
+        key = make_cache_key(text, LLM_MODEL, LLM_TEMPERATURE)
+        cached = self._stored_polish(key)
+        if cached is not None:
+            yield cached
+            return
+        parts = []
+        start = time.perf_counter()
+        try:
+            for token in self.llm.stream_sync(**self._polish_params(text), key=key):
+                if not parts:
+                    REGISTRY.observe('polish_first_token', time.perf_counter() - start)
+                    self.polish_latency['stream'].record(time.perf_counter() - start)
+                parts.append(token)
+                yield token
+        except GatewayError as e:
+            if not parts:  # a failure before the first token counts as waiting that long for it
+                self.polish_latency['stream'].record(time.perf_counter() - start)
+            self._polish_failed(e)
+            if not parts:
+                yield text  # Fallback to original text if API fails or the circuit is open
+            return
+        REGISTRY.observe('polish_llm', time.perf_counter() - start)
+        self._polished(key, ''.join(parts), tag)
+    
+    async def apolish_with_llm_stream(self, text, tag=None):
+        """polish_with_llm_stream() for async callers"""
+        key = make_cache_key(text, LLM_MODEL, LLM_TEMPERATURE)
+        cached = self._stored_polish(key)
+        if cached is not None:
+            yield cached
+            return
+        parts = []
+        start = time.perf_counter()
         try:
-            completion = self.groq_client.chat.completions.create(
-                model="mixtral-8x7b-32768",
-                messages=[
-                    {"role": "system", "content": "You are a helpful real estate assistant. Polish this property information to make it sound natural and conversational while keeping all the facts intact."},
-                    {"role": "user", "content": text}
-                ],
-                temperature=0.3,
-                max_tokens=200
-            )
-            return completion.choices[0].message.content
-        except Exception as e:
-            return text  # Fallback to original text if API fails
+            async for token in self.llm.stream_async(**self._polish_params(text), key=key):
+                if not parts:
+                    REGISTRY.observe('polish_first_token', time.perf_counter() - start)
+                    self.polish_latency['stream'].record(time.perf_counter() - start)
+                parts.append(token)
+                yield token
+        except GatewayError as e:
+            if not parts:  # a failure before the first token counts as waiting that long for it
+                self.polish_latency['stream'].record(time.perf_counter() - start)
+            self._polish_failed(e)
+            if not parts:
+                yield text
+            return
+        REGISTRY.observe('polish_llm', time.perf_counter() - start)
+        self._polished(key, ''.join(parts), tag)
     
     def save_visit_booking(self, name, phone, property_id="", property_name="", user_message=""):
-        """Save visit booking to CSV"""
+        """Queue a visit booking for the background writer to append to visits.csv"""
         visit_data = {
             'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
             'listing_id': property_id,
@@ -100,58 +433,22 @@ Contact: {property_data['agent_email']}
             'phone': phone,
             'user_message': user_message
         }
-        
-        # Try different paths for the visits CSV file
-        visits_paths = ['data/visits.csv', '../data/visits.csv', 'src/data/visits.csv']
-        visits_file = None
-        
-        for path in visits_paths:
-            if os.path.exists(path):
-                visits_file = path
-                break
-        
-        if visits_file is None:
-            visits_file = 'data/visits.csv'  # Default fallback
-        file_exists = os.path.exists(visits_file)
-        
-        with open(visits_file, 'a', newline='', encoding='utf-8') as file:
-            fieldnames = ['timestamp', 'listing_id', 'property_name', 'name', 'phone', 'user_message']
-            writer = csv.DictWriter(file, fieldnames=fieldnames)
-            
-            if not file_exists:
-                writer.writeheader()
-            writer.writerow(visit_data)
+        self.write_queue.submit('bookings', visit_data)
 
 class FAQHelper:
-    def __init__(self):
-        self.faqs = {
-            "office location": "Our office is located at 123 Business District, Mumbai, India.",
-            "working hours": "We are open Monday to Friday, 9:00 AM to 6:00 PM IST.",
-            "contact": "You can reach us at info@zorever.com or call +91-123-456-7890.",
-            "about": "Zorever EcomTech Pvt Ltd is a leading real estate technology company helping people find their dream properties.",
-            "services": "We offer property buying, selling, renting, and consultation services across major Indian cities."
-        }
+    def __init__(self, retriever=None):
+        self.retriever = retriever if retriever is not None else retriever_from_env()
+        self.faqs = {faq['key']: faq['answer'] for faq in self.retriever.faqs}
     
     def get_faq_answer(self, question):
-        """Get FAQ answer based on keywords"""
-        question_lower = question.lower()
-        for key, answer in self.faqs.items():
-            if key in question_lower:
-                return answer
-        return None
+        """Get FAQ answer: a literal key match first, then the closest FAQ by meaning"""
+        with timer('faq'):
+            question_lower = question.lower()
+            for key, answer in self.faqs.items():
+                if key in question_lower:
+                    return answer
+            return self.retriever.answer(question)
 
 def detect_intent(user_input):
-    """Detect user intent from input"""
-    user_input_lower = user_input.lower()
-    
-    # Check for booking intent
-    booking_keywords = ['book visit', 'schedule visit', 'visit booking', 'book a visit', 'schedule a visit']
-    if any(keyword in user_input_lower for keyword in booking_keywords):
-        return 'booking'
-    
-    # Check for property query (contains P followed by digits or property names)
-    if 'P0' in user_input.upper() or any(word in user_input_lower for word in ['apartment', 'villa', 'studio', 'office', 'cottage', 'house']):
-        return 'property_query'
-    
-    # Default to FAQ
-    return 'faq'
+    """Detect user intent from input: 'booking', 'property_query', 'search' or 'faq'"""
+    return extract(user_input).intent
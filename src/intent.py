@@ -0,0 +1,180 @@
+import os
+import re
+from collections import namedtuple
+
+from search_engine import make_query
+
+# Listing IDs in the catalogue's format (P001, P-0042). Other formats are configured with
+# LISTING_ID_PATTERN, e.g. \b[a-z]{1,3}-?\d{3,}\b for APT-1042 or VL2041; a looser default would
+# also take words such as max1000 or sq1200 for IDs
+DEFAULT_ID_PATTERN = r"\bp-?\d{3,}\b"
+
+_MULTIPLIERS = {
+    'k': 1e3, 'thousand': 1e3, 'm': 1e6, 'mn': 1e6, 'million': 1e6,
+    'l': 1e5, 'lakh': 1e5, 'lakhs': 1e5, 'cr': 1e7, 'crore': 1e7, 'crores': 1e7,
+}
+_AREA_UNIT = r"\s*(?:sq\.?\s*ft|sqft|square\s+feet|sq\s*feet)"
+_ROOM_UNIT = r"(?:bhk|bed(?:room)?s?|br|bath(?:room)?s?)\b"
+_UPPER = r"(?:under|below|less\s+than|cheaper\s+than|smaller\s+than|up\s+to|upto|at\s+most|max(?:imum)?|within|no\s+more\s+than)"
+_LOWER = r"(?:over|above|more\s+than|at\s+least|min(?:imum)?|from|starting\s+(?:at|from)|bigger\s+than|larger\s+than)"
+_UPPER_RE = re.compile(_UPPER)
+_PROPERTY_WORDS = r"apartment|villa|studio|office|cottage|house|flat|penthouse|bungalow|duplex"
+# What may follow a plural property word in a search ("villas in Pune", "flats under 300k")
+_PLURAL_CONTEXT = re.compile(r"\s+(?:in|under|below|over|above|with|near|for|that|between|from)\b")
+# Everyday words for catalogue labels, used when the label exists in the catalogue
+_SYNONYMS = {'property_type': {'flat': 'apartment', 'shop': 'commercial', 'home': 'house'}}
+_SEARCH_COLUMNS = ('city', 'availability')
+
+def _amount_pattern(name):
+    return rf"(?P<{name}>\d+(?:[.,]\d+)*)\s*(?P<{name}_unit>k|m|mn|million|thousand|lakhs?|l|cr|crores?)?\b"
+
+def _amount(match, name):
+    value = float(match.group(name).replace(',', ''))
+    return value * _MULTIPLIERS.get(match.group(f"{name}_unit") or '', 1)
+
+class Extraction(namedtuple('Extraction', ['intent', 'listing_ids', 'names', 'categories', 'ranges', 'sort_by', 'descending'])):
+    """Intent plus every entity found in one message"""
+    __slots__ = ()
+
+    @property
+    def query(self):
+        """The search constraints as a SearchQuery"""
+        return make_query(self.ranges, self.categories, self.sort_by or 'price', self.descending)
+
+class IntentExtractor:
+    """Single-pass intent and entity extraction.
+
+    Every keyword and pattern is compiled once into one alternation of named
+    groups, and a single finditer() over the message yields booking phrases,
+    listing IDs, property-name spans, catalogue labels (cities, types,
+    availability), price/area/room constraints and sort words. Categorical
+    labels come from the catalogue vocabulary when one is given, so new cities
+    need no code change. intents adds (intent, pattern) pairs, such as those of
+    plugin handlers: the first one that matches becomes the intent, unless the
+    message asks for a booking. id_pattern (default: LISTING_ID_PATTERN, else
+    DEFAULT_ID_PATTERN) matches listing IDs in the lowercased message.
+    """
+
+    def __init__(self, vocabulary=None, id_pattern=None, intents=()):
+        id_pattern = id_pattern or os.getenv('LISTING_ID_PATTERN') or DEFAULT_ID_PATTERN
+        self._vocabulary = {col: dict(labels) for col, labels in (vocabulary or {}).items()}
+        for col, synonyms in _SYNONYMS.items():
+            labels = self._vocabulary.get(col, {})
+            for word, target in synonyms.items():
+                if target in labels and word not in labels:
+                    labels[word] = labels[target]
+
+        tokens = [
+            ('booking', r"\b(?:book(?:ing)?\s+(?:a\s+)?visit|schedule\s+(?:a\s+)?visit|visit\s+booking)\b"),
+            *((f"intent_{intent}", pattern) for intent, pattern in intents),
+            ('between', rf"\b(?:between|from)\s*\$?{_amount_pattern('low')}\s*(?:and|to|-)\s*\$?{_amount_pattern('high')}"
+                        rf"(?:(?P<between_area>{_AREA_UNIT})|\s*(?P<between_rooms>{_ROOM_UNIT}))?"),
+            ('rooms_at_least', rf"\b(?:at\s+least|min(?:imum)?)\s+(?P<min_rooms>\d+)\s*(?P<min_rooms_unit>{_ROOM_UNIT})"),
+            ('bound', rf"\b(?P<bound_op>{_UPPER}|{_LOWER})\s*\$?{_amount_pattern('bound_value')}(?!\s*\+?\s*{_ROOM_UNIT})(?P<bound_area>{_AREA_UNIT})?"),
+            ('rooms', rf"\b(?P<room_count>\d+)\s*(?P<rooms_plus>\+)?\s*(?P<rooms_unit>{_ROOM_UNIT})"),
+            ('cheapest', r"\b(?:cheapest|lowest\s+price|least\s+expensive|most\s+affordable)\b"),
+            ('priciest', r"\b(?:most\s+expensive|priciest|highest\s+price|luxur(?:y|ious))\b"),
+            ('largest', r"\b(?:largest|biggest|most\s+spacious)\b"),
+            ('smallest', r"\b(?:smallest|most\s+compact)\b"),
+            ('listing_id', f"(?i:{id_pattern})"),
+            # The name is captured in a lookahead so the words inside it are still tokenised
+            ('name', r"\b(?:price\s+of|details\s+(?:for|of|about)|information\s+(?:about|on)|info\s+(?:about|on)|tell\s+me\s+about)\s+(?=(?P<name_text>[^?!\n]+))"),
+            ('faq_topic', r"\b(?:office\s+(?:location|located|address|hours|timings?)|working\s+hours|contact\s+(?:info|details|number)|(?:home\s+)?loans?|mortgages?)\b"),
+            ('list_verb', r"\b(?:show|list|find|search|any|what|which)\b(?=.*\b(?:properties|listings|homes)\b)"),
+        ]
+        for col, labels in self._vocabulary.items():
+            if labels:
+                alternatives = '|'.join(sorted(map(re.escape, labels), key=len, reverse=True))
+                tokens.append((f"cat_{col}", rf"\b(?P<label_{col}>{alternatives})(?:e?s)?\b"))
+        tokens.append(('property_word', rf"\b(?:{_PROPERTY_WORDS})s?\b"))
+        self.tokens = tokens
+        # Matching runs over lowercased text and is only attempted where a word starts,
+        # which keeps the one alternation cheaper than the separate scans it replaces
+        alternation = '|'.join(f"(?P<{name}>{pattern})" for name, pattern in tokens)
+        self._pattern = re.compile(rf"(?<!\w)(?=[\w$])(?:{alternation})")
+
+    def extract(self, text):
+        listing_ids, names, categories, ranges = [], [], {}, {}
+        sort_by, descending = None, False
+        booking = faq_topic = list_verb = plural_search = property_word = False
+        custom = None
+
+        lowered = text.lower()
+        # Spans are cut from the original text unless lowercasing changed its length
+        original = text if len(lowered) == len(text) else lowered
+        for match in self._pattern.finditer(lowered):
+            kind = match.lastgroup
+            if kind == 'booking':
+                booking = True
+            elif kind == 'listing_id':
+                listing_ids.append(original[match.start():match.end()].upper())
+            elif kind == 'name':
+                names.append(original[match.start('name_text'):match.end('name_text')].strip().rstrip('.').strip())
+            elif kind == 'between':
+                rooms = match.group('between_rooms')
+                if rooms:
+                    col = 'bathrooms' if rooms.startswith('bath') else 'bedrooms'
+                    ranges[col] = (int(_amount(match, 'low')), int(_amount(match, 'high')))
+                else:
+                    col = 'area_sqft' if match.group('between_area') else 'price'
+                    ranges[col] = (_amount(match, 'low'), _amount(match, 'high'))
+            elif kind == 'bound':
+                col = 'area_sqft' if match.group('bound_area') else 'price'
+                value = _amount(match, 'bound_value')
+                low, high = ranges.get(col, (None, None))
+                if _UPPER_RE.fullmatch(match.group('bound_op')):
+                    ranges[col] = (low, value)
+                else:
+                    ranges[col] = (value, high)
+            elif kind == 'rooms_at_least':
+                col = 'bathrooms' if match.group('min_rooms_unit').startswith('bath') else 'bedrooms'
+                ranges[col] = (int(match.group('min_rooms')), None)
+            elif kind == 'rooms':
+                col = 'bathrooms' if match.group('rooms_unit').startswith('bath') else 'bedrooms'
+                count = int(match.group('room_count'))
+                ranges[col] = (count, None if match.group('rooms_plus') else count)
+            elif kind in ('cheapest', 'priciest', 'largest', 'smallest'):
+                if sort_by is None:
+                    sort_by = 'price' if kind in ('cheapest', 'priciest') else 'area_sqft'
+                    descending = kind in ('priciest', 'largest')
+            elif kind == 'faq_topic':
+                faq_topic = True
+            elif kind == 'list_verb':
+                list_verb = True
+            elif kind.startswith('intent_'):
+                custom = custom or kind[7:]
+            else:
+                # A catalogue label or a generic property word
+                if kind.startswith('cat_'):
+                    col = kind[4:]
+                    label = self._vocabulary[col][match.group(f"label_{col}")]
+                    categories[col] = categories.get(col, ()) + (() if label in categories.get(col, ()) else (label,))
+                if kind == 'property_word' or kind == 'cat_property_type':
+                    property_word = True
+                    if match.group().endswith('s') and _PLURAL_CONTEXT.match(lowered, match.end()):
+                        plural_search = True
+
+        if booking:
+            intent = 'booking'
+        elif custom:
+            intent = custom
+        elif listing_ids:
+            intent = 'property_query'
+        elif (ranges or sort_by or list_verb or plural_search
+              or (not names and any(col in categories for col in _SEARCH_COLUMNS))):
+            intent = 'search'
+        elif names or (property_word and not faq_topic):
+            intent = 'property_query'
+        else:
+            intent = 'faq'
+        return Extraction(intent, listing_ids, names, categories, ranges, sort_by, descending)
+
+    def parse(self, text):
+        """Just the search constraints of text, as a SearchQuery"""
+        return self.extract(text).query
+
+_default_extractor = IntentExtractor()
+
+def extract(text):
+    """Extract with the catalogue-independent default patterns"""
+    return _default_extractor.extract(text)
@@ -0,0 +1,295 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+def make_cache_key(text, model, temperature):
+    """Stable hash of everything that determines a polished completion"""
+    payload = json.dumps([model, temperature, text], ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+class MemoryCache:
+    """Thread-safe in-memory LRU with per-entry TTL"""
+
+    def __init__(self, max_entries=1024, ttl=3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (value, expires_at, tag)
+        self._tags = {}
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _drop(self, key):
+        _, _, tag = self._entries.pop(key)
+        if tag is not None:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[1] is not None and entry[1] <= time.time():
+                self._drop(key)
+                self.expirations += 1
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, key, value, tag=None, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.time() + ttl if ttl else None
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (value, expires_at, tag)
+            if tag is not None:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+
+    def invalidate_tag(self, tag):
+        """Drop every entry stored under tag; returns how many were removed"""
+        with self._lock:
+            keys = list(self._tags.get(tag, ()))
+            for key in keys:
+                self._drop(key)
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+
+class SQLiteCache:
+    """On-disk cache backend so polished text survives app restarts"""
+
+    def __init__(self, path, max_entries=100000, ttl=7 * 24 * 3600):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.evictions = 0
+        self.expirations = 0
+        self._lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS llm_cache ('
+            'key TEXT PRIMARY KEY, value TEXT NOT NULL, tag TEXT, '
+            'expires_at REAL, accessed_at REAL NOT NULL)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_llm_cache_tag ON llm_cache(tag)')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_llm_cache_accessed ON llm_cache(accessed_at)')
+        self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM llm_cache').fetchone()[0]
+
+    def get(self, key):
+        entry = self.get_entry(key)
+        return None if entry is None else entry[0]
+
+    def get_entry(self, key):
+        """(value, tag) stored under key, or None"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute('SELECT value, tag, expires_at FROM llm_cache WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return None
+            if row[2] is not None and row[2] <= now:
+                self._conn.execute('DELETE FROM llm_cache WHERE key = ?', (key,))
+                self._conn.commit()
+                self.expirations += 1
+                return None
+            self._conn.execute('UPDATE llm_cache SET accessed_at = ? WHERE key = ?', (now, key))
+            self._conn.commit()
+            return row[0], row[1]
+
+    def set(self, key, value, tag=None, ttl=None):
+        now = time.time()
+        ttl = self.ttl if ttl is None else ttl
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO llm_cache (key, value, tag, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)',
+                (key, value, tag, now + ttl if ttl else None, now)
+            )
+            overflow = self._conn.execute('SELECT COUNT(*) FROM llm_cache').fetchone()[0] - self.max_entries
+            if overflow > 0:
+                self._conn.execute(
+                    'DELETE FROM llm_cache WHERE key IN '
+                    '(SELECT key FROM llm_cache ORDER BY accessed_at LIMIT ?)', (overflow,)
+                )
+                self.evictions += overflow
+            self._conn.commit()
+
+    def delete(self, key):
+        with self._lock:
+            self._conn.execute('DELETE FROM llm_cache WHERE key = ?', (key,))
+            self._conn.commit()
+
+    def invalidate_tag(self, tag):
+        with self._lock:
+            removed = self._conn.execute('DELETE FROM llm_cache WHERE tag = ?', (tag,)).rowcount
+            self._conn.commit()
+            return removed
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute('DELETE FROM llm_cache')
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+class ResponseCache:
+    """In-memory LRU/TTL cache for polished text, optionally backed by SQLite.
+
+    Entries can carry a tag (the listing_id) so that everything cached for a
+    listing is dropped when its row changes.
+    """
+
+    def __init__(self, max_entries=1024, ttl=3600, disk_path=None, disk_ttl=7 * 24 * 3600):
+        self.memory = MemoryCache(max_entries=max_entries, ttl=ttl)
+        self.disk = SQLiteCache(disk_path, ttl=disk_ttl) if disk_path else None
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        value = self.memory.get(key)
+        if value is None and self.disk is not None:
+            entry = self.disk.get_entry(key)
+            if entry is not None:
+                # Keep the tag, so invalidate_tag() still reaches the promoted copy
+                value, tag = entry
+                self.memory.set(key, value, tag=tag)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key, value, tag=None):
+        self.memory.set(key, value, tag=tag)
+        if self.disk is not None:
+            self.disk.set(key, value, tag=tag)
+
+    def invalidate_tag(self, tag):
+        removed = self.memory.invalidate_tag(tag)
+        if self.disk is not None:
+            removed = max(removed, self.disk.invalidate_tag(tag))
+        self.invalidations += removed
+        return removed
+
+    def clear(self):
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    def stats(self):
+        """Hit/miss/eviction counters for monitoring"""
+        stats = {
+            'hits': self.hits,
+            'misses': self.misses,
+            'invalidations': self.invalidations,
+            'memory_entries': len(self.memory),
+            'memory_evictions': self.memory.evictions,
+            'memory_expirations': self.memory.expirations,
+        }
+        if self.disk is not None:
+            stats.update({
+                'disk_entries': len(self.disk),
+                'disk_evictions': self.disk.evictions,
+                'disk_expirations': self.disk.expirations,
+            })
+        return stats
+
+class PolishedStore:
+    """Polished text precomputed for the whole catalogue by src/batch_polish.py.
+
+    Rows are keyed by make_cache_key() of the rendered template, i.e. by the
+    content of the fields the template shows, so an edited listing simply stops
+    matching and is polished on demand until the next batch run. Entries do not
+    expire; the batch job prunes the ones no listing renders to any more.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS polished ('
+            'key TEXT PRIMARY KEY, listing_id TEXT, value TEXT NOT NULL, polished_at REAL NOT NULL)'
+        )
+        self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM polished').fetchone()[0]
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute('SELECT value FROM polished WHERE key = ?', (key,)).fetchone()
+        return None if row is None else row[0]
+
+    def existing(self, keys, chunk_size=500):
+        """The subset of keys that already have polished text"""
+        keys = list(keys)
+        found = set()
+        with self._lock:
+            for start in range(0, len(keys), chunk_size):
+                chunk = keys[start:start + chunk_size]
+                found.update(key for (key,) in self._conn.execute(
+                    f"SELECT key FROM polished WHERE key IN ({', '.join('?' * len(chunk))})", chunk))
+        return found
+
+    def put_many(self, rows):
+        """Store (key, listing_id, text) rows in one transaction"""
+        now = time.time()
+        with self._lock:
+            with self._conn:
+                self._conn.executemany(
+                    'INSERT OR REPLACE INTO polished (key, listing_id, value, polished_at) VALUES (?, ?, ?, ?)',
+                    ((key, listing_id, value, now) for key, listing_id, value in rows)
+                )
+
+    def prune(self, current_keys):
+        """Delete entries whose key is not in current_keys; returns how many were removed"""
+        with self._lock:
+            with self._conn:
+                self._conn.execute('CREATE TEMP TABLE IF NOT EXISTS current_keys (key TEXT PRIMARY KEY)')
+                self._conn.execute('DELETE FROM current_keys')
+                self._conn.executemany('INSERT OR IGNORE INTO current_keys (key) VALUES (?)',
+                                       ((key,) for key in current_keys))
+                removed = self._conn.execute(
+                    'DELETE FROM polished WHERE key NOT IN (SELECT key FROM current_keys)').rowcount
+                self._conn.execute('DELETE FROM current_keys')
+            return removed
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
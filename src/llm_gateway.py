@@ -0,0 +1,529 @@
+import asyncio
+import concurrent.futures
+import os
+import queue
+import random
+import re
+import threading
+import time
+from contextlib import asynccontextmanager
+
+from metrics import count
+
+class GatewayError(Exception):
+    """The LLM request failed, timed out or was refused by the circuit breaker"""
+
+class CircuitOpenError(GatewayError):
+    """The provider is considered unhealthy; callers should fall back immediately"""
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker.
+
+    closed -> open after failure_threshold failures in a row; open -> half_open
+    once reset_timeout has passed, letting a single trial request through;
+    half_open -> closed on success or straight back to open on failure.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """True if a request may go upstream now"""
+        with self._lock:
+            if self.state == 'open' and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = 'half_open'
+                self._trial_in_flight = False
+            if self.state == 'closed':
+                return True
+            if self.state == 'half_open' and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = 'closed'
+            self.failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == 'half_open' or self.failures >= self.failure_threshold:
+                self.state = 'open'
+                self.opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+    def release(self):
+        """Give back an allowed request that ended with no verdict (never sent, or cancelled)"""
+        with self._lock:
+            self._trial_in_flight = False
+
+BATCH_INSTRUCTIONS = ("Several listings follow, each after a line '### Listing <n>'. Treat each one separately and "
+                      "reply with every polished listing after the same '### Listing <n>' line.")
+_BATCH_MARKER = re.compile(r'^###\s*Listing\s+(\d+)\s*$', re.MULTILINE)
+
+def pack_batch(texts):
+    """One user prompt holding several jobs' texts, each after a numbered marker"""
+    parts = ["Polish each listing below."]
+    parts.extend(f"### Listing {i}\n{text}" for i, text in enumerate(texts, 1))
+    return "\n\n".join(parts)
+
+def split_batch(reply, jobs):
+    """{job number: text} for the numbered sections found in a batched reply (0-based job numbers)"""
+    markers = list(_BATCH_MARKER.finditer(reply))
+    sections = {}
+    for marker, following in zip(markers, markers[1:] + [None]):
+        number = int(marker.group(1)) - 1
+        text = reply[marker.end():following.start() if following else len(reply)].strip()
+        if 0 <= number < jobs and text and number not in sections:
+            sections[number] = text
+    return sections
+
+class SharedStream:
+    """One upstream token stream replayed to every caller that asked for the same completion.
+
+    Callers that join late first get the tokens produced so far, then follow
+    live; all of them see the same end (or the same error).
+    """
+
+    def __init__(self):
+        self.tokens = []
+        self.done = False
+        self.error = None
+        self.followers = 0
+        self.task = None
+        self._changed = asyncio.Event()
+
+    def _wake(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def put(self, token):
+        self.tokens.append(token)
+        self._wake()
+
+    def finish(self, error=None):
+        self.done = True
+        self.error = error
+        self._wake()
+
+    async def follow(self):
+        index = 0
+        while True:
+            if index < len(self.tokens):
+                yield self.tokens[index]
+                index += 1
+            elif self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            else:
+                await self._changed.wait()
+
+def make_groq_client(max_connections):
+    """AsyncGroq on one pooled httpx client; retries are handled by the gateway"""
+    import httpx
+    from groq import AsyncGroq
+    limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+    return AsyncGroq(
+        api_key=os.getenv('GROQ_API_KEY'),
+        max_retries=0,
+        http_client=httpx.AsyncClient(limits=limits)
+    )
+
+class LLMGateway:
+    """Async, concurrency-limited access to the chat completion API.
+
+    All requests run on one background event loop shared by every Streamlit
+    session, so they share a single connection pool and concurrency semaphore.
+    Each request gets a deadline covering all of its retry attempts and its
+    waits for a concurrency slot, and a circuit breaker rejects requests
+    immediately while the provider is failing.
+    Synchronous callers use complete_sync()/stream_sync(), and coroutines on
+    another event loop (e.g. a web server's) use complete_async()/stream_async().
+
+    Requests passed a key are single-flight: while one is in flight, identical
+    requests (same key) wait for its result, or follow its token stream,
+    instead of calling upstream again. With batch_window > 0, distinct
+    non-streamed requests of the form [system, user] that share a system prompt
+    and parameters are held for up to batch_window seconds and sent as one
+    request of up to max_batch jobs, whose reply is split back per job; a job
+    missing from the reply is retried on its own.
+    """
+
+    def __init__(self, client=None, max_concurrency=8, timeout=10.0, retries=2,
+                 backoff=0.25, breaker=None, client_factory=make_groq_client,
+                 coalesce=True, batch_window=0.0, max_batch=8):
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.breaker = breaker or CircuitBreaker()
+        self.coalesce = coalesce
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self._client = client
+        self._client_factory = client_factory
+        self._loop = None
+        self._semaphore = None
+        self._lock = threading.Lock()
+        # Only touched on the gateway's loop
+        self._in_flight = {}  # key -> Task of the shared completion
+        self._streams = {}  # key -> SharedStream
+        self._batches = {}  # (system prompt, params) -> [(text, future, deadline)]
+
+    @classmethod
+    def from_env(cls, **kwargs):
+        """Gateway configured from LLM_* environment variables"""
+        return cls(
+            max_concurrency=int(os.getenv('LLM_MAX_CONCURRENCY', '8')),
+            timeout=float(os.getenv('LLM_TIMEOUT', '10')),
+            retries=int(os.getenv('LLM_RETRIES', '2')),
+            coalesce=os.getenv('LLM_COALESCE', '1') != '0',
+            batch_window=float(os.getenv('LLM_BATCH_WINDOW_MS', '0')) / 1000,
+            max_batch=int(os.getenv('LLM_BATCH_MAX', '8')),
+            **kwargs
+        )
+
+    @property
+    def loop(self):
+        """The gateway's event loop, started on a daemon thread on first use"""
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name='llm-gateway', daemon=True).start()
+                self._loop = loop
+            return self._loop
+
+    def _get_client(self):
+        if self._client is None:
+            self._client = self._client_factory(self.max_concurrency)
+        return self._client
+
+    def _get_semaphore(self):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    def _check_breaker(self):
+        if not self.breaker.allow():
+            raise CircuitOpenError("LLM circuit breaker is open")
+
+    @asynccontextmanager
+    async def _slot(self, deadline, attempt):
+        """Hold a concurrency slot, waiting for one no longer than the deadline; yields the seconds left"""
+        semaphore = self._get_semaphore()
+        try:
+            await asyncio.wait_for(semaphore.acquire(), deadline - time.monotonic())
+        except asyncio.TimeoutError:
+            raise GatewayError(f"LLM deadline passed before attempt {attempt + 1} was sent") from None
+        try:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise GatewayError(f"LLM deadline passed before attempt {attempt + 1} was sent")
+            yield remaining
+        finally:
+            semaphore.release()
+
+    async def _backoff(self, attempt, deadline):
+        """Sleep with full jitter; False if the deadline leaves no room for another attempt"""
+        delay = random.uniform(0, self.backoff * 2 ** attempt)
+        if time.monotonic() + delay >= deadline:
+            return False
+        await asyncio.sleep(delay)
+        return True
+
+    async def complete(self, messages, timeout=None, key=None, **params):
+        """Return the completion text; requests with the same key share one upstream call"""
+        timeout = timeout or self.timeout
+        if key is None or not self.coalesce:
+            return await self._schedule(messages, timeout, params)
+        task = self._in_flight.get(key)
+        if task is not None:
+            count('llm_coalesced', kind='complete')
+            count('llm_calls_saved', reason='coalesced')
+        else:
+            task = asyncio.ensure_future(self._schedule(messages, timeout, params))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        # Shielded: a caller that gives up must not cancel the call for the others
+        return await asyncio.shield(task)
+
+    def _batchable(self, messages, params):
+        return (self.batch_window > 0 and len(messages) == 2 and messages[0]['role'] == 'system'
+                and messages[1]['role'] == 'user')
+
+    async def _schedule(self, messages, timeout, params):
+        """Send the request upstream, or add it to the open batch for its prompt and parameters"""
+        if not self._batchable(messages, params):
+            return await self._complete(messages, timeout, params)
+        batch_key = (messages[0]['content'], tuple(sorted(params.items())))
+        future = asyncio.get_running_loop().create_future()
+        jobs = self._batches.get(batch_key)
+        if jobs is None:
+            jobs = self._batches[batch_key] = []
+            asyncio.get_running_loop().call_later(self.batch_window, self._flush, batch_key, jobs)
+        jobs.append((messages[1]['content'], future, time.monotonic() + timeout))
+        if len(jobs) >= self.max_batch:
+            self._flush(batch_key, jobs)
+        return await future
+
+    def _flush(self, batch_key, jobs):
+        """Close a batch (once its window ends or it is full) and send it"""
+        if self._batches.get(batch_key) is not jobs:
+            return  # already flushed because it filled up
+        del self._batches[batch_key]
+        asyncio.ensure_future(self._run_batch(batch_key, jobs))
+
+    async def _run_batch(self, batch_key, jobs):
+        system, params = batch_key
+        params = dict(params)
+        jobs = [job for job in jobs if not job[1].done()]
+        if not jobs:
+            return
+        timeout = min(deadline for _, _, deadline in jobs) - time.monotonic()
+        if len(jobs) == 1:
+            text, future, _ = jobs[0]
+            await self._settle(future, self._complete(
+                [{"role": "system", "content": system}, {"role": "user", "content": text}], timeout, params))
+            return
+        messages = [{"role": "system", "content": f"{system}\n\n{BATCH_INSTRUCTIONS}"},
+                    {"role": "user", "content": pack_batch([text for text, _, _ in jobs])}]
+        if params.get('max_tokens'):
+            params['max_tokens'] *= len(jobs)
+        try:
+            reply = await self._complete(messages, timeout, params)
+        except GatewayError as e:
+            for _, future, _ in jobs:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        sections = split_batch(reply, len(jobs))
+        count('llm_batched', len(sections))
+        count('llm_calls_saved', max(len(sections) - 1, 0), reason='batched')
+        retries = []
+        for number, (text, future, deadline) in enumerate(jobs):
+            if future.done():
+                continue
+            if number in sections:
+                future.set_result(sections[number])
+            else:
+                count('llm_batch_misses')
+                retries.append(self._settle(future, self._complete(
+                    [{"role": "system", "content": system}, {"role": "user", "content": text}],
+                    deadline - time.monotonic(), dict(batch_key[1]))))
+        await asyncio.gather(*retries)
+
+    async def _settle(self, future, coroutine):
+        """Resolve future with the outcome of coroutine"""
+        try:
+            result = await coroutine
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+        else:
+            if not future.done():
+                future.set_result(result)
+
+    async def _complete(self, messages, timeout, params):
+        """One upstream completion, retried with jittered backoff until the deadline"""
+        count('llm_upstream_calls', kind='complete')
+        deadline = time.monotonic() + timeout
+        attempt = 0
+        while True:
+            self._check_breaker()
+            recorded = False
+            try:
+                async with self._slot(deadline, attempt) as remaining:
+                    completion = await asyncio.wait_for(
+                        self._get_client().chat.completions.create(messages=messages, **params),
+                        remaining
+                    )
+                recorded = True
+                self.breaker.record_success()
+                return completion.choices[0].message.content
+            except (asyncio.CancelledError, GatewayError):
+                raise
+            except Exception as e:
+                recorded = True
+                self.breaker.record_failure()
+                if attempt >= self.retries or not await self._backoff(attempt, deadline):
+                    raise GatewayError(f"LLM request failed after {attempt + 1} attempt(s): {e!r}") from e
+                attempt += 1
+            finally:
+                if not recorded:
+                    # Out of time before sending, or cancelled: no verdict on the upstream, but a
+                    # half-open trial must be handed back or the breaker would never let another through
+                    self.breaker.release()
+
+    async def stream(self, messages, timeout=None, key=None, **params):
+        """Yield completion tokens; streams with the same key share one upstream stream"""
+        timeout = timeout or self.timeout
+        if key is None or not self.coalesce:
+            async for token in self._stream(messages, timeout, params):
+                yield token
+            return
+        shared = self._streams.get(key)
+        if shared is not None:
+            count('llm_coalesced', kind='stream')
+            count('llm_calls_saved', reason='coalesced')
+        else:
+            shared = self._streams[key] = SharedStream()
+            shared.task = asyncio.ensure_future(self._pump(key, shared, messages, timeout, params))
+        shared.followers += 1
+        try:
+            async for token in shared.follow():
+                yield token
+        finally:
+            shared.followers -= 1
+            if shared.followers == 0 and not shared.done:
+                shared.task.cancel()  # nobody is listening any more
+
+    async def _pump(self, key, shared, messages, timeout, params):
+        try:
+            async for token in self._stream(messages, timeout, params):
+                shared.put(token)
+            shared.finish()
+        except asyncio.CancelledError:
+            shared.finish(GatewayError("LLM stream cancelled"))
+        except Exception as e:
+            shared.finish(e)
+        finally:
+            if self._streams.get(key) is shared:
+                del self._streams[key]
+
+    async def _stream(self, messages, timeout, params):
+        """One upstream stream; only retried while nothing has been yielded yet"""
+        count('llm_upstream_calls', kind='stream')
+        deadline = time.monotonic() + timeout
+        attempt = 0
+        while True:
+            self._check_breaker()
+            started = recorded = False
+            try:
+                async with self._slot(deadline, attempt) as remaining:
+                    stream = await asyncio.wait_for(
+                        self._get_client().chat.completions.create(messages=messages, stream=True, **params),
+                        remaining
+                    )
+                    iterator = stream.__aiter__()
+                    while True:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            raise asyncio.TimeoutError()
+                        try:
+                            chunk = await asyncio.wait_for(iterator.__anext__(), remaining)
+                        except StopAsyncIteration:
+                            break
+                        token = chunk.choices[0].delta.content
+                        if token:
+                            started = True
+                            yield token
+                recorded = True
+                self.breaker.record_success()
+                return
+            except (asyncio.CancelledError, GatewayError):
+                raise
+            except Exception as e:
+                recorded = True
+                self.breaker.record_failure()
+                if started or attempt >= self.retries or not await self._backoff(attempt, deadline):
+                    raise GatewayError(f"LLM stream failed after {attempt + 1} attempt(s): {e!r}") from e
+                attempt += 1
+            finally:
+                if not recorded:
+                    # Also reached when the reader closes the stream early
+                    self.breaker.release()
+
+    def complete_sync(self, messages, timeout=None, **params):
+        """Blocking complete() for the Streamlit script thread"""
+        timeout = timeout or self.timeout
+        future = asyncio.run_coroutine_threadsafe(self.complete(messages, timeout=timeout, **params), self.loop)
+        try:
+            # The coroutine enforces the deadline itself; the margin only guards a wedged loop
+            # (and the wait for a batch window to close)
+            return future.result(timeout + self.batch_window + 1.0)
+        except concurrent.futures.TimeoutError as e:
+            future.cancel()
+            raise GatewayError("LLM request timed out") from e
+
+    def stream_sync(self, messages, timeout=None, **params):
+        """Blocking generator over stream() tokens for the Streamlit script thread"""
+        timeout = timeout or self.timeout
+        tokens = queue.Queue()
+
+        async def pump():
+            try:
+                async for token in self.stream(messages, timeout=timeout, **params):
+                    tokens.put(('token', token))
+                tokens.put(('done', None))
+            except BaseException as e:
+                tokens.put(('error', e))
+                raise
+
+        future = asyncio.run_coroutine_threadsafe(pump(), self.loop)
+        deadline = time.monotonic() + timeout + 1.0
+        try:
+            while True:
+                try:
+                    kind, value = tokens.get(timeout=max(deadline - time.monotonic(), 0.0))
+                except queue.Empty:
+                    raise GatewayError("LLM stream timed out") from None
+                if kind == 'token':
+                    yield value
+                elif kind == 'error':
+                    if isinstance(value, GatewayError):
+                        raise value
+                    raise GatewayError(f"LLM stream failed: {value!r}") from value
+                else:
+                    return
+        finally:
+            future.cancel()
+
+    async def complete_async(self, messages, timeout=None, **params):
+        """complete() awaited from another event loop; the request still runs on the gateway's loop"""
+        future = asyncio.run_coroutine_threadsafe(self.complete(messages, timeout=timeout, **params), self.loop)
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+
+    async def stream_async(self, messages, timeout=None, **params):
+        """stream() iterated from another event loop, tokens handed over as they arrive"""
+        caller = asyncio.get_running_loop()
+        tokens = asyncio.Queue()
+
+        def put(item):
+            caller.call_soon_threadsafe(tokens.put_nowait, item)
+
+        async def pump():
+            try:
+                async for token in self.stream(messages, timeout=timeout, **params):
+                    put(('token', token))
+                put(('done', None))
+            except BaseException as e:
+                put(('error', e))
+                raise
+
+        future = asyncio.run_coroutine_threadsafe(pump(), self.loop)
+        try:
+            while True:
+                kind, value = await tokens.get()
+                if kind == 'token':
+                    yield value
+                elif kind == 'error':
+                    if isinstance(value, GatewayError):
+                        raise value
+                    raise GatewayError(f"LLM stream failed: {value!r}") from value
+                else:
+                    return
+        finally:
+            future.cancel()
@@ -0,0 +1,347 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Upper bounds (seconds) of the buckets exported to Prometheus; the histogram itself is much finer
+PROMETHEUS_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+QUANTILES = (0.5, 0.9, 0.99)
+
+class LatencyHistogram:
+    """HDR-style log-linear histogram of durations, in whole microseconds.
+
+    Every power-of-two range is split into 2**sub_bucket_bits equal buckets, so
+    any recorded value is known to within 1/2**sub_bucket_bits (about 3% with
+    the default 5 bits) from 1 µs up to max_seconds, in a fixed list of counts.
+    Recording is an int conversion, a bit_length() and one list increment.
+    """
+
+    def __init__(self, sub_bucket_bits=5, max_seconds=3600):
+        self.sub_bucket_bits = sub_bucket_bits
+        self.sub_buckets = 1 << sub_bucket_bits
+        self.max_value = int(max_seconds * 1e6)
+        self.counts = [0] * (self._index(self.max_value) + 1)
+        self.total = 0
+        self.sum_us = 0
+        self.max_us = 0
+        self._lock = threading.Lock()
+
+    def _index(self, value):
+        shift = max(0, value.bit_length() - self.sub_bucket_bits - 1)
+        return shift * self.sub_buckets + (value >> shift)
+
+    def _upper_bound(self, index):
+        """Largest value (µs) that lands in bucket index"""
+        if index < 2 * self.sub_buckets:
+            return index
+        shift, top = divmod(index, self.sub_buckets)
+        shift -= 1
+        top += self.sub_buckets
+        return ((top + 1) << shift) - 1
+
+    def record(self, seconds):
+        value = min(max(int(seconds * 1e6), 0), self.max_value)
+        index = self._index(value)
+        with self._lock:
+            self.counts[index] += 1
+            self.total += 1
+            self.sum_us += value
+            if value > self.max_us:
+                self.max_us = value
+
+    def quantiles(self, quantiles=QUANTILES):
+        """{q: seconds} upper-bound estimates for each quantile q in [0, 1]"""
+        with self._lock:
+            counts, total = list(self.counts), self.total
+        results = {}
+        if not total:
+            return {q: 0.0 for q in quantiles}
+        targets = sorted((max(1, int(round(q * total))), q) for q in quantiles)
+        seen = 0
+        position = 0
+        for index, count in enumerate(counts):
+            if not count:
+                continue
+            seen += count
+            while position < len(targets) and seen >= targets[position][0]:
+                results[targets[position][1]] = min(self._upper_bound(index), self.max_us) / 1e6
+                position += 1
+            if position == len(targets):
+                break
+        return results
+
+    def cumulative(self, bounds=PROMETHEUS_BUCKETS):
+        """Counts of values at or below each bound (seconds), for Prometheus buckets"""
+        with self._lock:
+            counts = list(self.counts)
+        results = []
+        index = 0
+        running = 0
+        for bound in bounds:
+            limit = int(bound * 1e6)
+            while index < len(counts) and self._upper_bound(index) <= limit:
+                running += counts[index]
+                index += 1
+            results.append(running)
+        return results
+
+    def snapshot(self):
+        with self._lock:
+            return {'count': self.total, 'sum': self.sum_us / 1e6, 'max': self.max_us / 1e6}
+
+class LatencyWindow:
+    """The last size durations of one operation, for decisions that should follow its recent behaviour.
+
+    Unlike a LatencyHistogram, which keeps every sample since start-up, old
+    samples fall out, so quantile() recovers once the operation speeds up again.
+    """
+
+    def __init__(self, size=200, min_samples=20):
+        self.min_samples = min_samples
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._samples)
+
+    def record(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def quantile(self, q):
+        """The q-quantile of the window in seconds, or None until min_samples have been recorded"""
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples or len(samples) < self.min_samples:
+            return None
+        return samples[min(int(q * len(samples)), len(samples) - 1)]
+
+class _Timer:
+    __slots__ = ('_histogram', '_start')
+
+    def __init__(self, histogram):
+        self._histogram = histogram
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._histogram.record(time.perf_counter() - self._start)
+        return False
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL_TIMER = _NullTimer()
+
+def _label_text(labels):
+    return ','.join(f'{name}="{value}"' for name, value in labels)
+
+class Metrics:
+    """Per-stage latency histograms and labelled counters for one process.
+
+    timer(stage) is a context manager around a hot-path stage; count() bumps a
+    counter. With enabled=False both are no-ops, so instrumentation can stay in
+    place at no cost. gauge() registers a function read only when the metrics
+    are rendered, for levels such as live sessions.
+    """
+
+    def __init__(self, enabled=True, prefix='zorever'):
+        self.enabled = enabled
+        self.prefix = prefix
+        self._histograms = {}
+        self._counters = {}
+        self._gauges = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, stage):
+        histogram = self._histograms.get(stage)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(stage, LatencyHistogram())
+        return histogram
+
+    def timer(self, stage):
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self.histogram(stage))
+
+    def observe(self, stage, seconds):
+        if self.enabled:
+            self.histogram(stage).record(seconds)
+
+    def count(self, name, value=1, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def gauge(self, name, function, **labels):
+        """Report function() as gauge name (replacing any gauge registered with the same labels)"""
+        with self._lock:
+            self._gauges[(name, tuple(sorted(labels.items())))] = function
+
+    def gauges(self):
+        """{(name, labels): current value}"""
+        with self._lock:
+            functions = dict(self._gauges)
+        values = {}
+        for key, function in functions.items():
+            try:
+                values[key] = function()
+            except Exception as e:
+                get_logger('metrics').warning("Gauge %s failed: %s", key[0], e)
+        return values
+
+    def stage_summary(self):
+        """[{stage, count, mean, p50, p90, p99, max}] in seconds, for the admin panel"""
+        rows = []
+        for stage, histogram in sorted(self._histograms.items()):
+            snapshot = histogram.snapshot()
+            quantiles = histogram.quantiles()
+            rows.append({
+                'stage': stage, 'count': snapshot['count'],
+                'mean': snapshot['sum'] / snapshot['count'] if snapshot['count'] else 0.0,
+                'p50': quantiles[0.5], 'p90': quantiles[0.9], 'p99': quantiles[0.99], 'max': snapshot['max'],
+            })
+        return rows
+
+    def counters(self):
+        """{(name, labels): value}"""
+        with self._lock:
+            return dict(self._counters)
+
+    def render_prometheus(self):
+        """Everything in the Prometheus text exposition format"""
+        lines = []
+        name = f"{self.prefix}_stage_seconds"
+        lines.append(f"# HELP {name} Latency of each chat turn stage.")
+        lines.append(f"# TYPE {name} histogram")
+        for stage, histogram in sorted(self._histograms.items()):
+            snapshot = histogram.snapshot()
+            for bound, count in zip(PROMETHEUS_BUCKETS, histogram.cumulative()):
+                lines.append(f'{name}_bucket{{stage="{stage}",le="{bound}"}} {count}')
+            lines.append(f'{name}_bucket{{stage="{stage}",le="+Inf"}} {snapshot["count"]}')
+            lines.append(f'{name}_sum{{stage="{stage}"}} {snapshot["sum"]:.6f}')
+            lines.append(f'{name}_count{{stage="{stage}"}} {snapshot["count"]}')
+        quantile_name = f"{self.prefix}_stage_quantile_seconds"
+        lines.append(f"# HELP {quantile_name} Latency quantiles of each stage, from the fine-grained histogram.")
+        lines.append(f"# TYPE {quantile_name} gauge")
+        for stage, histogram in sorted(self._histograms.items()):
+            for quantile, seconds in sorted(histogram.quantiles().items()):
+                lines.append(f'{quantile_name}{{stage="{stage}",quantile="{quantile}"}} {seconds:.6f}')
+        typed = set()
+        for (counter, labels), value in sorted(self.counters().items()):
+            counter_name = f"{self.prefix}_{counter}_total"
+            if counter_name not in typed:
+                typed.add(counter_name)
+                lines.append(f"# TYPE {counter_name} counter")
+            label_text = _label_text(labels)
+            lines.append(f"{counter_name}{{{label_text}}} {value}" if label_text else f"{counter_name} {value}")
+        for (gauge, labels), value in sorted(self.gauges().items()):
+            gauge_name = f"{self.prefix}_{gauge}"
+            if gauge_name not in typed:
+                typed.add(gauge_name)
+                lines.append(f"# TYPE {gauge_name} gauge")
+            label_text = _label_text(labels)
+            lines.append(f"{gauge_name}{{{label_text}}} {value}" if label_text else f"{gauge_name} {value}")
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path):
+        """Write the exposition atomically, e.g. for node_exporter's textfile collector"""
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            file.write(self.render_prometheus())
+        os.replace(temp_path, path)
+
+def metrics_from_env():
+    """Metrics enabled unless METRICS=0"""
+    return Metrics(enabled=os.getenv('METRICS', '1') != '0')
+
+REGISTRY = metrics_from_env()
+
+def timer(stage):
+    return REGISTRY.timer(stage)
+
+def count(name, value=1, **labels):
+    REGISTRY.count(name, value, **labels)
+
+class MetricsExporter:
+    """Publishes a registry as a Prometheus text file every interval seconds and/or over HTTP"""
+
+    def __init__(self, registry=REGISTRY, path=None, port=None, interval=15.0, host='127.0.0.1'):
+        self.registry = registry
+        self.path = path
+        self.interval = interval
+        self.server = None
+        self._stop = threading.Event()
+        if port is not None:
+            registry_ref = registry
+
+            class Handler(BaseHTTPRequestHandler):
+                def do_GET(self):
+                    if self.path.rstrip('/') not in ('', '/metrics'):
+                        self.send_error(404)
+                        return
+                    body = registry_ref.render_prometheus().encode('utf-8')
+                    self.send_response(200)
+                    self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+                def log_message(self, *args):
+                    pass  # scrapes are not worth a log line each
+
+            self.server = ThreadingHTTPServer((host, port), Handler)
+            threading.Thread(target=self.server.serve_forever, name='metrics-http', daemon=True).start()
+        if path:
+            threading.Thread(target=self._write_loop, name='metrics-file', daemon=True).start()
+
+    def _write_loop(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.registry.write_prometheus(self.path)
+            except OSError as e:
+                get_logger('metrics').warning("Writing metrics to %s failed: %s", self.path, e)
+
+    def stop(self):
+        self._stop.set()
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+
+def start_exporter(registry=REGISTRY):
+    """Exporter configured from METRICS_PATH / METRICS_PORT / METRICS_INTERVAL, or None when neither is set"""
+    path = os.getenv('METRICS_PATH') or None
+    port = os.getenv('METRICS_PORT')
+    if not path and not port:
+        return None
+    return MetricsExporter(registry, path=path, port=int(port) if port else None,
+                           interval=float(os.getenv('METRICS_INTERVAL', '15')))
+
+_logging_configured = False
+
+def get_logger(name):
+    """Leveled logger under 'zorever', writing to stderr at LOG_LEVEL (default INFO)"""
+    global _logging_configured
+    if not _logging_configured:
+        root = logging.getLogger('zorever')
+        if not root.handlers:
+            handler = logging.StreamHandler()
+            handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+            root.addHandler(handler)
+        root.setLevel(os.getenv('LOG_LEVEL', 'INFO').upper())
+        root.propagate = False
+        _logging_configured = True
+    return logging.getLogger(f'zorever.{name}')
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""One-shot migration of properties.csv and visits.csv into the SQLite store.
+
+visits.csv mixes two row layouts: chat transcripts written by save_user_query
+(8 columns, with email/user_query/bot_response) and visit bookings written by
+save_visit_booking (6 columns, with user_message). Rows are routed to the
+transcripts or bookings table by their column count. Re-running it replaces
+the properties table with the CSV's rows, deleting listings no longer in it.
+
+Usage: python src/migrate_to_sqlite.py --db data/zorever.db [--properties data/properties.csv] [--visits data/visits.csv]
+"""
+import argparse
+import csv
+import os
+import sys
+
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from storage import SQLiteStorage, find_properties_file
+from transcript import BOOKING_FIELDS, TRANSCRIPT_FIELDS, find_visits_file
+
+def split_visits(visits_path):
+    """Split visits.csv rows into (transcripts, bookings, skipped) by layout"""
+    transcripts, bookings, skipped = [], [], 0
+    with open(visits_path, newline='', encoding='utf-8') as file:
+        for row in csv.reader(file):
+            if not row or row[0] == 'timestamp':
+                continue  # blank line or a header row
+            if len(row) == len(TRANSCRIPT_FIELDS):
+                transcripts.append(dict(zip(TRANSCRIPT_FIELDS, row)))
+            elif len(row) == len(BOOKING_FIELDS):
+                bookings.append(dict(zip(BOOKING_FIELDS, row)))
+            else:
+                skipped += 1
+    return transcripts, bookings, skipped
+
+def migrate(db_path, properties_path=None, visits_path=None, reset_visits=False):
+    """Copy the CSV data into db_path; returns a dict of row counts"""
+    storage = SQLiteStorage(db_path)
+    counts = {'properties': 0, 'transcripts': 0, 'bookings': 0, 'skipped': 0}
+
+    if properties_path is None:
+        properties_path = next((path for path in find_properties_file() if os.path.exists(path)), None)
+    if properties_path:
+        counts['properties'] = storage.replace_properties(pd.read_csv(properties_path))
+
+    visits_path = visits_path or find_visits_file()
+    if os.path.exists(visits_path):
+        conn = storage._conn()
+        existing = sum(conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] for table in ('transcripts', 'bookings'))
+        if existing and not reset_visits:
+            raise SystemExit(f"{db_path} already has {existing} visit rows; pass --reset-visits to re-import them")
+        with conn:
+            conn.execute('DELETE FROM transcripts')
+            conn.execute('DELETE FROM bookings')
+        transcripts, bookings, counts['skipped'] = split_visits(visits_path)
+        storage.insert_rows('transcripts', TRANSCRIPT_FIELDS, transcripts)
+        storage.insert_rows('bookings', BOOKING_FIELDS, bookings)
+        counts['transcripts'] = len(transcripts)
+        counts['bookings'] = len(bookings)
+
+    storage.close()
+    return counts
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--db', required=True, help="SQLite database to create or update")
+    parser.add_argument('--properties', help="properties.csv (default: the usual data/ locations)")
+    parser.add_argument('--visits', help="visits.csv (default: the usual data/ locations)")
+    parser.add_argument('--reset-visits', action='store_true', help="replace bookings/transcripts already in the database")
+    args = parser.parse_args()
+
+    counts = migrate(args.db, args.properties, args.visits, args.reset_visits)
+    print(f"Migrated {counts['properties']} properties, {counts['transcripts']} transcripts and "
+          f"{counts['bookings']} bookings into {args.db} ({counts['skipped']} unrecognised rows skipped)")
+    print(f"Start the app with SQLITE_DB_PATH={args.db} to use it")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,301 @@
+import copy
+import re
+from bisect import bisect_left
+from collections import namedtuple
+from itertools import chain
+
+import numpy as np
+
+NameMatch = namedtuple('NameMatch', ['key', 'name', 'score', 'kind'])
+
+_NON_WORD = re.compile(r'[\W_]+')
+
+# Score bands so that better match kinds always outrank worse ones
+EXACT_SCORE = 1.0
+PREFIX_SCORE = 0.9
+WORD_SCORE = 0.8
+SUBSTRING_SCORE = 0.7
+FUZZY_MAX_SCORE = 0.6
+
+def normalize_name(name):
+    """Lowercase a property name and collapse punctuation/whitespace runs to single spaces"""
+    if not isinstance(name, str):
+        return ''
+    return _NON_WORD.sub(' ', name.lower()).strip()
+
+def _trigram_codes(data):
+    """Integer codes of every byte trigram in data"""
+    return {(data[i] << 16) | (data[i + 1] << 8) | data[i + 2] for i in range(len(data) - 2)}
+
+class Permuted:
+    """Read-only sequence view of column in the order given by positions"""
+    __slots__ = ('_column', '_positions')
+
+    def __init__(self, column, positions):
+        self._column = column
+        self._positions = positions
+
+    def __len__(self):
+        return len(self._positions)
+
+    def __getitem__(self, position):
+        return self._column[int(self._positions[position])]
+
+class NameIndex:
+    """Trigram inverted index over normalized property names.
+
+    Each entry is a (name, key) pair, where key is whatever the caller uses to
+    fetch the row (the listing_id for PropertyHelper). Entry ids follow the order
+    the names were given in, so catalogue order is preserved for tie-breaks and
+    for the first-match compatibility mode.
+
+    An index is never modified after it is built: with_changes() returns a new
+    index that shares the trigram postings and layers tombstones and a small
+    list of appended entries on top, so readers of the old index are unaffected.
+    """
+
+    # Appended entries are scanned linearly; past this many, rebuild instead
+    MAX_EXTRA_ENTRIES = 1024
+
+    def __init__(self, names, keys, fuzzy_threshold=0.3):
+        self.fuzzy_threshold = fuzzy_threshold
+        self._dead = frozenset()
+        self._extra_ids = ()
+        self._raw = list(names)
+        self._keys = list(keys)
+        self._names = [normalize_name(name) for name in self._raw]
+        if len(self._raw) != len(self._keys):
+            raise ValueError("names and keys must have the same length")
+
+        order = sorted(range(len(self._names)), key=self._names.__getitem__)
+        self._sorted_names = [self._names[i] for i in order]
+        self._sorted_ids = np.array(order, dtype=np.int32)
+        self._build_postings()
+
+    def __len__(self):
+        return len(self._keys) - len(self._dead)
+
+    def to_arrays(self):
+        """The built index as NumPy arrays, for saving next to a columnar catalogue"""
+        if self._dead or self._extra_ids:
+            raise ValueError("only a freshly built index can be saved")
+        codes = sorted(self._postings)
+        return {
+            'sorted_ids': self._sorted_ids,
+            'post_ids': self._post_ids,
+            'post_codes': np.array(codes, dtype=np.int64),
+            'post_bounds': np.array([self._postings[code] for code in codes], dtype=np.int64).reshape(-1, 2),
+            'trigram_counts': self._trigram_counts,
+        }
+
+    @classmethod
+    def from_arrays(cls, names, normalized_names, keys, arrays, fuzzy_threshold=0.3):
+        """Reopen a saved index over sequence-like columns (e.g. memory-mapped) without rebuilding it"""
+        index = cls.__new__(cls)
+        index.fuzzy_threshold = fuzzy_threshold
+        index._dead = frozenset()
+        index._extra_ids = ()
+        index._raw = names
+        index._keys = keys
+        index._names = normalized_names
+        index._sorted_ids = arrays['sorted_ids']
+        index._sorted_names = Permuted(normalized_names, index._sorted_ids)
+        index._post_ids = arrays['post_ids']
+        index._trigram_counts = arrays['trigram_counts']
+        index._postings = dict(zip(arrays['post_codes'].tolist(), map(tuple, arrays['post_bounds'].tolist())))
+        return index
+
+    def _entries_named(self, name):
+        """Live entry ids whose normalized name equals name"""
+        start = bisect_left(self._sorted_names, name)
+        entries = []
+        for position in range(start, len(self._sorted_names)):
+            if self._sorted_names[position] != name:
+                break
+            entries.append(int(self._sorted_ids[position]))
+        entries.extend(entry_id for entry_id in self._extra_ids if self._names[entry_id] == name)
+        return [entry_id for entry_id in entries if entry_id not in self._dead]
+
+    def with_changes(self, removed=(), added=()):
+        """New index with the (key, name) pairs in removed dropped and those in added appended"""
+        dead = set(self._dead)
+        for key, name in removed:
+            dead.update(entry_id for entry_id in self._entries_named(normalize_name(name)) if self._keys[entry_id] == key)
+        added = list(added)
+        start = len(self._keys)
+        extra_ids = [entry_id for entry_id in self._extra_ids if entry_id not in dead]
+        extra_ids.extend(range(start, start + len(added)))
+        if len(extra_ids) > max(self.MAX_EXTRA_ENTRIES, len(self._sorted_names) // 20):
+            live = [entry_id for entry_id in range(start) if entry_id not in dead]
+            return NameIndex(
+                [self._raw[entry_id] for entry_id in live] + [name for _, name in added],
+                [self._keys[entry_id] for entry_id in live] + [key for key, _ in added],
+                self.fuzzy_threshold
+            )
+
+        index = copy.copy(self)
+        index._raw = self._raw + [name for _, name in added]
+        index._keys = self._keys + [key for key, _ in added]
+        index._names = self._names + [normalize_name(name) for _, name in added]
+        index._dead = frozenset(dead)
+        index._extra_ids = tuple(extra_ids)
+        return index
+
+    def _build_postings(self):
+        """Vectorised build of trigram -> sorted entry id postings"""
+        count = len(self._names)
+        # Names are indexed space-padded so word boundaries become trigrams too
+        encoded = [f" {name} ".encode('utf-8') for name in self._names]
+        lengths = np.fromiter(map(len, encoded), dtype=np.int64, count=count)
+        self._trigram_counts = np.maximum(lengths - 2, 1).astype(np.int32)
+        if count == 0:
+            self._post_ids = np.zeros(0, dtype=np.int32)
+            self._postings = {}
+            return
+
+        buf = np.frombuffer(b''.join(encoded), dtype=np.uint8).astype(np.int64)
+        ends = np.cumsum(lengths)
+        entry = np.repeat(np.arange(count, dtype=np.int64), lengths)[:-2]
+        positions = np.arange(len(buf) - 2, dtype=np.int64)
+        valid = positions + 2 < ends[entry]
+        codes = (buf[:-2] << 16) | (buf[1:-1] << 8) | buf[2:]
+
+        # One sort of (code, entry) pairs both groups postings and dedupes them
+        pairs = np.unique(codes[valid] * count + entry[valid])
+        pair_codes = pairs // count
+        self._post_ids = (pairs % count).astype(np.int32)
+        bounds = np.flatnonzero(np.diff(pair_codes)) + 1
+        starts = np.concatenate(([0], bounds))
+        stops = np.concatenate((bounds, [len(pairs)]))
+        self._postings = {
+            int(code): (int(start), int(stop))
+            for code, start, stop in zip(pair_codes[starts], starts, stops)
+        }
+
+    def _posting(self, code):
+        start, stop = self._postings[code]
+        return self._post_ids[start:stop]
+
+    def _substring_candidates(self, query):
+        """Entry ids whose name may contain query, in entry order (None means every entry)"""
+        codes = _trigram_codes(query.encode('utf-8'))
+        if not codes:
+            return None
+        if any(code not in self._postings for code in codes):
+            return np.zeros(0, dtype=np.int32)
+        postings = sorted((self._posting(code) for code in codes), key=len)
+        candidates = postings[0]
+        for posting in postings[1:]:
+            if len(candidates) <= 64:
+                break
+            hits = np.searchsorted(posting, candidates)
+            hits[hits == len(posting)] = 0
+            candidates = candidates[posting[hits] == candidates]
+        return candidates
+
+    def _classify(self, entry_id, query):
+        """Score a verified substring hit"""
+        name = self._names[entry_id]
+        if name == query:
+            return EXACT_SCORE, 'exact'
+        if name.startswith(query):
+            return PREFIX_SCORE, 'prefix'
+        if f" {query}" in name:
+            return WORD_SCORE, 'word'
+        return SUBSTRING_SCORE, 'substring'
+
+    def _prefix_hits(self, query, limit):
+        start = bisect_left(self._sorted_names, query)
+        hits = []
+        for position in range(start, len(self._sorted_names)):
+            if len(hits) >= limit or not self._sorted_names[position].startswith(query):
+                break
+            entry_id = int(self._sorted_ids[position])
+            if entry_id not in self._dead:
+                hits.append(entry_id)
+        hits.extend(entry_id for entry_id in self._extra_ids if self._names[entry_id].startswith(query))
+        return hits
+
+    def _fuzzy_hits(self, query, limit, max_postings=50000):
+        """Typo-tolerant candidates ranked by trigram Dice similarity"""
+        query_codes = _trigram_codes(f" {query} ".encode('utf-8'))
+        postings = sorted((self._posting(code) for code in query_codes if code in self._postings), key=len)
+        selected = []
+        total = 0
+        # Rare trigrams carry the signal; stop before very common ones blow up the merge
+        for posting in postings:
+            if selected and total + len(posting) > max_postings:
+                break
+            selected.append(posting)
+            total += len(posting)
+        if not selected:
+            return []
+
+        ids, overlaps = np.unique(np.concatenate(selected), return_counts=True)
+        scores = 2 * overlaps / (len(query_codes) + self._trigram_counts[ids])
+        keep = np.flatnonzero(scores >= self.fuzzy_threshold)
+        if len(keep) > limit:
+            keep = keep[np.argpartition(-scores[keep], limit - 1)[:limit]]
+        return [(float(scores[i]) * FUZZY_MAX_SCORE, int(ids[i])) for i in keep if int(ids[i]) not in self._dead]
+
+    def _extra_fuzzy_hits(self, query):
+        """Dice similarity for entries appended since the build, which have no postings"""
+        query_codes = _trigram_codes(f" {query} ".encode('utf-8'))
+        hits = []
+        for entry_id in self._extra_ids:
+            codes = _trigram_codes(f" {self._names[entry_id]} ".encode('utf-8'))
+            score = 2 * len(query_codes & codes) / (len(query_codes) + max(len(codes), 1))
+            if score >= self.fuzzy_threshold:
+                hits.append((score * FUZZY_MAX_SCORE, entry_id))
+        return hits
+
+    def search(self, query, k=5, fuzzy=True):
+        """Return up to k NameMatch results ranked exact > prefix > word > substring > fuzzy"""
+        query = normalize_name(query)
+        if not query or k <= 0:
+            return []
+        oversample = max(k * 4, 16)
+        scored = {}
+
+        for entry_id in self._prefix_hits(query, oversample):
+            scored[entry_id] = self._classify(entry_id, query)
+
+        if len(scored) < oversample:
+            candidates = self._substring_candidates(query)
+            if candidates is None:
+                candidates = range(len(self._sorted_names))
+            found = 0
+            for entry_id in candidates:
+                entry_id = int(entry_id)
+                if entry_id not in scored and entry_id not in self._dead and query in self._names[entry_id]:
+                    scored[entry_id] = self._classify(entry_id, query)
+                    found += 1
+                    if found >= oversample:
+                        break
+            for entry_id in self._extra_ids:
+                if entry_id not in scored and query in self._names[entry_id]:
+                    scored[entry_id] = self._classify(entry_id, query)
+
+        # Fall back to typo-tolerant matching only when nothing matched literally
+        if fuzzy and not scored:
+            for score, entry_id in self._fuzzy_hits(query, k + len(self._dead)) + self._extra_fuzzy_hits(query):
+                scored[entry_id] = (score, 'fuzzy')
+
+        ranked = sorted(scored.items(), key=lambda item: (-item[1][0], len(self._names[item[0]]), item[0]))
+        return [
+            NameMatch(self._keys[entry_id], self._raw[entry_id], score, kind)
+            for entry_id, (score, kind) in ranked[:k]
+        ]
+
+    def first_match(self, query):
+        """Compatibility mode: key of the first entry (catalogue order) whose name contains query"""
+        query_lower = query.lower()
+        candidates = self._substring_candidates(normalize_name(query))
+        if candidates is None:
+            candidates = range(len(self._sorted_names))
+        # Appended entries come after every built entry, so catalogue order holds
+        for entry_id in chain(map(int, candidates), self._extra_ids):
+            name = self._raw[entry_id]
+            if entry_id not in self._dead and isinstance(name, str) and query_lower in name.lower():
+                return self._keys[entry_id]
+        return None
@@ -0,0 +1,224 @@
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+NUMERIC_COLUMNS = ('bedrooms', 'bathrooms', 'price', 'area_sqft')
+CATEGORICAL_COLUMNS = ('city', 'property_type', 'availability')
+
+# ranges: {column: (low, high)}, inclusive, None for an open end
+# categories: {column: (label, ...)}, any label matches (labels as spelled in the catalogue)
+SearchQuery = namedtuple('SearchQuery', ['ranges', 'categories', 'sort_by', 'descending'])
+SearchPage = namedtuple('SearchPage', ['results', 'total', 'page', 'page_size'])
+
+def make_query(ranges=None, categories=None, sort_by='price', descending=False):
+    if sort_by not in NUMERIC_COLUMNS:
+        raise ValueError(f"sort_by must be one of {NUMERIC_COLUMNS}, got {sort_by!r}")
+    return SearchQuery(dict(ranges or {}), {col: tuple(labels) for col, labels in (categories or {}).items()},
+                       sort_by, descending)
+
+class SearchEngine:
+    """Precomputed per-column indexes for structured catalogue search.
+
+    Numeric columns keep a stably sorted copy of their values plus the row
+    order, so a range is two binary searches and a slice. Categorical columns
+    are factorized into integer codes with a sorted row-position posting per
+    label. A query starts from its most selective filter, checks the others
+    with vectorised gathers over just those candidates, and only sorts what
+    the requested page needs.
+    """
+
+    def __init__(self, properties_df):
+        numeric = {col: pd.to_numeric(properties_df[col], errors='coerce').to_numpy(dtype=np.float64)
+                   for col in NUMERIC_COLUMNS}
+        categorical = {}
+        for col in CATEGORICAL_COLUMNS:
+            codes, labels = pd.factorize(properties_df[col])
+            categorical[col] = (codes, labels.tolist())
+        self._build(properties_df['listing_id'].tolist(), numeric, categorical)
+
+    @classmethod
+    def from_columns(cls, keys, numeric, categorical):
+        """Engine over already split columns, e.g. a memory-mapped column store.
+
+        keys is any sequence returned for matching rows, numeric maps each of
+        NUMERIC_COLUMNS to float64 values (NaN when missing) and categorical maps
+        each of CATEGORICAL_COLUMNS to (codes, labels) with code -1 for missing.
+        """
+        engine = cls.__new__(cls)
+        engine._build(keys, numeric, categorical)
+        return engine
+
+    @classmethod
+    def from_arrays(cls, keys, arrays, meta):
+        """Reopen a saved engine (see to_arrays) over e.g. memory-mapped arrays without copying them"""
+        engine = cls.__new__(cls)
+        engine._attach(keys, arrays, meta)
+        return engine
+
+    def to_arrays(self):
+        """(arrays, meta): the built indexes as NumPy arrays plus the small JSON-ready label tables"""
+        return dict(self._arrays), {'valid': self._valid, 'labels': {col: list(labels) for col, labels in self._labels.items()},
+                                    'vocabulary': self._vocabulary}
+
+    def _build(self, keys, numeric, categorical):
+        count = len(keys)
+        arrays, meta = {}, {'valid': {}, 'labels': {}, 'vocabulary': {}}
+        positions = np.arange(count, dtype=np.int32)
+        for col in NUMERIC_COLUMNS:
+            values = np.asarray(numeric[col], dtype=np.float64)
+            order = np.argsort(values, kind='stable').astype(np.int32)  # NaN sorts last
+            rank = np.empty(count, dtype=np.int32)
+            rank[order] = positions
+            arrays[f"{col}.values"] = values
+            arrays[f"{col}.order"] = order
+            arrays[f"{col}.sorted"] = values[order]
+            arrays[f"{col}.rank"] = rank
+            meta['valid'][col] = int(np.count_nonzero(~np.isnan(values)))
+
+        for col in CATEGORICAL_COLUMNS:
+            label_codes, labels = categorical[col]
+            # Labels match ignoring case and surrounding spaces, so merge spellings that differ only in those
+            spellings = [str(label).strip() for label in labels]
+            merged, uniques = pd.factorize(np.array([label.lower() for label in spellings], dtype=object))
+            # The trailing -1 makes a missing (-1) label code map to a missing merged code
+            codes = np.append(merged, -1).astype(np.int32)[np.asarray(label_codes)]
+            order = np.argsort(codes, kind='stable').astype(np.int32)
+            arrays[f"{col}.codes"] = codes
+            arrays[f"{col}.postings"] = order
+            arrays[f"{col}.bounds"] = np.searchsorted(codes[order], np.arange(len(uniques) + 1)).astype(np.int64)
+            meta['labels'][col] = uniques.tolist()
+            # Labels are in first-seen order, so the first spelling of each wins
+            vocabulary = {}
+            for label in spellings:
+                if label:
+                    vocabulary.setdefault(label.lower(), label)
+            meta['vocabulary'][col] = vocabulary
+        self._attach(keys, arrays, meta)
+
+    def _attach(self, keys, arrays, meta):
+        self._count = len(keys)
+        self._keys = keys
+        self._arrays = arrays
+        self._values = {col: arrays[f"{col}.values"] for col in NUMERIC_COLUMNS}
+        self._order = {col: arrays[f"{col}.order"] for col in NUMERIC_COLUMNS}
+        self._sorted = {col: arrays[f"{col}.sorted"] for col in NUMERIC_COLUMNS}
+        self._rank = {col: arrays[f"{col}.rank"] for col in NUMERIC_COLUMNS}
+        self._valid = dict(meta['valid'])
+        self._codes = {col: arrays[f"{col}.codes"] for col in CATEGORICAL_COLUMNS}
+        self._labels = {col: {label: code for code, label in enumerate(meta['labels'][col])} for col in CATEGORICAL_COLUMNS}
+        # Postings are slices (views) of one stably sorted row order per column
+        self._postings = {}
+        for col in CATEGORICAL_COLUMNS:
+            order, bounds = arrays[f"{col}.postings"], arrays[f"{col}.bounds"].tolist()
+            self._postings[col] = [order[bounds[code]:bounds[code + 1]] for code in range(len(bounds) - 1)]
+        self._vocabulary = meta['vocabulary']
+
+    def __len__(self):
+        return self._count
+
+    def vocabulary(self):
+        """{column: {lowercase label: catalogue spelling}} for the categorical columns"""
+        return self._vocabulary
+
+    def _range_bounds(self, col, low, high):
+        sorted_values = self._sorted[col]
+        start = 0 if low is None else int(np.searchsorted(sorted_values[:self._valid[col]], low, 'left'))
+        stop = self._valid[col] if high is None else int(np.searchsorted(sorted_values[:self._valid[col]], high, 'right'))
+        return start, max(start, stop)
+
+    def _category_codes(self, col, labels):
+        return [self._labels[col][label.lower()] for label in labels if label.lower() in self._labels[col]]
+
+    def matches(self, query):
+        """Row positions matching every filter, plus whether they are already in sort order"""
+        sources = []
+        for col, (low, high) in query.ranges.items():
+            start, stop = self._range_bounds(col, low, high)
+            sources.append((stop - start, 'range', col, (start, stop)))
+        for col, labels in query.categories.items():
+            codes = self._category_codes(col, labels)
+            sources.append((sum(len(self._postings[col][code]) for code in codes), 'category', col, codes))
+
+        if not sources:
+            order = self._order[query.sort_by]
+            return order, True
+        count, kind, driver, args = min(sources, key=lambda source: source[0])
+        if count == 0:
+            return np.zeros(0, dtype=np.int32), True
+        if kind == 'range':
+            candidates = self._order[driver][args[0]:args[1]]
+        elif len(args) == 1:
+            candidates = self._postings[driver][args[0]]
+        else:
+            candidates = np.sort(np.concatenate([self._postings[driver][code] for code in args]))
+
+        keep = None
+        for col, (low, high) in query.ranges.items():
+            if kind == 'range' and col == driver:
+                continue
+            values = self._values[col][candidates]
+            ok = ~np.isnan(values)
+            if low is not None:
+                ok &= values >= low
+            if high is not None:
+                ok &= values <= high
+            keep = ok if keep is None else keep & ok
+        for col, labels in query.categories.items():
+            if kind == 'category' and col == driver:
+                continue
+            ok = np.isin(self._codes[col][candidates], self._category_codes(col, labels))
+            keep = ok if keep is None else keep & ok
+        if keep is not None:
+            candidates = candidates[keep]
+        return candidates, kind == 'range' and driver == query.sort_by
+
+    def search(self, query, page=0, page_size=5):
+        """One page of matching listing_ids, sorted by query.sort_by"""
+        candidates, presorted = self.matches(query)
+        total = len(candidates)
+        start = page * page_size
+        stop = min(start + page_size, total)
+        if start >= total:
+            return SearchPage([], total, page, page_size)
+
+        if presorted:
+            if query.descending:
+                # Reverse the non-NaN prefix only, so rows without a value stay last
+                valid = int(np.count_nonzero(~np.isnan(self._values[query.sort_by][candidates])))
+                index = np.arange(start, stop)
+                index = np.where(index < valid, valid - 1 - index, index)
+                selected = candidates[index]
+            else:
+                selected = candidates[start:stop]
+        else:
+            rank = self._rank[query.sort_by][candidates].astype(np.int64)
+            if query.descending:
+                rank = np.where(np.isnan(self._values[query.sort_by][candidates]), rank, -rank)
+            if stop < total:
+                # Only the rows up to the end of this page need ordering
+                head = np.argpartition(rank, stop - 1)[:stop]
+                selected = candidates[head[np.argsort(rank[head])]][start:stop]
+            else:
+                selected = candidates[np.argsort(rank)][start:stop]
+        return SearchPage([self._keys[position] for position in selected.tolist()], total, page, page_size)
+
+def describe_query(query):
+    """Short human-readable summary of a query's filters"""
+    parts = []
+    for col in CATEGORICAL_COLUMNS:
+        if col in query.categories:
+            parts.append(' or '.join(query.categories[col]))
+    for col, label in (('bedrooms', 'bedrooms'), ('bathrooms', 'bathrooms'), ('price', 'price'), ('area_sqft', 'sqft')):
+        if col not in query.ranges:
+            continue
+        low, high = query.ranges[col]
+        if low is not None and low == high:
+            parts.append(f"{low:,.0f} {label}")
+        elif low is not None and high is not None:
+            parts.append(f"{label} {low:,.0f}–{high:,.0f}")
+        elif high is not None:
+            parts.append(f"{label} up to {high:,.0f}")
+        elif low is not None:
+            parts.append(f"{label} from {low:,.0f}")
+    return ', '.join(parts) or 'all listings'
@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+"""Async HTTP + WebSocket serving mode for the chatbot.
+
+One process, one event loop and one ChatEngine (so one catalogue, polish cache
+and LLM gateway) serve every connection; sessions live in a bounded store with
+TTL eviction (in memory, or written through to SQLite with --session-db)
+instead of one Streamlit script run per browser tab.
+
+  POST /api/sessions                 {"name", "email", "phone"} -> {"session_id"}
+  POST /api/sessions/<id>/turns      {"message"[, "tier", "budget_ms"]} -> {"response", "kind", "property_id", "property_name"}
+  GET  /api/properties/<listing_id>  the listing's fields (?polish=1 adds the polished description,
+                                     rendered at ?tier=template|cached|llm and/or within ?budget_ms=)
+  GET  /api/properties?q=<name>      up to `k` (default 5) listings matching a name
+  POST /api/bookings                 {"name", "phone", "property"} -> the booking confirmation
+  WS   /ws[?session_id=<id>]         send {"message": ...}; receive {"type": "token", "text"} chunks
+                                     while an answer is polished, then {"type": "done", ...}
+  GET  /metrics, /health             Prometheus metrics; liveness and session counts
+
+With --workers N the port is bound once and N pre-forked worker processes
+accept on it. The catalogue is converted to a column store (or the SQLite
+database is used) before forking, and each worker maps that one file
+read-only, so the catalogue and its indexes are shared through the page cache
+and a worker's own memory does not grow with the catalogue. Sessions are
+cached in each worker's memory; with --session-db every worker reads and
+writes them through one SQLite file, otherwise REST sessions need the load
+balancer to pin a client to one worker (WebSocket conversations are unaffected).
+
+Usage: python src/server.py [--port 8080] [--workers 1] [--session-ttl 1800] [--max-sessions 10000]
+       [--session-db data/sessions.sqlite] [--fake [--fake-delay 0.3]]
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import sys
+import weakref
+
+import tornado.web
+import tornado.websocket
+from tornado.httpserver import HTTPServer
+from tornado.ioloop import PeriodicCallback
+from tornado.netutil import bind_sockets
+from tornado.process import fork_processes
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from chat_engine import ChatEngine
+from metrics import REGISTRY, get_logger
+from session_store import session_store_from_env
+
+log = get_logger('server')
+
+def jsonable(record):
+    """A catalogue row as a JSON-ready dict (numpy scalars unwrapped, NaN as null)"""
+    data = {}
+    for key, value in record.to_dict().items():
+        if hasattr(value, 'item'):
+            value = value.item()
+        if isinstance(value, float) and math.isnan(value):
+            value = None
+        data[key] = value
+    return data
+
+def render_options(tier, budget_ms):
+    """Validated (tier, budget seconds) for a request's render tier and latency budget, None for defaults"""
+    from helpers import RENDER_TIERS  # already loaded by build_engine()
+
+    if tier is not None and tier not in RENDER_TIERS:
+        raise tornado.web.HTTPError(400, reason=f"tier must be one of {', '.join(RENDER_TIERS)}")
+    if budget_ms is None:
+        return tier, None
+    try:
+        return tier, float(budget_ms) / 1000
+    except (TypeError, ValueError):
+        raise tornado.web.HTTPError(400, reason="budget_ms must be a number")
+
+def turn_json(result, response):
+    return {'response': response, 'kind': result.kind, 'property_id': result.property_id,
+            'property_name': result.property_name}
+
+class SessionLocks:
+    """One asyncio.Lock per session id, so a session's turns (REST or WebSocket) run one at a time.
+
+    Locks are held weakly: one exists only while a turn holds or waits for it,
+    so evicted and expired sessions leave nothing behind.
+    """
+
+    def __init__(self):
+        self._locks = weakref.WeakValueDictionary()
+
+    def __len__(self):
+        return len(self._locks)
+
+    def __call__(self, session_id):
+        lock = self._locks.get(session_id)
+        if lock is None:
+            lock = self._locks[session_id] = asyncio.Lock()
+        return lock
+
+class JSONHandler(tornado.web.RequestHandler):
+    def initialize(self, engine, store):
+        self.engine = engine
+        self.store = store
+
+    def json_body(self, *required):
+        try:
+            body = json.loads(self.request.body or b'{}')
+        except ValueError:
+            raise tornado.web.HTTPError(400, reason="body is not valid JSON")
+        if not isinstance(body, dict):
+            raise tornado.web.HTTPError(400, reason="body must be a JSON object")
+        missing = [field for field in required if not str(body.get(field) or '').strip()]
+        if missing:
+            raise tornado.web.HTTPError(400, reason=f"missing {', '.join(missing)}")
+        return body
+
+    def session(self, session_id):
+        session = self.store.get(session_id)
+        if session is None:
+            raise tornado.web.HTTPError(404, reason="unknown or expired session")
+        return session
+
+    def write_error(self, status_code, **kwargs):
+        self.finish({'error': self._reason})
+
+class SessionsHandler(JSONHandler):
+    def post(self):
+        body = self.json_body()
+        user_info = {field: str(body.get(field, '')) for field in ('name', 'email', 'phone')}
+        session = self.engine.new_session(user_info)
+        self.set_status(201)
+        self.write({'session_id': session.session_id})
+
+class TurnsHandler(JSONHandler):
+    def initialize(self, engine, store, locks):
+        super().initialize(engine, store)
+        self.locks = locks
+
+    async def post(self, session_id):
+        body = self.json_body('message')
+        tier, budget = render_options(body.get('tier'), body.get('budget_ms'))
+        # Concurrent turns for one session would interleave its messages and paging state;
+        # the session is fetched under the lock so a write-through store hands out its latest state
+        async with self.locks(session_id):
+            session = self.session(session_id)
+            result = await self.engine.ahandle_turn(session, body['message'], stream=False, tier=tier, budget=budget)
+        self.write(turn_json(result, result.response))
+
+class PropertyHandler(JSONHandler):
+    async def get(self, listing_id):
+        prop = self.engine.property_helper.get_property_by_id(listing_id)
+        if prop is None:
+            raise tornado.web.HTTPError(404, reason=f"no listing {listing_id}")
+        data = jsonable(prop)
+        if self.get_argument('polish', '0') == '1':
+            tier, budget = render_options(self.get_argument('tier', None), self.get_argument('budget_ms', None))
+            data['description'] = await self.engine.property_helper.aformat_property_details(prop, tier, budget)
+        self.write(data)
+
+class PropertySearchHandler(JSONHandler):
+    def get(self):
+        query = self.get_argument('q', '').strip()
+        if not query:
+            raise tornado.web.HTTPError(400, reason="missing q")
+        try:
+            k = min(max(int(self.get_argument('k', '5')), 1), 50)
+        except ValueError:
+            raise tornado.web.HTTPError(400, reason="k must be an integer")
+        matches = self.engine.property_helper.search_properties_by_name(query, k=k)
+        self.write({'results': [jsonable(prop) for prop, _ in matches]})
+
+class BookingsHandler(JSONHandler):
+    def post(self):
+        body = self.json_body('name', 'phone')
+        property_id, property_name, response = self.engine.book_visit(
+            str(body['name']), str(body['phone']), str(body.get('property') or 'any'))
+        self.set_status(201)
+        self.write({'property_id': property_id, 'property_name': property_name, 'response': response})
+
+class MetricsHandler(tornado.web.RequestHandler):
+    def get(self):
+        self.set_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.write(REGISTRY.render_prometheus())
+
+class HealthHandler(JSONHandler):
+    def get(self):
+        self.write({'status': 'ok', **self.store.stats()})
+
+class ChatSocket(tornado.websocket.WebSocketHandler):
+    """One conversation per connection; answers are streamed token by token"""
+
+    def initialize(self, engine, store, locks):
+        self.engine = engine
+        self.store = store
+        self.locks = locks
+        self.session = None
+
+    def check_origin(self, origin):
+        allowed = os.getenv('SERVER_ALLOWED_ORIGINS', '')
+        return not allowed or origin in allowed.split(',')
+
+    def open(self):
+        session_id = self.get_argument('session_id', None)
+        self.session = self.store.get(session_id) if session_id else None
+        if self.session is None:
+            user_info = {field: self.get_argument(field, '') for field in ('name', 'email', 'phone')}
+            self.session = self.engine.new_session(user_info)
+        self.write_message({'type': 'session', 'session_id': self.session.session_id})
+
+    async def on_message(self, message):
+        # Tornado waits for this coroutine before delivering the next message, so turns stay in order
+        try:
+            text = json.loads(message).get('message', '')
+        except (ValueError, AttributeError):
+            text = message
+        if not str(text).strip():
+            self.write_message({'type': 'error', 'error': "empty message"})
+            return
+        # Shares the REST turns' lock: the stream finishes the turn, so it is read while the lock is held
+        async with self.locks(self.session.session_id):
+            # Turns sent over REST in the meantime may have replaced the stored session
+            self.session = self.store.get(self.session.session_id) or self.session
+            result = await self.engine.ahandle_turn(self.session, str(text), stream=True)
+            response = result.response
+            if result.response_stream is not None:
+                parts = []
+                try:
+                    async for token in result.response_stream:
+                        parts.append(token)
+                        await self.write_message({'type': 'token', 'text': token})
+                except tornado.websocket.WebSocketClosedError:
+                    await result.response_stream.aclose()
+                    return
+                response = ''.join(parts)
+        try:
+            await self.write_message({'type': 'done', **turn_json(result, response)})
+        except tornado.websocket.WebSocketClosedError:
+            pass
+
+def make_app(engine):
+    # Every turn saves its session, which also keeps it alive (or brings it back) while a socket is in use
+    context = {'engine': engine, 'store': engine.sessions}
+    # REST and WebSocket turns for one session run one at a time
+    turn_context = dict(context, locks=SessionLocks())
+    return tornado.web.Application([
+        (r'/api/sessions', SessionsHandler, context),
+        (r'/api/sessions/([0-9a-f]+)/turns', TurnsHandler, turn_context),
+        (r'/api/properties', PropertySearchHandler, context),
+        (r'/api/properties/([^/]+)', PropertyHandler, context),
+        (r'/api/bookings', BookingsHandler, context),
+        (r'/ws', ChatSocket, turn_context),
+        (r'/metrics', MetricsHandler),
+        (r'/health', HealthHandler, context),
+    ], websocket_ping_interval=30)
+
+def build_engine(fake=False, fake_delay=0.3, worker=None, sessions=None):
+    """The same helpers app.py builds, optionally answering with the offline stub LLM.
+
+    worker is the pre-forked worker number: only worker 0 watches properties.csv
+    (rewriting the shared store) and replays spilled rows; the others reopen
+    the store when it is replaced.
+    """
+    from catalogue_watcher import start_watcher
+    from fake_llm import FakeGroqClient
+    from helpers import FAQHelper, PropertyHelper
+    from llm_gateway import LLMGateway
+
+    llm = LLMGateway.from_env(client=FakeGroqClient(first_token_delay=fake_delay) if fake else None)
+    property_helper = PropertyHelper(llm=llm)
+    if not worker:
+        start_watcher(property_helper)
+        property_helper.write_queue.replay_spill()
+    elif hasattr(property_helper.storage, 'store_path'):
+        start_watcher(property_helper, store_only=True)
+    return ChatEngine(property_helper, FAQHelper(), sessions=sessions)
+
+def prepare_shared_catalogue():
+    """Convert (or validate) the column store once before forking, so workers only map it.
+
+    A SQLite catalogue (SQLITE_DB_PATH) is already shared through the page
+    cache and is left alone; it must not be opened before the fork either.
+    Otherwise the store is CATALOGUE_STORE_PATH, by default properties.colstore
+    next to properties.csv.
+    """
+    from storage import ColumnarStorage, find_properties_file
+
+    if os.getenv('SQLITE_DB_PATH'):
+        return
+    if not os.getenv('CATALOGUE_STORE_PATH'):
+        csv_path = next((path for path in find_properties_file() if os.path.exists(path)), 'data/properties.csv')
+        # Inherited by the workers, whose open_storage() then picks the store
+        os.environ['CATALOGUE_STORE_PATH'] = os.path.splitext(os.path.abspath(csv_path))[0] + '.colstore'
+    ColumnarStorage(os.environ['CATALOGUE_STORE_PATH']).catalogue()
+
+async def serve(engine, port, host='127.0.0.1', sockets=None):
+    """Serve until cancelled, on port or on already bound sockets (a pre-forked worker)"""
+    store = engine.sessions
+    app = make_app(engine)
+    if sockets is None:
+        server = app.listen(port, address=host, xheaders=True)
+    else:
+        server = HTTPServer(app, xheaders=True)
+        server.add_sockets(sockets)
+    expiry = PeriodicCallback(store.expire, 60 * 1000)
+    expiry.start()
+    log.info("Serving chat on http://%s:%s (pid %s; sessions: max %s, ttl %ss)",
+             host, port, os.getpid(), store.max_sessions, store.ttl)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        expiry.stop()
+        server.stop()
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the chatbot over HTTP and WebSocket")
+    parser.add_argument('--host', default=os.getenv('SERVER_HOST', '127.0.0.1'))
+    parser.add_argument('--port', type=int, default=int(os.getenv('SERVER_PORT', '8080')))
+    parser.add_argument('--session-ttl', type=float, default=float(os.getenv('SESSION_TTL', '1800')),
+                        help="seconds an idle session is kept")
+    parser.add_argument('--max-sessions', type=int, default=int(os.getenv('SESSION_MAX', '10000')),
+                        help="sessions kept in memory per worker")
+    parser.add_argument('--session-db', default=os.getenv('SESSION_DB_PATH'),
+                        help="SQLite file sessions are written through to (shared by workers, kept across restarts)")
+    parser.add_argument('--workers', type=int, default=int(os.getenv('SERVER_WORKERS', '1')),
+                        help="pre-forked worker processes sharing the port (0: one per CPU)")
+    parser.add_argument('--fake', action='store_true', help="use the offline stub LLM instead of Groq")
+    parser.add_argument('--fake-delay', type=float, default=0.3, help="stub LLM seconds to the first token")
+    args = parser.parse_args()
+
+    sockets = worker = None
+    if args.workers != 1:
+        prepare_shared_catalogue()
+        sockets = bind_sockets(args.port, address=args.host)
+        # Returns in each worker only; the parent restarts workers that crash and exits with them
+        worker = fork_processes(args.workers, max_restarts=100)
+    # Built after the fork: threads (LLM loop, write-behind, watcher) do not survive one
+    store = session_store_from_env(args.max_sessions, args.session_ttl, args.session_db)
+    store.register_gauges()
+    engine = build_engine(args.fake, args.fake_delay, worker, store)
+    try:
+        asyncio.run(serve(engine, args.port, args.host, sockets))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
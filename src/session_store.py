@@ -0,0 +1,265 @@
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from metrics import REGISTRY
+from search_engine import make_query
+
+SESSION_SCHEMA = [
+    'CREATE TABLE IF NOT EXISTS sessions (session_id TEXT PRIMARY KEY, state TEXT NOT NULL, '
+    'version TEXT NOT NULL, last_seen REAL NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS idx_sessions_last_seen ON sessions(last_seen)',
+]
+
+def _deep_bytes(value):
+    """Rough deep size of the small dicts, lists and tuples a session holds"""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(sys.getsizeof(key) + _deep_bytes(item) for key, item in value.items())
+    elif isinstance(value, (list, tuple)):
+        size += sum(_deep_bytes(item) for item in value)
+    return size
+
+def session_bytes(session):
+    """Approximate memory held by a session: its record, user and booking data, last search and retained messages"""
+    return (sys.getsizeof(session) + _deep_bytes(session.user_info) + _deep_bytes(session.booking_data)
+            + _deep_bytes(session.last_search) + session.messages.nbytes)
+
+def session_state(session):
+    """The persisted part of a session (everything but its messages) as JSON"""
+    last_search = None
+    if session.last_search is not None:
+        query, page = session.last_search
+        last_search = {'ranges': query.ranges, 'categories': query.categories, 'sort_by': query.sort_by,
+                       'descending': query.descending, 'page': page}
+    return json.dumps({
+        'user_info': session.user_info, 'booking_state': session.booking_state, 'booking_data': session.booking_data,
+        'last_search': last_search, 'history_size': session.messages.max_messages,
+    })
+
+def restore_session(session_id, state, session=None):
+    """Apply a persisted state to session (a new ChatSession when None) and return it"""
+    from chat_engine import ChatSession  # chat_engine imports this module
+
+    state = json.loads(state)
+    if session is None:
+        session = ChatSession(state['user_info'], session_id=session_id, history_size=state['history_size'])
+    session.user_info = state['user_info']
+    session.booking_state = state['booking_state']
+    session.booking_data = state['booking_data']
+    search = state['last_search']
+    session.last_search = None if search is None else (
+        make_query({col: tuple(bounds) for col, bounds in search['ranges'].items()}, search['categories'],
+                   search['sort_by'], search['descending']),
+        search['page'])
+    return session
+
+class MemorySessionStore:
+    """Bounded in-memory ChatSession store with TTL eviction.
+
+    Sessions are kept in least-recently-used order: a session idle for ttl
+    seconds is dropped by expire() (or when looked up), and adding a session
+    beyond max_sessions evicts the least recently used one first, so memory
+    stays bounded however many clients come and go. The approximate bytes
+    each session holds are tracked as it is saved, for the gauges.
+    """
+
+    def __init__(self, max_sessions=10000, ttl=1800.0, clock=time.monotonic):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.clock = clock
+        self._sessions = OrderedDict()  # session_id -> [session, last_seen, bytes]
+        self._lock = threading.Lock()
+        self.nbytes = 0
+        self.evicted = 0
+        self.expired = 0
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def _put(self, session, now):
+        """Store session as the most recently used one; the lock must be held"""
+        old = self._sessions.get(session.session_id)
+        if old is not None:
+            self.nbytes -= old[2]
+        size = session_bytes(session)
+        self._sessions[session.session_id] = [session, now, size]
+        self._sessions.move_to_end(session.session_id)
+        self.nbytes += size
+        while len(self._sessions) > self.max_sessions:
+            _, (_, _, size) = self._sessions.popitem(last=False)
+            self.nbytes -= size
+            self.evicted += 1
+
+    def _drop(self, session_id):
+        """Remove a session from memory; the lock must be held"""
+        entry = self._sessions.pop(session_id, None)
+        if entry is not None:
+            self.nbytes -= entry[2]
+        return entry
+
+    def add(self, session):
+        """Store (or refresh) session as the most recently used one"""
+        with self._lock:
+            self._put(session, self.clock())
+        return session
+
+    def save(self, session):
+        """Record a session's changes after a turn (booking progress, search, messages)"""
+        return self.add(session)
+
+    def get(self, session_id):
+        """The live session with this ID (marking it used), or None"""
+        now = self.clock()
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return None
+            if now - entry[1] > self.ttl:
+                self._drop(session_id)
+                self.expired += 1
+                return None
+            entry[1] = now
+            self._sessions.move_to_end(session_id)
+            return entry[0]
+
+    def delete(self, session_id):
+        with self._lock:
+            return self._drop(session_id) is not None
+
+    def expire(self):
+        """Drop every session idle for longer than ttl; returns how many"""
+        cutoff = self.clock() - self.ttl
+        dropped = 0
+        with self._lock:
+            # Oldest first, so the scan stops at the first live session
+            while self._sessions:
+                session_id, (_, last_seen, _) = next(iter(self._sessions.items()))
+                if last_seen >= cutoff:
+                    break
+                self._drop(session_id)
+                dropped += 1
+            self.expired += dropped
+        return dropped
+
+    def stats(self):
+        return {'sessions': len(self._sessions), 'bytes': self.nbytes, 'evicted': self.evicted, 'expired': self.expired}
+
+    def register_gauges(self, registry=REGISTRY):
+        """Export the live session count and their approximate bytes as gauges"""
+        registry.gauge('sessions_live', self.__len__)
+        registry.gauge('sessions_bytes', lambda: self.nbytes)
+
+class SQLiteSessionStore(MemorySessionStore):
+    """MemorySessionStore written through to SQLite, so sessions survive restarts and are shared by processes.
+
+    Memory keeps the live sessions as before (bounded, least recently used
+    first). Every add() and save() also writes the session's user info,
+    booking progress and last search to the database, and get() reads that row
+    back: a session is found again after a restart or from another server
+    worker, and a copy another process changed is refreshed. Messages are not
+    persisted (every turn is in the transcript log). Idle time is measured
+    from the last save, in wall-clock time, since it has to survive restarts.
+    """
+
+    def __init__(self, path, max_sessions=10000, ttl=1800.0, clock=time.time):
+        super().__init__(max_sessions, ttl, clock)
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        conn = self._conn()
+        conn.execute('PRAGMA journal_mode=WAL')
+        for statement in SESSION_SCHEMA:
+            conn.execute(statement)
+        conn.commit()
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def add(self, session):
+        now = self.clock()
+        # A new version on every write tells other processes' copies that they are stale
+        session.version = uuid.uuid4().hex
+        conn = self._conn()
+        conn.execute('INSERT OR REPLACE INTO sessions (session_id, state, version, last_seen) VALUES (?, ?, ?, ?)',
+                     (session.session_id, session_state(session), session.version, now))
+        conn.commit()
+        with self._lock:
+            self._put(session, now)
+        return session
+
+    def get(self, session_id):
+        now = self.clock()
+        conn = self._conn()
+        row = conn.execute('SELECT state, version, last_seen FROM sessions WHERE session_id = ?',
+                           (session_id,)).fetchone()
+        if row is not None and now - row[2] > self.ttl:
+            conn.execute('DELETE FROM sessions WHERE session_id = ?', (session_id,))
+            conn.commit()
+            with self._lock:
+                self._drop(session_id)
+                self.expired += 1
+            return None
+        with self._lock:
+            if row is None:
+                self._drop(session_id)  # deleted by another process
+                return None
+            state, version, last_seen = row
+            entry = self._sessions.get(session_id)
+            session = entry[0] if entry is not None else None
+            if session is None or session.version != version:
+                session = restore_session(session_id, state, session)
+                session.version = version
+                self._put(session, now)
+            else:
+                entry[1] = now
+                self._sessions.move_to_end(session_id)
+            return session
+
+    def delete(self, session_id):
+        conn = self._conn()
+        deleted = conn.execute('DELETE FROM sessions WHERE session_id = ?', (session_id,)).rowcount
+        conn.commit()
+        return super().delete(session_id) or deleted > 0
+
+    def expire(self):
+        """Drop sessions idle for longer than ttl from memory and the database; returns how many rows went"""
+        super().expire()
+        conn = self._conn()
+        dropped = conn.execute('DELETE FROM sessions WHERE last_seen < ?', (self.clock() - self.ttl,)).rowcount
+        conn.commit()
+        return dropped
+
+    def stats(self):
+        stats = super().stats()
+        stats['persisted'] = self._conn().execute('SELECT COUNT(*) FROM sessions').fetchone()[0]
+        return stats
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+def session_store_from_env(max_sessions=None, ttl=None, path=None):
+    """A SQLiteSessionStore at SESSION_DB_PATH when set, else a MemorySessionStore.
+
+    Bounds default to SESSION_MAX sessions (10000) idle for at most SESSION_TTL seconds (1800).
+    """
+    max_sessions = int(os.getenv('SESSION_MAX', '10000')) if max_sessions is None else max_sessions
+    ttl = float(os.getenv('SESSION_TTL', '1800')) if ttl is None else ttl
+    path = path or os.getenv('SESSION_DB_PATH')
+    if path:
+        return SQLiteSessionStore(path, max_sessions=max_sessions, ttl=ttl)
+    return MemorySessionStore(max_sessions=max_sessions, ttl=ttl)
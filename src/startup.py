@@ -0,0 +1,60 @@
+import threading
+import time
+from contextlib import contextmanager
+
+class StartupTimer:
+    """Wall-clock breakdown of the phases of starting the app"""
+
+    def __init__(self):
+        self.phases = []
+        self._started = time.perf_counter()
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - start))
+
+    def total(self):
+        return time.perf_counter() - self._started
+
+    def report(self):
+        parts = ', '.join(f"{name} {seconds * 1000:.0f} ms" for name, seconds in self.phases)
+        return f"Startup: {parts} (ready {self.total() * 1000:.0f} ms after start)"
+
+class BackgroundLoader:
+    """Runs load() once on a daemon thread so the caller can render something else meanwhile.
+
+    result() waits for the load to finish and returns its value, re-raising
+    the exception if it failed.
+    """
+
+    def __init__(self, load, name='startup-loader'):
+        self._load = load
+        self._done = threading.Event()
+        self._value = None
+        self._error = None
+        threading.Thread(target=self._run, name=name, daemon=True).start()
+
+    def _run(self):
+        try:
+            self._value = self._load()
+        except BaseException as e:
+            self._error = e
+        finally:
+            self._done.set()
+
+    def ready(self):
+        return self._done.is_set()
+
+    def failed(self):
+        return self._done.is_set() and self._error is not None
+
+    def result(self, timeout=None):
+        if not self._done.wait(timeout):
+            raise TimeoutError("startup is still loading")
+        if self._error is not None:
+            raise self._error
+        return self._value
@@ -0,0 +1,349 @@
+import os
+import sqlite3
+import threading
+
+import pandas as pd
+
+from catalogue import InMemoryCatalogue, make_record_type
+from catalogue_store import ColumnarCatalogue, file_stat, is_current, write_store
+from catalogue_watcher import file_digest
+from metrics import get_logger
+from name_index import EXACT_SCORE, PREFIX_SCORE, SUBSTRING_SCORE, WORD_SCORE, NameMatch
+from search_engine import CATEGORICAL_COLUMNS, SearchPage
+from transcript import BOOKING_FIELDS, TRANSCRIPT_FIELDS, TranscriptWriter, find_visits_file
+
+log = get_logger('storage')
+
+PROPERTY_COLUMNS = [
+    ('id', 'INTEGER'),
+    ('listing_id', 'TEXT NOT NULL UNIQUE'),
+    ('property_name', 'TEXT COLLATE NOCASE'),
+    ('address', 'TEXT'),
+    ('city', 'TEXT'),
+    ('area_sqft', 'INTEGER'),
+    ('bedrooms', 'INTEGER'),
+    ('bathrooms', 'INTEGER'),
+    ('price', 'INTEGER'),
+    ('price_currency', 'TEXT'),
+    ('property_type', 'TEXT'),
+    ('availability', 'TEXT'),
+    ('short_description', 'TEXT'),
+    ('agent_email', 'TEXT'),
+]
+PROPERTY_FIELDS = [name for name, _ in PROPERTY_COLUMNS]
+
+SCHEMA = [
+    'CREATE TABLE IF NOT EXISTS properties (' + ', '.join(f"{name} {kind}" for name, kind in PROPERTY_COLUMNS) + ')',
+    # Category filters compare normalized labels, like the in-memory SearchEngine
+    'CREATE INDEX IF NOT EXISTS idx_properties_city_label ON properties(lower(trim(city)))',
+    'CREATE INDEX IF NOT EXISTS idx_properties_type_label ON properties(lower(trim(property_type)))',
+    'CREATE INDEX IF NOT EXISTS idx_properties_price ON properties(price)',
+    'CREATE INDEX IF NOT EXISTS idx_properties_name ON properties(property_name)',
+    'CREATE INDEX IF NOT EXISTS idx_properties_bedrooms ON properties(bedrooms, price)',
+    'CREATE INDEX IF NOT EXISTS idx_properties_availability_label ON properties(lower(trim(availability)))',
+    'CREATE TABLE IF NOT EXISTS bookings (booking_id INTEGER PRIMARY KEY, '
+    + ', '.join(f"{name} TEXT" for name in BOOKING_FIELDS) + ')',
+    'CREATE INDEX IF NOT EXISTS idx_bookings_timestamp ON bookings(timestamp)',
+    'CREATE INDEX IF NOT EXISTS idx_bookings_listing ON bookings(listing_id)',
+    'CREATE TABLE IF NOT EXISTS transcripts (transcript_id INTEGER PRIMARY KEY, '
+    + ', '.join(f"{name} TEXT" for name in TRANSCRIPT_FIELDS) + ')',
+    'CREATE INDEX IF NOT EXISTS idx_transcripts_timestamp ON transcripts(timestamp)',
+    'CREATE INDEX IF NOT EXISTS idx_transcripts_email ON transcripts(email)',
+]
+
+def find_properties_file():
+    """Candidate locations for properties.csv, most specific first"""
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    project_root = os.path.dirname(current_dir)  # Go up one level from src/
+    return [
+        os.path.join(project_root, 'data', 'properties.csv'),  # From project root
+        os.path.join(current_dir, '..', 'data', 'properties.csv'),  # Relative from src
+        'data/properties.csv',  # Current directory
+        '../data/properties.csv'  # Relative path
+    ]
+
+def read_properties_csv(properties_path=None):
+    """(DataFrame, path) of properties.csv, probing the usual locations when no path is given"""
+    csv_paths = [properties_path] if properties_path else find_properties_file()
+    for path in csv_paths:
+        try:
+            if os.path.exists(path):
+                properties_df = pd.read_csv(path)
+                log.info("Loaded properties from %s", path)
+                return properties_df, path
+        except Exception as e:
+            log.error("Failed to load properties from %s: %s", path, e)
+    raise FileNotFoundError(f"Could not find properties.csv file. Tried paths: {csv_paths}")
+
+class CSVStorage:
+    """The original file layout: properties.csv read into RAM, rows appended to visits.csv"""
+
+    def __init__(self, properties_path=None, visits_path=None):
+        self.properties_path = properties_path
+        self.visits_path = visits_path or find_visits_file()
+
+    def load_properties(self):
+        """Read properties.csv, probing the usual locations when no path was given"""
+        properties_df, self.properties_path = read_properties_csv(self.properties_path)
+        return properties_df
+
+    def catalogue(self):
+        return InMemoryCatalogue(self.load_properties())
+
+    def bookings_sink(self):
+        return TranscriptWriter(self.visits_path, BOOKING_FIELDS, batch_size=1000, flush_interval=0)
+
+    def transcripts_sink(self):
+        return TranscriptWriter(self.visits_path, TRANSCRIPT_FIELDS, batch_size=1000, flush_interval=0)
+
+class ColumnarStorage(CSVStorage):
+    """properties.csv served from a memory-mapped column store, visits still appended to visits.csv.
+
+    The store acts as a prebuilt startup snapshot: it is used while the CSV's
+    size and mtime (or, failing that, its checksum) match the ones recorded at
+    conversion, and re-converted from the CSV when stale. Without a CSV the
+    store is used as is.
+    """
+
+    def __init__(self, store_path, properties_path=None, visits_path=None):
+        super().__init__(properties_path, visits_path)
+        self.store_path = store_path
+
+    def catalogue(self):
+        csv_paths = [self.properties_path] if self.properties_path else find_properties_file()
+        source = next((path for path in csv_paths if os.path.exists(path)), None)
+        if os.path.exists(self.store_path):
+            try:
+                catalogue = ColumnarCatalogue(self.store_path)
+                if source is None or is_current(catalogue, source):
+                    log.info("Opened catalogue store %s (%d properties)", self.store_path, len(catalogue))
+                    return catalogue
+                log.info("Catalogue store %s is stale; converting %s again", self.store_path, source)
+            except (ValueError, KeyError) as e:
+                log.warning("Ignoring unreadable catalogue store %s: %s", self.store_path, e)
+        if source is None:
+            raise FileNotFoundError(f"Could not find properties.csv file. Tried paths: {csv_paths}")
+        self.properties_path = source
+        stat = file_stat(source)
+        write_store(pd.read_csv(source), self.store_path, source_sha256=file_digest(source), source_stat=stat)
+        log.info("Converted %s into catalogue store %s", source, self.store_path)
+        return ColumnarCatalogue(self.store_path)
+
+class _TableSink:
+    """write_rows()/flush() adapter so the write-behind queue can commit into a table"""
+
+    def __init__(self, storage, table, fields):
+        self.storage = storage
+        self.table = table
+        self.fields = fields
+
+    def write_rows(self, rows):
+        self.storage.insert_rows(self.table, self.fields, rows)
+
+    def flush(self):
+        pass  # insert_rows commits each batch
+
+class SQLiteStorage:
+    """SQLite-backed catalogue, bookings and chat transcripts.
+
+    The catalogue is queried in place through indexed SQL, so nothing but the
+    rows a turn actually touches is held in memory. The database runs in WAL
+    mode so the write-behind thread never blocks readers, and each thread gets
+    its own connection. A reload (load_properties() then updated()) replaces
+    the table's rows from properties.csv in one transaction.
+    """
+
+    def __init__(self, path, properties_path=None):
+        self.path = path
+        self.properties_path = properties_path
+        self._local = threading.local()
+        self._record_type = make_record_type(PROPERTY_FIELDS)
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        conn = self._conn()
+        conn.execute('PRAGMA journal_mode=WAL')
+        for statement in SCHEMA:
+            conn.execute(statement)
+        conn.commit()
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def catalogue(self):
+        return self
+
+    def load_properties(self):
+        """Read properties.csv (the source the table is reloaded from), probing the usual locations"""
+        properties_df, self.properties_path = read_properties_csv(self.properties_path)
+        return properties_df
+
+    def updated(self, properties_df):
+        """Replace the table's rows with properties_df; returns (self, delta) like the other catalogues.
+
+        Unlike them, the table is changed in place, so readers see the new rows
+        as soon as the transaction commits.
+        """
+        return self, self._replace(properties_df)
+
+    def __len__(self):
+        return self._conn().execute('SELECT COUNT(*) FROM properties').fetchone()[0]
+
+    def _select(self, where, params, limit=None):
+        sql = f"SELECT {', '.join(PROPERTY_FIELDS)} FROM properties WHERE {where}"
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+        return [self._record_type(row) for row in self._conn().execute(sql, params)]
+
+    def get(self, listing_id):
+        rows = self._select('listing_id = ?', (listing_id,))
+        return rows[0] if rows else None
+
+    def records(self):
+        """Every listing, in insertion order, streamed from the database"""
+        cursor = self._conn().execute(f"SELECT {', '.join(PROPERTY_FIELDS)} FROM properties ORDER BY rowid")
+        return map(self._record_type, cursor)
+
+    def search_names(self, query, k=5):
+        """Ranked (record, NameMatch) candidates: exact > prefix > word > substring"""
+        query = query.strip()
+        if not query:
+            return []
+        escaped = query.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        rows = self._conn().execute(
+            f"SELECT {', '.join(PROPERTY_FIELDS)}, "
+            "CASE WHEN property_name = ? THEN 0 "
+            "WHEN property_name LIKE ? ESCAPE '\\' THEN 1 "
+            "WHEN property_name LIKE ? ESCAPE '\\' THEN 2 ELSE 3 END AS rank "
+            "FROM properties WHERE property_name LIKE ? ESCAPE '\\' "
+            "ORDER BY rank, length(property_name), rowid LIMIT ?",
+            (query, f"{escaped}%", f"% {escaped}%", f"%{escaped}%", k)
+        ).fetchall()
+        scores = [(EXACT_SCORE, 'exact'), (PREFIX_SCORE, 'prefix'), (WORD_SCORE, 'word'), (SUBSTRING_SCORE, 'substring')]
+        results = []
+        for row in rows:
+            record = self._record_type(row[:-1])
+            score, kind = scores[row[-1]]
+            results.append((record, NameMatch(record['listing_id'], record['property_name'], score, kind)))
+        return results
+
+    def first_name_match(self, query):
+        escaped = query.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        rows = self._select("property_name LIKE ? ESCAPE '\\' ORDER BY rowid", (f"%{escaped}%",), limit=1)
+        return rows[0] if rows else None
+
+    def search_vocabulary(self):
+        """{column: {lowercase label: stored spelling}} for the categorical search columns"""
+        conn = self._conn()
+        vocabulary = {}
+        for col in CATEGORICAL_COLUMNS:
+            labels = (value.strip() for (value,) in conn.execute(f"SELECT DISTINCT {col} FROM properties") if value)
+            vocabulary[col] = {}
+            for label in filter(None, labels):
+                vocabulary[col].setdefault(label.lower(), label)
+        return vocabulary
+
+    def search(self, query, page=0, page_size=5):
+        """A SearchPage of records matching a SearchQuery, filtered and sorted in SQL"""
+        clauses, params = [], []
+        for col, (low, high) in query.ranges.items():
+            if low is not None:
+                clauses.append(f"{col} >= ?")
+                params.append(low)
+            if high is not None:
+                clauses.append(f"{col} <= ?")
+                params.append(high)
+        for col, labels in query.categories.items():
+            clauses.append(f"lower(trim({col})) IN ({', '.join('?' * len(labels))})")
+            params.extend(str(label).strip().lower() for label in labels)
+        where = ' AND '.join(clauses) or '1'
+        total = self._conn().execute(f"SELECT COUNT(*) FROM properties WHERE {where}", params).fetchone()[0]
+        direction = 'DESC' if query.descending else 'ASC'
+        # Ties in reverse catalogue order when descending, like the in-memory engine
+        order = f"{query.sort_by} IS NULL, {query.sort_by} {direction}, rowid {direction}"
+        rows = self._select(f"{where} ORDER BY {order} LIMIT {int(page_size)} OFFSET {int(page * page_size)}", params)
+        return SearchPage(rows, total, page, page_size)
+
+    def replace_properties(self, properties_df):
+        """Make the catalogue exactly the rows of a properties.csv-shaped DataFrame, in one transaction.
+
+        Rows are upserted by listing_id and listings missing from properties_df are deleted.
+        """
+        self._replace(properties_df)
+        return len(properties_df)
+
+    def _replace(self, properties_df):
+        """replace_properties(), returning the {'added', 'changed', 'removed'} listing_ids.
+
+        The incoming rows are staged in a temp table with the same column types
+        and compared with the stored ones in SQL, so the old catalogue is never
+        read into memory.
+        """
+        missing = [name for name in PROPERTY_FIELDS if name not in properties_df.columns]
+        if missing:
+            raise ValueError(f"properties data is missing columns: {missing}")
+        columns = [properties_df[name].tolist() for name in PROPERTY_FIELDS]
+        fields = ', '.join(PROPERTY_FIELDS)
+        # IS compares NULLs as equal
+        differs = ' OR '.join(f"p.{name} IS NOT i.{name}" for name in PROPERTY_FIELDS)
+        conn = self._conn()
+        with conn:
+            conn.execute('CREATE TEMP TABLE IF NOT EXISTS incoming_properties ('
+                         + ', '.join(f"{name} {kind.split()[0]}" for name, kind in PROPERTY_COLUMNS) + ')')
+            conn.execute('DELETE FROM temp.incoming_properties')
+            conn.executemany(f"INSERT INTO temp.incoming_properties ({fields}) "
+                             f"VALUES ({', '.join('?' * len(PROPERTY_FIELDS))})", zip(*columns))
+            conn.execute('CREATE INDEX IF NOT EXISTS temp.idx_incoming_listing ON incoming_properties(listing_id)')
+
+            def listing_ids(sql):
+                return list(dict.fromkeys(listing_id for (listing_id,) in conn.execute(sql)))
+
+            delta = {
+                'added': listing_ids('SELECT listing_id FROM temp.incoming_properties WHERE listing_id NOT IN '
+                                     '(SELECT listing_id FROM properties) ORDER BY rowid'),
+                'changed': listing_ids(f"SELECT i.listing_id FROM temp.incoming_properties i "
+                                       f"JOIN properties p ON p.listing_id = i.listing_id WHERE {differs} "
+                                       f"ORDER BY i.rowid"),
+                'removed': listing_ids('SELECT listing_id FROM properties WHERE listing_id NOT IN '
+                                       '(SELECT listing_id FROM temp.incoming_properties) ORDER BY rowid'),
+            }
+            conn.execute('DELETE FROM properties WHERE listing_id NOT IN '
+                         '(SELECT listing_id FROM temp.incoming_properties)')
+            conn.execute(f"INSERT OR REPLACE INTO properties ({fields}) "
+                         f"SELECT {fields} FROM temp.incoming_properties ORDER BY rowid")
+            conn.execute('DELETE FROM temp.incoming_properties')
+        return delta
+
+    def insert_rows(self, table, fields, rows):
+        conn = self._conn()
+        with conn:
+            conn.executemany(
+                f"INSERT INTO {table} ({', '.join(fields)}) VALUES ({', '.join('?' * len(fields))})",
+                ([str(row.get(name, '') or '') for name in fields] for row in rows)
+            )
+
+    def bookings_sink(self):
+        return _TableSink(self, 'bookings', BOOKING_FIELDS)
+
+    def transcripts_sink(self):
+        return _TableSink(self, 'transcripts', TRANSCRIPT_FIELDS)
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+def open_storage(csv_path=None):
+    """SQLite storage when SQLITE_DB_PATH is set, a column store when CATALOGUE_STORE_PATH is, else the CSV files"""
+    db_path = os.getenv('SQLITE_DB_PATH')
+    if db_path and csv_path is None:
+        return SQLiteStorage(db_path)
+    store_path = os.getenv('CATALOGUE_STORE_PATH')
+    if store_path:
+        return ColumnarStorage(store_path, properties_path=csv_path)
+    return CSVStorage(properties_path=csv_path)
@@ -0,0 +1,135 @@
+import atexit
+import csv
+import os
+import threading
+from contextlib import contextmanager
+
+from metrics import get_logger
+
+log = get_logger('transcript')
+
+TRANSCRIPT_FIELDS = ['timestamp', 'listing_id', 'property_name', 'name', 'email', 'phone', 'user_query', 'bot_response']
+BOOKING_FIELDS = ['timestamp', 'listing_id', 'property_name', 'name', 'phone', 'user_message']
+
+def find_visits_file():
+    """Locate visits.csv, defaulting to <project root>/data/visits.csv"""
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    project_root = os.path.abspath(os.path.join(current_dir, os.pardir))
+    potential_paths = [
+        os.path.join(project_root, 'data', 'visits.csv'),
+        os.path.join(current_dir, 'data', 'visits.csv'),
+        'data/visits.csv',
+        '../data/visits.csv'
+    ]
+    for path in potential_paths:
+        if os.path.exists(path):
+            return path
+    return potential_paths[0]
+
+try:
+    import fcntl
+
+    def _lock_file(handle):
+        fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+
+    def _unlock_file(handle):
+        fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+except ImportError:  # Windows
+    import msvcrt
+
+    def _lock_file(handle):
+        handle.seek(0)
+        msvcrt.locking(handle.fileno(), msvcrt.LK_LOCK, 1)
+
+    def _unlock_file(handle):
+        handle.seek(0)
+        msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+
+@contextmanager
+def file_lock(path):
+    """Exclusive inter-process lock on a sidecar <path>.lock file"""
+    with open(f"{path}.lock", 'a+') as handle:
+        _lock_file(handle)
+        try:
+            yield
+        finally:
+            _unlock_file(handle)
+
+class TranscriptWriter:
+    """Append-only, lock-protected CSV writer.
+
+    Rows are buffered in memory and appended in batches once batch_size rows
+    are pending or flush_interval seconds have passed, whichever comes first.
+    Every append holds an exclusive file lock, so any number of threads and
+    processes can share the file without losing rows, and the cost of a write
+    does not depend on how large the file already is. The buffer is flushed on
+    close() and at interpreter exit.
+    """
+
+    def __init__(self, path, fieldnames=TRANSCRIPT_FIELDS, batch_size=20, flush_interval=0.5, fsync=False):
+        self.path = path
+        self.fieldnames = list(fieldnames)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.rows_written = 0
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._closed = threading.Event()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        if flush_interval:
+            threading.Thread(target=self._flush_periodically, name='transcript-flush', daemon=True).start()
+        atexit.register(self.close)
+
+    def _flush_periodically(self):
+        while not self._closed.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                log.warning("Transcript flush to %s failed, will retry: %s", self.path, e)
+
+    def write(self, row):
+        """Queue one row (a dict keyed by fieldnames) for appending"""
+        self.write_rows([row])
+
+    def write_rows(self, rows):
+        with self._lock:
+            self._buffer.extend(rows)
+            full = len(self._buffer) >= self.batch_size
+        if full:
+            self.flush()
+
+    def pending(self):
+        with self._lock:
+            return len(self._buffer)
+
+    def flush(self):
+        """Append every buffered row to the file under the inter-process lock"""
+        with self._flush_lock:
+            with self._lock:
+                rows, self._buffer = self._buffer, []
+            if not rows:
+                return 0
+            try:
+                with file_lock(self.path):
+                    with open(self.path, 'a', newline='', encoding='utf-8') as file:
+                        writer = csv.DictWriter(file, fieldnames=self.fieldnames, extrasaction='ignore')
+                        if os.fstat(file.fileno()).st_size == 0:
+                            writer.writeheader()
+                        writer.writerows(rows)
+                        file.flush()
+                        if self.fsync:
+                            os.fsync(file.fileno())
+            except Exception:
+                # Put the batch back so a transient I/O error doesn't lose rows
+                with self._lock:
+                    self._buffer[:0] = rows
+                raise
+            self.rows_written += len(rows)
+            return len(rows)
+
+    def close(self):
+        self._closed.set()
+        self.flush()
@@ -0,0 +1,195 @@
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+
+from metrics import get_logger
+
+log = get_logger('write_behind')
+
+FULL_QUEUE_POLICIES = ('block', 'drop', 'spill')
+
+class WriteBehindQueue:
+    """Bounded queue drained by a background thread that commits rows in batches.
+
+    Producers call submit(sink_name, row) and return immediately; the worker
+    groups queued rows per sink, calls sink.write_rows(rows) and then
+    sink.flush(). A sink is anything with those two methods, e.g. a
+    TranscriptWriter. When the queue is full, policy decides what happens:
+    'block' waits (up to block_timeout), 'drop' discards the row, and 'spill'
+    appends it as a JSON line to spill_path, to be replayed by replay_spill().
+    """
+
+    def __init__(self, maxsize=10000, batch_size=200, flush_interval=0.2, policy='block',
+                 spill_path=None, block_timeout=None):
+        if policy not in FULL_QUEUE_POLICIES:
+            raise ValueError(f"policy must be one of {FULL_QUEUE_POLICIES}, got {policy!r}")
+        if policy == 'spill' and not spill_path:
+            raise ValueError("the 'spill' policy needs a spill_path")
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.policy = policy
+        self.spill_path = spill_path
+        self.block_timeout = block_timeout
+        self.sinks = {}
+        self._queue = queue.Queue(maxsize)
+        self._spill_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {'enqueued': 0, 'written': 0, 'dropped': 0, 'spilled': 0, 'failed': 0, 'batches': 0}
+        self._max_depth = 0
+        self._last_commit_lag = 0.0
+        self._closed = False
+        self._worker = threading.Thread(target=self._run, name='write-behind', daemon=True)
+        self._worker.start()
+        atexit.register(self.close)
+
+    def register_sink(self, name, sink):
+        self.sinks[name] = sink
+
+    def _count(self, key, amount=1):
+        with self._stats_lock:
+            self._stats[key] += amount
+
+    def submit(self, sink_name, row):
+        """Enqueue row for sink_name; True if queued, False if dropped or spilled"""
+        if self._closed:
+            # The worker is gone (interpreter shutdown); write through synchronously
+            sink = self.sinks[sink_name]
+            sink.write_rows([row])
+            sink.flush()
+            self._count('written')
+            return True
+        item = (sink_name, row, time.monotonic())
+        try:
+            if self.policy == 'block':
+                self._queue.put(item, timeout=self.block_timeout)
+            else:
+                self._queue.put_nowait(item)
+        except queue.Full:
+            # A 'block' queue that times out spills too, if it has somewhere to spill to
+            if self.policy != 'drop' and self.spill_path:
+                self._spill(sink_name, row)
+            else:
+                self._count('dropped')
+            return False
+        self._count('enqueued')
+        depth = self._queue.qsize()
+        if depth > self._max_depth:
+            self._max_depth = depth
+        return True
+
+    def _spill(self, sink_name, row):
+        with self._spill_lock:
+            with open(self.spill_path, 'a', encoding='utf-8') as file:
+                file.write(json.dumps({'sink': sink_name, 'row': row}, ensure_ascii=False) + '\n')
+        self._count('spilled')
+
+    def replay_spill(self):
+        """Re-queue rows spilled while the queue was full; returns how many were replayed"""
+        if not self.spill_path or not os.path.exists(self.spill_path):
+            return 0
+        with self._spill_lock:
+            replay_path = f"{self.spill_path}.replay"
+            os.replace(self.spill_path, replay_path)
+        replayed = 0
+        with open(replay_path, encoding='utf-8') as file:
+            for line in file:
+                if line.strip():
+                    entry = json.loads(line)
+                    # Wait for room rather than spilling the same rows again
+                    self._queue.put((entry['sink'], entry['row'], time.monotonic()))
+                    self._count('enqueued')
+                    replayed += 1
+        os.remove(replay_path)
+        return replayed
+
+    def _next_batch(self):
+        """Block for the first item, then collect up to batch_size within flush_interval"""
+        try:
+            batch = [self._queue.get(timeout=0.1)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get(timeout=max(deadline - time.monotonic(), 0)))
+            except queue.Empty:
+                break
+        return batch
+
+    def _commit(self, batch):
+        rows_by_sink = {}
+        for sink_name, row, _ in batch:
+            rows_by_sink.setdefault(sink_name, []).append(row)
+        for sink_name, rows in rows_by_sink.items():
+            sink = self.sinks.get(sink_name)
+            try:
+                if sink is None:
+                    raise KeyError(f"no sink registered as {sink_name!r}")
+                sink.write_rows(rows)
+                sink.flush()
+                self._count('written', len(rows))
+            except Exception as e:
+                log.error("Write-behind commit to %s failed: %s", sink_name, e)
+                self._count('failed', len(rows))
+        self._count('batches')
+        self._last_commit_lag = time.monotonic() - batch[0][2]
+        for _ in batch:
+            self._queue.task_done()
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch:
+                self._commit(batch)
+            elif self._closed:
+                return
+
+    def depth(self):
+        return self._queue.qsize()
+
+    def lag(self):
+        """Seconds the oldest queued row has been waiting"""
+        with self._queue.mutex:
+            oldest = self._queue.queue[0][2] if self._queue.queue else None
+        return 0.0 if oldest is None else time.monotonic() - oldest
+
+    def metrics(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats.update({
+            'depth': self.depth(),
+            'max_depth': self._max_depth,
+            'lag_seconds': self.lag(),
+            'last_commit_lag_seconds': self._last_commit_lag,
+        })
+        return stats
+
+    def flush(self):
+        """Block until every row queued so far has been committed"""
+        self._queue.join()
+
+    def close(self, timeout=5.0):
+        """Drain the queue and stop the worker; later submits write through synchronously"""
+        if self._closed:
+            return
+        self._closed = True
+        self._worker.join(timeout)
+
+_default_queue = None
+_default_lock = threading.Lock()
+
+def default_queue():
+    """Process-wide write-behind queue configured from WRITE_QUEUE_* environment variables"""
+    global _default_queue
+    with _default_lock:
+        if _default_queue is None:
+            _default_queue = WriteBehindQueue(
+                maxsize=int(os.getenv('WRITE_QUEUE_SIZE', '10000')),
+                policy=os.getenv('WRITE_QUEUE_POLICY', 'block'),
+                spill_path=os.getenv('WRITE_QUEUE_SPILL_PATH') or None,
+                block_timeout=float(os.getenv('WRITE_QUEUE_BLOCK_TIMEOUT', '5'))
+            )
+        return _default_queue
@@ -0,0 +1,49 @@
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+os.environ.setdefault('GROQ_API_KEY', 'test')
+
+from batch_polish import run
+from fake_llm import FakeGroqClient
+from helpers import PropertyHelper
+from llm_cache import PolishedStore, ResponseCache
+from llm_gateway import LLMGateway
+from write_behind import WriteBehindQueue
+
+def make_helper(store, client):
+    return PropertyHelper(cache=ResponseCache(), llm=LLMGateway(client=client, retries=0),
+                          write_queue=WriteBehindQueue(), polished=store)
+
+def test_batch_run_is_incremental_and_resumable(tmp_path):
+    store = PolishedStore(str(tmp_path / 'polished.sqlite'))
+
+    def flaky_reply(messages):
+        # P005 is the only listing in Bangalore; it fails on the first run
+        if 'Bangalore' in messages[-1]['content']:
+            raise ConnectionError('upstream down')
+        return f"Polished: {messages[-1]['content']}"
+
+    flaky = FakeGroqClient(reply=flaky_reply)
+    report = run(make_helper(store, flaky), store, rate=0, concurrency=4)
+    assert (report['listings'], report['polished'], report['failed']) == (12, 11, 1)
+
+    client = FakeGroqClient(reply=lambda messages: f"Polished: {messages[-1]['content']}")
+    helper = make_helper(store, client)
+    report = run(helper, store, rate=0, concurrency=4)
+    assert (report['polished'], report['skipped'], report['failed']) == (1, 11, 0)
+    assert client.calls == 1
+
+    # The chatbot serves the stored text without calling the LLM
+    answer = helper.format_property_details(helper.get_property_by_id('P003'))
+    assert answer.startswith('Polished: Marina Studio')
+    assert ''.join(helper.stream_property_details(helper.get_property_by_id('P005'))).startswith('Polished: ')
+    assert client.calls == 1
+
+    df = helper.properties_df.copy()
+    df.loc[df['listing_id'] == 'P003', 'price'] = 99000
+    helper.set_properties(df)
+    report = run(helper, store, rate=0, concurrency=4)
+    assert (report['polished'], report['skipped'], report['pruned']) == (1, 11, 1)
+    assert '99,000' in helper.format_property_details(helper.get_property_by_id('P003'))
+    assert len(store) == 12
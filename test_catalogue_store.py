@@ -0,0 +1,105 @@
+import os
+import shutil
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmarks'))
+os.environ.setdefault('GROQ_API_KEY', 'test')
+
+from catalogue import InMemoryCatalogue
+from catalogue_gen import make_catalogue
+from catalogue_store import ColumnarCatalogue, write_store
+from catalogue_watcher import StoreWatcher
+from helpers import PropertyHelper
+from search_engine import make_query
+from storage import ColumnarStorage, find_properties_file
+from write_behind import WriteBehindQueue
+
+def test_store_answers_like_memory(tmp_path):
+    df = make_catalogue(3000, seed=4)
+    df.loc[5, 'address'] = np.nan
+    df.loc[7, 'city'] = np.nan
+    path = str(tmp_path / 'properties.colstore')
+    write_store(df, path)
+    store, memory = ColumnarCatalogue(path), InMemoryCatalogue(df)
+
+    pd.testing.assert_frame_equal(store.to_dataframe(), df)
+    assert store._kinds['city'] == 'categorical' and store._kinds['property_name'] == 'string'
+    assert store.get('P0006')['address'] != store.get('P0006')['address']  # NaN, like pandas
+    # repr() so NaN cells compare equal
+    assert all(repr(tuple(store.get(listing_id))) == repr(tuple(memory.get(listing_id)))
+               for listing_id in df['listing_id'][:500])
+    assert store.get('P9999') is None and store.get(6) is None
+    for query in ['marina', 'sunrise apartments 12', 'palm grve 33', 'heights 29']:
+        assert ([(row['listing_id'], match) for row, match in store.search_names(query, k=3)]
+                == [(row['listing_id'], match) for row, match in memory.search_names(query, k=3)])
+        assert store.first_name_match(query) == memory.first_name_match(query)
+    query = make_query({'price': (None, 500000)}, {'city': ['dubai']}, descending=True)
+    assert ([row['listing_id'] for row in store.search(query, page=1).results]
+            == [row['listing_id'] for row in memory.search(query, page=1).results])
+    assert store.search_vocabulary() == memory.search_vocabulary()
+
+def test_reload_diffs_stored_row_hashes(tmp_path, monkeypatch):
+    df = make_catalogue(1000, seed=6)
+    path = str(tmp_path / 'properties.colstore')
+    write_store(df, path)
+    store = ColumnarCatalogue(path)
+    edited = df[df['listing_id'] != 'P0002'].copy()
+    edited.loc[edited['listing_id'] == 'P0010', 'price'] += 1
+    edited = pd.concat([edited, make_catalogue(1001, seed=6).tail(1)], ignore_index=True)
+
+    def decode_everything(self):
+        raise AssertionError("the catalogue was decoded to diff a reload")
+
+    monkeypatch.setattr(ColumnarCatalogue, 'to_dataframe', decode_everything)
+    updated, delta = store.updated(edited)
+    assert delta == {'added': ['P1001'], 'changed': ['P0010'], 'removed': ['P0002']}
+    assert updated.get('P0010')['price'] == store.get('P0010')['price'] + 1
+    assert updated.reopened()[1] == {'added': [], 'changed': [], 'removed': []}
+
+def test_storage_converts_on_csv_change(tmp_path):
+    csv_path = str(tmp_path / 'properties.csv')
+    shutil.copy(next(path for path in find_properties_file() if os.path.exists(path)), csv_path)
+    store_path = str(tmp_path / 'properties.colstore')
+    storage = ColumnarStorage(store_path, properties_path=csv_path, visits_path=str(tmp_path / 'visits.csv'))
+    helper = PropertyHelper(storage=storage, write_queue=WriteBehindQueue())
+    assert helper.get_property_by_id('P003')['price'] == 95000
+    assert helper.get_property_by_name('marina studio')['listing_id'] == 'P003'
+    first = os.stat(store_path).st_mtime_ns
+    assert isinstance(storage.catalogue(), ColumnarCatalogue)
+    assert os.stat(store_path).st_mtime_ns == first  # unchanged CSV: the store is reused
+    os.utime(csv_path, ns=(first + 10**9, first + 10**9))
+    assert isinstance(storage.catalogue(), ColumnarCatalogue)
+    assert os.stat(store_path).st_mtime_ns == first  # touched only: the checksum still matches
+
+    df = pd.read_csv(csv_path)
+    df.loc[df['listing_id'] == 'P003', 'price'] = 99000
+    df.to_csv(csv_path, index=False)
+    delta = helper.reload_properties()
+    assert delta == {'added': [], 'changed': ['P003'], 'removed': []}
+    assert helper.get_property_by_id('P003')['price'] == 99000
+    assert ColumnarStorage(store_path, properties_path=csv_path).catalogue().get('P003')['price'] == 99000
+
+def test_workers_share_the_store(tmp_path):
+    csv_path = str(tmp_path / 'properties.csv')
+    shutil.copy(next(path for path in find_properties_file() if os.path.exists(path)), csv_path)
+    store_path = str(tmp_path / 'properties.colstore')
+    helpers = [PropertyHelper(storage=ColumnarStorage(store_path, csv_path, str(tmp_path / 'visits.csv')),
+                              write_queue=WriteBehindQueue()) for _ in range(2)]
+    # The search indexes are views of the mapped file, not per-process copies
+    engine = helpers[1].catalogue.search_engine
+    assert not any(array.flags.owndata for array in engine._arrays.values())
+    watcher = StoreWatcher(helpers[1])
+
+    df = pd.read_csv(csv_path)
+    df.loc[df['listing_id'] == 'P003', 'price'] = 99000
+    df.to_csv(csv_path, index=False)
+    helpers[0].reload_properties()  # worker 0 rewrites the shared store
+    assert watcher.check() == {'added': [], 'changed': ['P003'], 'removed': []}
+    assert helpers[1].get_property_by_id('P003')['price'] == 99000
+    query = make_query({'price': (99000, 99000)})
+    assert [row['listing_id'] for row in helpers[1].catalogue.search(query).results] == ['P003']
+    assert watcher.check() is None
@@ -0,0 +1,67 @@
+import os
+import sys
+
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+os.environ.setdefault('GROQ_API_KEY', 'test')
+
+from catalogue import InMemoryCatalogue
+from catalogue_watcher import CatalogueWatcher
+from helpers import PropertyHelper
+from llm_cache import ResponseCache
+
+def make_helper(tmp_path):
+    source = PropertyHelper().properties_df
+    csv_path = tmp_path / 'properties.csv'
+    source.to_csv(csv_path, index=False)
+    return PropertyHelper(str(csv_path), cache=ResponseCache()), csv_path
+
+def test_incremental_update_matches_full_rebuild():
+    df = PropertyHelper().properties_df
+    old = InMemoryCatalogue(df)
+    edited = df[df['listing_id'] != 'P002'].copy()
+    edited.loc[edited['listing_id'] == 'P003', 'property_name'] = 'Harbour Loft'
+    edited.loc[edited['listing_id'] == 'P001', 'price'] = 1
+    edited = pd.concat([edited, df.iloc[[0]].assign(listing_id='P100', property_name='Canal Penthouse')])
+
+    new, delta = old.updated(edited)
+    assert delta == {'added': ['P100'], 'changed': ['P001', 'P003'], 'removed': ['P002']}
+    full = InMemoryCatalogue(edited)
+    assert new.id_index == full.id_index
+    for query in ['harbour loft', 'canal', 'marina studio', 'villa', 'desert view', 'Canal Penthose']:
+        assert [m.key for _, m in new.search_names(query)] == [m.key for _, m in full.search_names(query)]
+    assert new.first_name_match('villa')['listing_id'] == full.first_name_match('villa')['listing_id']
+
+    # The old snapshot is untouched for readers still holding it
+    assert old.get('P002') is not None and old.get('P100') is None
+    assert old.search_names('marina studio')[0][1].key == 'P003'
+
+def test_watcher_applies_edits_and_ignores_touches(tmp_path):
+    helper, csv_path = make_helper(tmp_path)
+    watcher = CatalogueWatcher(helper, interval=60)
+    before = helper.catalogue
+    helper.cache.set('key', 'polished P003', tag='P003')
+
+    os.utime(csv_path, ns=(1, 1))
+    assert watcher.check() is None
+    assert helper.catalogue is before
+
+    df = pd.read_csv(csv_path)
+    df.loc[df['listing_id'] == 'P003', 'price'] = 123456
+    df.to_csv(csv_path, index=False)
+    os.utime(csv_path, ns=(2, 2))
+    delta = watcher.check()
+    assert delta == {'added': [], 'changed': ['P003'], 'removed': []}
+    assert helper.get_property_by_id('P003')['price'] == 123456
+    assert before.get('P003')['price'] != 123456
+    assert helper.cache.get('key') is None
+    assert watcher.reloads == 1
+
+def test_watcher_keeps_catalogue_on_bad_file(tmp_path):
+    helper, csv_path = make_helper(tmp_path)
+    watcher = CatalogueWatcher(helper, interval=60)
+    before = helper.catalogue
+    csv_path.write_text('')
+    assert watcher.check() is None
+    assert helper.catalogue is before
@@ -0,0 +1,96 @@
+import asyncio
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+os.environ.setdefault('GROQ_API_KEY', 'test')
+
+from chat_engine import ChatEngine
+from fake_llm import FakeGroqClient
+from helpers import FAQHelper, PropertyHelper
+from llm_cache import ResponseCache
+from llm_gateway import LLMGateway
+from write_behind import WriteBehindQueue
+
+class ListSink:
+    def __init__(self):
+        self.rows = []
+
+    def write_rows(self, rows):
+        self.rows.extend(rows)
+
+    def flush(self):
+        pass
+
+def make_engine(delay=0.0, cache_size=1024):
+    client = FakeGroqClient(reply=lambda messages: f"Polished: {messages[-1]['content']}", first_token_delay=delay)
+    helper = PropertyHelper(cache=ResponseCache(max_entries=cache_size), llm=LLMGateway(client=client, max_concurrency=32),
+                            write_queue=WriteBehindQueue())
+    sinks = {'bookings': ListSink(), 'transcripts': ListSink()}
+    for name, sink in sinks.items():
+        helper.write_queue.register_sink(name, sink)
+    return ChatEngine(helper, FAQHelper()), sinks
+
+def test_booking_flow_and_paging():
+    engine, sinks = make_engine()
+    session = engine.new_session({'name': 'Jane Doe', 'email': 'jane@example.com', 'phone': '555-0100'})
+    kinds = [engine.handle_turn(session, prompt).kind for prompt in ["I want to book a visit", "Jane Doe", "555-0100"]]
+    assert kinds == ['booking', 'booking_flow', 'booking_flow']
+    result = engine.handle_turn(session, "Marina Studio")
+    assert (result.property_id, result.property_name) == ('P003', 'Marina Studio')
+    assert 'Visit booking confirmed!' in result.response and session.booking_state is None
+
+    result = engine.handle_turn(session, "Show me all properties")
+    assert result.kind == 'search' and session.last_search[1] == 0
+    assert engine.handle_turn(session, "more").kind == 'more' and session.last_search[1] == 1
+
+    engine.property_helper.write_queue.flush()
+    assert sinks['bookings'].rows[-1]['name'] == 'Jane Doe' and sinks['bookings'].rows[-1]['listing_id'] == 'P003'
+    assert len(sinks['transcripts'].rows) == 6 and sinks['transcripts'].rows[0]['email'] == 'jane@example.com'
+    assert len(session.messages) == 12 and session.messages[-1]['role'] == 'assistant'
+
+def test_property_answers_block_or_stream():
+    engine, sinks = make_engine()
+    session = engine.new_session()
+    result = engine.handle_turn(session, "What is the price of P003?")
+    assert result.response.startswith('Polished: ') and result.response_stream is None
+    result = engine.handle_turn(session, "Tell me about P005", stream=True)
+    assert result.response == '' and session.messages[-1]['role'] == 'user'
+    text = ''.join(result.response_stream)
+    assert text.startswith('Polished: ') and session.messages[-1]['content'] == text
+    assert engine.handle_turn(session, "Where is your office?").response.startswith('Our office')
+    assert 'P001' in engine.handle_turn(session, "Details of P999").response
+
+def test_async_turns_interleave_sessions():
+    engine, sinks = make_engine(delay=0.2, cache_size=0)
+    sessions = [engine.new_session({'name': f"User {i}"}) for i in range(10)]
+
+    async def conversation(session, listing_id):
+        answer = await engine.ahandle_turn(session, f"What is the price of {listing_id}?")
+        streamed = await engine.ahandle_turn(session, f"Is {listing_id} available?", stream=True)
+        return answer.response, ''.join([token async for token in streamed.response_stream])
+
+    async def main():
+        return await asyncio.gather(*(conversation(session, f"P{i % 12 + 1:03d}") for i, session in enumerate(sessions)))
+
+    start = time.perf_counter()
+    results = asyncio.run(main())
+    # 20 LLM calls of 0.2 s each, but only two rounds of waiting
+    assert time.perf_counter() - start < 1.5
+    assert all(answer.startswith('Polished: ') and streamed.startswith('Polished: ') for answer, streamed in results)
+    assert all(len(session.messages) == 4 for session in sessions)
+
+def test_history_keeps_a_bounded_window():
+    engine, sinks = make_engine()
+    engine.history_size = 6
+    session = engine.new_session({'name': 'Jane Doe'})
+    for i in range(5):
+        engine.handle_turn(session, "Where is your office?" if i % 2 else "What are your working hours?")
+    history = session.messages
+    assert len(history) == 6 and history.total == 10 and history.spilled == 4
+    assert [message.role for message in history.window(3)] == ['assistant', 'user', 'assistant']
+    assert history.window(3) == history.window(0)[-3:] and history[-1]['content'].startswith('We are open')
+    engine.property_helper.write_queue.flush()
+    # The messages dropped from memory are still in the transcript log
+    assert len(sinks['transcripts'].rows) == 5
@@ -0,0 +1,30 @@
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+os.environ.setdefault('GROQ_API_KEY', 'test')
+
+from faq_retrieval import FAQRetriever, load_faqs
+from helpers import FAQHelper
+
+def test_paraphrases_reach_the_right_answer(tmp_path):
+    helper = FAQHelper(FAQRetriever.build(load_faqs(), str(tmp_path / 'faq_index.npz')))
+    assert helper.get_faq_answer("Where are you based?") == helper.faqs['office location']
+    assert helper.get_faq_answer("wat time do u open") == helper.faqs['working hours']
+    assert helper.get_faq_answer("how do I get in touch") == helper.faqs['contact']
+    # Literal keys keep working, and unrelated questions stay unanswered
+    assert helper.get_faq_answer("services") == helper.faqs['services']
+    assert helper.get_faq_answer("what's the weather like") is None
+
+def test_index_is_persisted_and_rebuilt_when_faqs_change(tmp_path):
+    index_path = str(tmp_path / 'faq_index.npz')
+    faqs = load_faqs()
+    first = FAQRetriever.build(faqs, index_path)
+    mtime = os.path.getmtime(index_path)
+    loaded = FAQRetriever.build(faqs, index_path)
+    assert os.path.getmtime(index_path) == mtime
+    assert loaded.search("office hours") == first.search("office hours")
+
+    faqs = faqs + [{'key': 'parking', 'answer': 'Every listing has parking.', 'questions': ['Is there parking?']}]
+    changed = FAQRetriever.build(faqs, index_path)
+    assert changed.answer("do the flats come with a parking spot") == 'Every listing has parking.'
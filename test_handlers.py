@@ -0,0 +1,63 @@
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+os.environ.setdefault('GROQ_API_KEY', 'test')
+
+from chat_engine import ChatEngine, default_handlers
+from handlers import reply
+from helpers import FAQHelper, PropertyHelper
+from llm_cache import ResponseCache
+from metrics import REGISTRY
+from session_store import MemorySessionStore
+from write_behind import WriteBehindQueue
+
+class ListSink:
+    def __init__(self):
+        self.rows = []
+
+    def write_rows(self, rows):
+        self.rows.extend(rows)
+
+    def flush(self):
+        pass
+
+def make_engine(handlers):
+    helper = PropertyHelper(cache=ResponseCache(max_entries=0), write_queue=WriteBehindQueue())
+    for name in ('bookings', 'transcripts'):
+        helper.write_queue.register_sink(name, ListSink())
+    return ChatEngine(helper, FAQHelper(), log_transcripts=False, sessions=MemorySessionStore(), handlers=handlers)
+
+def test_plugin_registers_an_intent():
+    engine = make_engine(default_handlers(plugins='compare_plugin'))
+    session = engine.new_session()
+    result = engine.handle_turn(session, "Can you compare P001 and P003?")
+    assert result.kind == 'compare' and "Best value per sqft: Marina Studio." in result.response
+    assert engine.handle_turn(session, "compare P001").response.startswith("Give me two or more")
+    # Without a listing ID the plugin's requirement is not met and the FAQ fallback answers
+    assert engine.handle_turn(session, "compare your office hours").kind == 'faq'
+    # Built-in intents are unaffected
+    assert engine.handle_turn(session, "What is the price of P002?").kind == 'property_query'
+    assert REGISTRY.histogram('handler_compare').snapshot()['count'] >= 2
+
+def test_handlers_override_and_route_by_state():
+    handlers = default_handlers(plugins=[])
+    calls = []
+
+    @handlers.register('search')
+    def search(engine, session, prompt, extraction):
+        calls.append(extraction.categories)
+        return reply("custom search", 'search')
+
+    engine = make_engine(handlers)
+    session = engine.new_session()
+    assert engine.handle_turn(session, "villas in Dubai").response == "custom search"
+    assert calls == [{'city': ('Dubai',), 'property_type': ('Villa',)}]
+    # No search ran, so "more" is not a paging command here
+    assert engine.handle_turn(session, "more").kind == 'faq'
+    # A property word without an ID or name falls back to the FAQs
+    assert engine.handle_turn(session, "Can you help me sell my house?").kind == 'faq'
+    for prompt, kind in [("I want to book a visit", 'booking'), ("Jane", 'booking_flow'), ("555", 'booking_flow'),
+                         ("any", 'booking_flow')]:
+        assert engine.handle_turn(session, prompt).kind == kind
+    assert session.booking_state is None
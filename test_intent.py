@@ -0,0 +1,54 @@
+import csv
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+os.environ.setdefault('GROQ_API_KEY', 'test')
+
+from helpers import PropertyHelper, detect_intent
+from intent import IntentExtractor
+
+LABELS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'intent_labels.csv')
+
+def load_labels():
+    with open(LABELS_PATH, newline='', encoding='utf-8') as file:
+        return list(csv.DictReader(file))
+
+def test_labelled_set_accuracy():
+    extractor = IntentExtractor(PropertyHelper().catalogue.search_vocabulary())
+    rows = load_labels()
+    wrong = []
+    for row in rows:
+        extraction = extractor.extract(row['text'])
+        expected_ids = row['listing_ids'].split('|') if row['listing_ids'] else []
+        if extraction.intent != row['intent'] or extraction.listing_ids != expected_ids:
+            wrong.append((row['text'], extraction.intent, extraction.listing_ids))
+        elif row['names'] and extraction.names != row['names'].split('|'):
+            wrong.append((row['text'], extraction.names))
+    assert not wrong, wrong
+
+    # Without a catalogue vocabulary only city-only searches are harder; intents must stay close
+    correct = sum(detect_intent(row['text']) == row['intent'] for row in rows)
+    assert correct / len(rows) >= 0.95
+
+def test_entities_in_one_pass():
+    extractor = IntentExtractor({'city': {'dubai': 'Dubai'}, 'property_type': {'apartment': 'Apartment'}},
+                                id_pattern=r"\b[a-z]{1,3}-?\d{3,}\b")
+    extraction = extractor.extract("Tell me about 2BHK apartments in Dubai under 300k, like APT-1042")
+    assert extraction.intent == 'property_query'
+    assert extraction.listing_ids == ['APT-1042']
+    assert extraction.names == ['2BHK apartments in Dubai under 300k, like APT-1042']
+    # Words inside the name span are still tokenised
+    assert extraction.categories == {'property_type': ('Apartment',), 'city': ('Dubai',)}
+    assert extraction.ranges == {'bedrooms': (2, 2), 'price': (None, 300000)}
+
+def test_custom_id_format_and_currency_amounts(monkeypatch):
+    assert IntentExtractor().extract("budget Rs500000, what about p0042?").listing_ids == ['P0042']
+    # Words that merely look like a letter prefix and digits are not listing IDs by default
+    for text in ("flats max1000 sqft in Dubai", "villas sq1200 or bigger", "any bhk2000 deals?"):
+        assert IntentExtractor().extract(text).listing_ids == [], text
+    monkeypatch.setenv('LISTING_ID_PATTERN', r"\b[a-z]{1,3}-?\d{3,}\b")
+    extraction = IntentExtractor().extract("How big is listing VL2041? And APT-1042?")
+    assert extraction.intent == 'property_query' and extraction.listing_ids == ['VL2041', 'APT-1042']
+    extractor = IntentExtractor(id_pattern=r"\bLST_\d+\b")
+    assert extractor.extract("is LST_77 available? not P001").listing_ids == ['LST_77']
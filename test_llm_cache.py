@@ -0,0 +1,57 @@
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+os.environ.setdefault('GROQ_API_KEY', 'test')
+
+from fake_llm import FakeGroqClient
+from helpers import PropertyHelper
+from llm_cache import MemoryCache, ResponseCache, make_cache_key
+from llm_gateway import LLMGateway
+
+def test_key_depends_on_model_and_temperature():
+    assert make_cache_key('x', 'm', 0.3) == make_cache_key('x', 'm', 0.3)
+    assert make_cache_key('x', 'm', 0.3) != make_cache_key('x', 'm', 0.7)
+    assert make_cache_key('x', 'm', 0.3) != make_cache_key('x', 'other', 0.3)
+
+def test_memory_cache_lru_and_ttl():
+    cache = MemoryCache(max_entries=2, ttl=60)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    assert cache.evictions == 1
+
+    cache.set('short', 4, ttl=0.01)
+    time.sleep(0.02)
+    assert cache.get('short') is None
+    assert cache.expirations == 1
+
+def test_disk_cache_survives_restart(tmp_path):
+    path = str(tmp_path / 'cache.sqlite')
+    ResponseCache(disk_path=path).set('k', 'polished', tag='P001')
+    cache = ResponseCache(disk_path=path)
+    assert cache.get('k') == 'polished'
+    assert cache.stats()['hits'] == 1
+    assert cache.invalidate_tag('P001') == 1
+    assert cache.get('k') is None  # the copy promoted to memory kept its tag
+    assert ResponseCache(disk_path=path).get('k') is None
+
+def test_hot_listing_skips_llm_and_row_change_invalidates():
+    client = FakeGroqClient()
+    helper = PropertyHelper(cache=ResponseCache(), llm=LLMGateway(client=client))
+    first = helper.format_property_details(helper.get_property_by_id('P003'))
+    second = helper.format_property_details(helper.get_property_by_id('P003'))
+    assert first == second
+    assert client.calls == 1
+    assert helper.cache.stats()['hits'] == 1
+
+    df = helper.properties_df.copy()
+    df.loc[df['listing_id'] == 'P003', 'price'] = 99000
+    helper.set_properties(df)
+    assert helper.cache.stats()['invalidations'] == 1
+    assert '99,000' in helper.format_property_details(helper.get_property_by_id('P003'))
+    assert client.calls == 2
@@ -0,0 +1,193 @@
+import asyncio
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+os.environ.setdefault('GROQ_API_KEY', 'test')
+
+from fake_llm import FakeGroqClient
+from helpers import PropertyHelper
+from llm_cache import ResponseCache
+from llm_gateway import CircuitBreaker, CircuitOpenError, GatewayError, LLMGateway, split_batch
+from metrics import REGISTRY
+
+MESSAGES = [{"role": "user", "content": "hello world"}]
+
+class FlakyClient(FakeGroqClient):
+    """Fails the first `failures` calls, then behaves"""
+    def __init__(self, failures, **kwargs):
+        super().__init__(**kwargs)
+        self.failures = failures
+
+    async def create(self, model, messages, stream=False, **kwargs):
+        if self.calls < self.failures:
+            self.calls += 1
+            raise ConnectionError("flaky upstream")
+        return await super().create(model, messages, stream=stream, **kwargs)
+
+def test_concurrency_is_capped_by_semaphore():
+    client = FakeGroqClient(first_token_delay=0.02)
+    gateway = LLMGateway(client=client, max_concurrency=3)
+
+    async def burst():
+        return await asyncio.gather(*(gateway.complete(MESSAGES, model='m') for _ in range(12)))
+
+    results = asyncio.run_coroutine_threadsafe(burst(), gateway.loop).result(5)
+    assert len(results) == 12
+    assert client.max_in_flight == 3
+
+def test_deadline_bounds_slow_upstream():
+    gateway = LLMGateway(client=FakeGroqClient(first_token_delay=5), timeout=0.1, retries=3)
+    start = time.perf_counter()
+    with pytest.raises(GatewayError):
+        gateway.complete_sync(MESSAGES, model='m')
+    assert time.perf_counter() - start < 1
+
+def test_retries_with_backoff_then_succeeds():
+    client = FlakyClient(failures=2)
+    gateway = LLMGateway(client=client, retries=2, backoff=0.01)
+    assert gateway.complete_sync(MESSAGES, model='m') == "Here are the details: hello world"
+    assert client.calls == 3
+
+def test_circuit_breaker_opens_and_recovers():
+    client = FlakyClient(failures=2)
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    gateway = LLMGateway(client=client, retries=0, breaker=breaker)
+    for _ in range(2):
+        with pytest.raises(GatewayError):
+            gateway.complete_sync(MESSAGES, model='m')
+    with pytest.raises(CircuitOpenError):
+        gateway.complete_sync(MESSAGES, model='m')
+    assert client.calls == 2
+
+    time.sleep(0.06)
+    assert gateway.complete_sync(MESSAGES, model='m')
+    assert breaker.state == 'closed'
+
+def test_deadline_spent_waiting_for_a_slot_is_not_a_breaker_failure():
+    client = FakeGroqClient(first_token_delay=0.5)
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+    gateway = LLMGateway(client=client, max_concurrency=1, breaker=breaker)
+
+    async def stream(timeout):
+        return ''.join([token async for token in gateway.stream(MESSAGES, timeout=timeout, model='m')])
+
+    async def queued_behind_a_slow_call():
+        first = asyncio.ensure_future(gateway.complete(MESSAGES, timeout=5, model='m'))
+        await asyncio.sleep(0)
+        start = time.perf_counter()
+        late = await asyncio.gather(gateway.complete(MESSAGES, timeout=0.05, model='m'), stream(0.05),
+                                    return_exceptions=True)
+        waited = time.perf_counter() - start
+        return await first, late, waited
+
+    first, late, waited = asyncio.run_coroutine_threadsafe(queued_behind_a_slow_call(), gateway.loop).result(5)
+    assert first == "Here are the details: hello world"
+    assert all(isinstance(error, GatewayError) for error in late) and waited < 0.3
+    assert client.calls == 1 and breaker.state == 'closed' and breaker.failures == 0
+
+def test_cancelled_half_open_trial_is_handed_back():
+    client = FlakyClient(failures=1, first_token_delay=0.2)
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    gateway = LLMGateway(client=client, retries=0, breaker=breaker)
+    with pytest.raises(GatewayError):
+        gateway.complete_sync(MESSAGES, model='m')
+    time.sleep(0.06)
+
+    async def abandoned_trials():
+        trial = asyncio.ensure_future(gateway.complete(MESSAGES, model='m'))
+        await asyncio.sleep(0.05)
+        trial.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await trial
+        tokens = gateway.stream(MESSAGES, key='k', model='m')
+        await tokens.__anext__()
+        await tokens.aclose()  # the last follower leaving cancels the shared upstream stream
+        await asyncio.sleep(0.01)
+
+    asyncio.run_coroutine_threadsafe(abandoned_trials(), gateway.loop).result(5)
+    assert breaker.state == 'half_open'
+    assert gateway.complete_sync(MESSAGES, model='m') == "Here are the details: hello world"
+    assert breaker.state == 'closed' and client.calls == 4
+
+def test_open_circuit_falls_back_to_template_immediately():
+    client = FakeGroqClient(error=ConnectionError("down"), first_token_delay=0.5)
+    gateway = LLMGateway(client=client, retries=0, breaker=CircuitBreaker(failure_threshold=1, reset_timeout=60))
+    helper = PropertyHelper(cache=ResponseCache(), llm=gateway)
+    prop = helper.get_property_by_id('P001')
+    assert helper.format_property_details(prop) == helper.render_template(prop)
+
+    start = time.perf_counter()
+    assert ''.join(helper.stream_property_details(prop)) == helper.render_template(prop)
+    assert time.perf_counter() - start < 0.1
+    assert client.calls == 1
+
+def test_async_callers_on_another_loop_share_the_gateway():
+    client = FakeGroqClient(first_token_delay=0.02)
+    gateway = LLMGateway(client=client, max_concurrency=3)
+
+    async def caller():
+        answers = await asyncio.gather(*(gateway.complete_async(MESSAGES, model='m') for _ in range(6)))
+        tokens = [token async for token in gateway.stream_async(MESSAGES, model='m')]
+        return answers, ''.join(tokens)
+
+    answers, streamed = asyncio.run(caller())  # a loop of its own, as a web server would have
+    assert answers == ["Here are the details: hello world"] * 6
+    assert streamed == "Here are the details: hello world"
+    assert client.max_in_flight == 3
+
+    failing = LLMGateway(client=FakeGroqClient(error=ConnectionError("down")), retries=0)
+
+    async def failing_stream():
+        return [token async for token in failing.stream_async(MESSAGES, model='m')]
+
+    with pytest.raises(GatewayError):
+        asyncio.run(failing_stream())
+
+def saved_calls():
+    return sum(value for (name, _), value in REGISTRY.counters().items() if name == 'llm_calls_saved')
+
+def test_identical_polish_requests_share_one_call():
+    client = FakeGroqClient(first_token_delay=0.05, chunk_delay=0.005)
+    helper = PropertyHelper(cache=ResponseCache(max_entries=0), llm=LLMGateway(client=client))
+    prop = helper.get_property_by_id('P001')
+    saved = saved_calls()
+    with ThreadPoolExecutor(8) as pool:
+        answers = list(pool.map(lambda _: helper.format_property_details(prop), range(8)))
+    assert client.calls == 1 and set(answers) == {"Here are the details: " + helper.render_template(prop)}
+
+    with ThreadPoolExecutor(4) as pool:
+        streams = list(pool.map(lambda _: ''.join(helper.stream_property_details(prop)), range(4)))
+    assert client.calls == 2 and set(streams) == set(answers)
+    assert saved_calls() - saved == 10
+
+def test_batch_window_packs_distinct_jobs():
+    client = FakeGroqClient(first_token_delay=0.02)
+    gateway = LLMGateway(client=client, batch_window=0.05, max_batch=4)
+    helper = PropertyHelper(cache=ResponseCache(max_entries=0), llm=gateway)
+    props = [helper.get_property_by_id(f"P00{i}") for i in range(1, 7)]
+    with ThreadPoolExecutor(6) as pool:
+        answers = list(pool.map(helper.format_property_details, props))
+    # Four jobs fill one batch, the other two go together when the window closes
+    assert client.calls == 2
+    assert answers == [helper.render_template(prop) for prop in props]
+
+    # A job the reply leaves out is sent again on its own
+    def forgetful(messages):
+        prompt = messages[-1]['content']
+        return prompt.split("\n### Listing 2")[0] if "### Listing" in prompt else f"Alone: {prompt}"
+
+    client = FakeGroqClient(reply=forgetful)
+    gateway = LLMGateway(client=client, batch_window=0.05)
+    jobs = [[{"role": "system", "content": "Polish"}, {"role": "user", "content": text}] for text in ("a", "b")]
+
+    async def burst():
+        return await asyncio.gather(*(gateway.complete(messages, model='m') for messages in jobs))
+
+    assert asyncio.run_coroutine_threadsafe(burst(), gateway.loop).result(5) == ["a", "Alone: b"]
+    assert client.calls == 2
+    assert split_batch("intro\n### Listing 1\nfirst\n### Listing 3\nthird", 3) == {0: 'first', 2: 'third'}
@@ -0,0 +1,60 @@
+import os
+import sys
+import urllib.request
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+os.environ.setdefault('GROQ_API_KEY', 'test')
+
+from helpers import PropertyHelper
+from metrics import REGISTRY, LatencyHistogram, Metrics, MetricsExporter
+from write_behind import WriteBehindQueue
+
+def test_histogram_quantiles_within_bucket_precision():
+    values = np.random.default_rng(0).lognormal(-5, 1.5, 20000)
+    histogram = LatencyHistogram()
+    for value in values:
+        histogram.record(float(value))
+    for quantile, estimate in histogram.quantiles().items():
+        exact = float(np.quantile(values, quantile))
+        assert abs(estimate - exact) / exact < 0.05
+    buckets = histogram.cumulative((0.001, 0.01, 0.1))
+    assert buckets == sorted(buckets) and buckets[-1] <= len(values)
+    assert histogram.snapshot()['count'] == len(values)
+
+def test_prometheus_exposition_and_endpoint(tmp_path):
+    metrics = Metrics()
+    with metrics.timer('intent'):
+        pass
+    metrics.observe('polish_llm', 0.3)
+    metrics.count('turns', intent='faq')
+    metrics.count('turns', intent='faq')
+    text = metrics.render_prometheus()
+    assert '# TYPE zorever_stage_seconds histogram' in text
+    assert 'zorever_stage_seconds_bucket{stage="polish_llm",le="0.25"} 0' in text
+    assert 'zorever_stage_seconds_bucket{stage="polish_llm",le="0.5"} 1' in text
+    assert 'zorever_stage_seconds_count{stage="intent"} 1' in text
+    assert 'zorever_turns_total{intent="faq"} 2' in text
+
+    metrics.write_prometheus(str(tmp_path / 'zorever.prom'))
+    assert (tmp_path / 'zorever.prom').read_text() == text
+    exporter = MetricsExporter(metrics, port=0)
+    try:
+        url = f"http://127.0.0.1:{exporter.server.server_address[1]}/metrics"
+        assert urllib.request.urlopen(url, timeout=5).read().decode('utf-8') == text
+    finally:
+        exporter.stop()
+
+    disabled = Metrics(enabled=False)
+    with disabled.timer('intent'):
+        disabled.count('turns')
+    assert disabled.stage_summary() == [] and disabled.counters() == {}
+
+def test_helper_stages_are_timed():
+    helper = PropertyHelper(write_queue=WriteBehindQueue())
+    before = REGISTRY.histogram('lookup_name').snapshot()['count']
+    helper.get_property_by_name('marina studio')
+    helper.extract('2BHK apartments in Dubai')
+    assert REGISTRY.histogram('lookup_name').snapshot()['count'] == before + 1
+    assert 'intent' in {row['stage'] for row in REGISTRY.stage_summary()}
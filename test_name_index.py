@@ -0,0 +1,38 @@
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+os.environ.setdefault('GROQ_API_KEY', 'test')
+
+from helpers import PropertyHelper
+from name_index import NameIndex
+
+NAMES = ['Sunrise Apartments', 'Desert View Villa', 'Marina Studio', 'TechPark Studio', 'Riverfront Villa', 'Sunrise']
+KEYS = ['P001', 'P002', 'P003', 'P008', 'P009', 'P013']
+
+def test_ranking_prefers_exact_then_prefix_then_substring():
+    index = NameIndex(NAMES, KEYS)
+    assert [m.key for m in index.search('sunrise', k=2)] == ['P013', 'P001']
+    assert [m.kind for m in index.search('sunrise', k=2)] == ['exact', 'prefix']
+    assert [m.key for m in index.search('studio', k=5)] == ['P003', 'P008']
+
+def test_typo_tolerant_match():
+    index = NameIndex(NAMES, KEYS)
+    matches = index.search('Riverfrnt Vila')
+    assert matches[0].key == 'P009'
+    assert matches[0].kind == 'fuzzy'
+    assert index.search('zzzzqqqq') == []
+
+def test_first_match_compatibility_mode():
+    index = NameIndex(NAMES, KEYS)
+    assert index.first_match('villa') == 'P002'
+    assert index.first_match('Sunrise') == 'P001'
+    assert index.first_match('no such place') is None
+
+def test_property_helper_name_lookup():
+    helper = PropertyHelper()
+    assert helper.get_property_by_name('sunrise apartments')['listing_id'] == 'P001'
+    assert helper.get_property_by_name('Marina Studo')['listing_id'] == 'P003'
+    assert helper.get_property_by_name('studio', first_match=True)['listing_id'] == 'P003'
+    candidates = helper.search_properties_by_name('villa', k=3)
+    assert {prop['listing_id'] for prop, _ in candidates} == {'P002', 'P009'}
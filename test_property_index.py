@@ -0,0 +1,35 @@
+import os
+import sys
+
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+os.environ.setdefault('GROQ_API_KEY', 'test')
+
+from helpers import PropertyHelper
+
+def test_lookup_by_id_uses_index():
+    helper = PropertyHelper()
+    prop = helper.get_property_by_id('P003')
+    assert prop['property_name'] == 'Marina Studio'
+    assert prop['price'] == 95000
+    assert helper.get_property_by_id('P999') is None
+
+def test_index_matches_mask_scan():
+    helper = PropertyHelper()
+    df = helper.properties_df
+    for listing_id in df['listing_id']:
+        expected = df[df['listing_id'] == listing_id].iloc[0]
+        assert helper.get_property_by_id(listing_id).to_dict() == expected.to_dict()
+
+def test_reload_rebuilds_index(tmp_path):
+    helper = PropertyHelper()
+    df = helper.properties_df.copy()
+    df.loc[df['listing_id'] == 'P003', 'price'] = 99000
+    df = pd.concat([df, df.iloc[[0]].assign(listing_id='P100', property_name='New Listing')])
+    csv_path = tmp_path / 'properties.csv'
+    df.to_csv(csv_path, index=False)
+
+    helper.reload_properties(str(csv_path))
+    assert helper.get_property_by_id('P003')['price'] == 99000
+    assert helper.get_property_by_id('P100')['property_name'] == 'New Listing'
@@ -0,0 +1,101 @@
+import os
+import sqlite3
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmarks'))
+os.environ.setdefault('GROQ_API_KEY', 'test')
+
+from catalogue_gen import make_catalogue
+from helpers import PropertyHelper, detect_intent
+from intent import IntentExtractor
+from search_engine import SearchEngine, make_query
+from storage import SQLiteStorage
+
+def brute_force(df, query):
+    """Reference answer: pandas masks and a stable sort"""
+    mask = np.ones(len(df), dtype=bool)
+    for col, (low, high) in query.ranges.items():
+        if low is not None:
+            mask &= df[col] >= low
+        if high is not None:
+            mask &= df[col] <= high
+    for col, labels in query.categories.items():
+        mask &= df[col].str.lower().isin([label.lower() for label in labels])
+    matched = df[mask].sort_values(query.sort_by, ascending=not query.descending, kind='stable')
+    return matched['listing_id'].tolist()
+
+def test_engine_matches_brute_force():
+    df = make_catalogue(5000, seed=3)
+    engine = SearchEngine(df)
+    queries = [
+        make_query(),
+        make_query({'price': (100000, 400000)}),
+        make_query({'bedrooms': (2, 2)}, {'city': ['Dubai'], 'availability': ['Available']}),
+        make_query({'area_sqft': (1000, None), 'bathrooms': (None, 2)}, sort_by='area_sqft', descending=True),
+        make_query({'price': (None, 300000)}, {'property_type': ['Villa', 'Studio']}, sort_by='price', descending=True),
+        make_query(categories={'city': ['Atlantis']}),
+    ]
+    for query in queries:
+        expected = brute_force(df, query)
+        page = engine.search(query, page=1, page_size=7)
+        assert page.total == len(expected)
+        # Ties in the sort column may come back in any order; compare the sort keys and membership
+        got = page.results
+        want = expected[7:14]
+        values = dict(zip(df['listing_id'], df[query.sort_by]))
+        assert [values[key] for key in got] == [values[key] for key in want]
+        assert set(got) <= set(expected)
+
+def test_parser_extracts_constraints():
+    parser = IntentExtractor(SearchEngine(PropertyHelper().properties_df).vocabulary())
+    query = parser.parse("2BHK apartments in Dubai under 300k that are available")
+    assert query.ranges == {'bedrooms': (2, 2), 'price': (None, 300000)}
+    assert query.categories == {'city': ('Dubai',), 'property_type': ('Apartment',), 'availability': ('Available',)}
+
+    query = parser.parse("largest villas between 1m and 2 million with at least 4 bedrooms")
+    assert query.ranges == {'price': (1e6, 2e6), 'bedrooms': (4, None)}
+    assert (query.sort_by, query.descending) == ('area_sqft', True)
+    assert parser.parse("flats over 1000 sqft").ranges == {'area_sqft': (1000, None)}
+    query = parser.parse("apartments with between 2 and 3 bedrooms")
+    assert query.ranges == {'bedrooms': (2, 3)} and query.categories == {'property_type': ('Apartment',)}
+    assert parser.parse("villas from 1 to 2 baths").ranges == {'bathrooms': (1, 2)}
+
+def test_search_intent_and_pagination():
+    assert detect_intent("2BHK apartments in Dubai under 300k that are available") == 'search'
+    assert detect_intent("show me all properties in Pune") == 'search'
+    assert detect_intent("What is the price of P001?") == 'property_query'
+    assert detect_intent("Tell me about Marina Studio") == 'property_query'
+
+    helper = PropertyHelper()
+    query, first = helper.search_properties("properties under 400k", page_size=3)
+    assert first.total == 9
+    assert [prop['listing_id'] for prop in first.results] == ['P011', 'P003', 'P008']
+    _, second = helper.search_properties(query, page=1, page_size=3)
+    assert [prop['listing_id'] for prop in second.results] == ['P007', 'P010', 'P012']
+    assert "Say 'more'" in helper.format_search_results(query, first)
+
+def test_sqlite_search_agrees_with_memory(tmp_path):
+    df = make_catalogue(2000, seed=5)
+    storage = SQLiteStorage(str(tmp_path / 'zorever.db'))
+    storage.replace_properties(df)
+    engine = SearchEngine(df)
+    query = make_query({'bedrooms': (3, None), 'price': (None, 800000)}, {'city': ['Mumbai', 'Pune']}, descending=True)
+    memory, sql = engine.search(query, page_size=10), storage.search(query, page_size=10)
+    assert sql.total == memory.total
+    assert [row['listing_id'] for row in sql.results] == memory.results
+    assert storage.search_vocabulary()['city']['dubai'] == 'Dubai'
+
+    # Labels match ignoring case and surrounding whitespace on both backends
+    df.loc[df.index[::3], 'city'] = df['city'][::3].str.upper() + ' '
+    storage.replace_properties(df)
+    query = make_query({}, {'city': ['mumbai']})
+    memory, sql = SearchEngine(df).search(query, page_size=10), storage.search(query, page_size=10)
+    assert sql.total == memory.total == (df['city'].str.strip().str.lower() == 'mumbai').sum()
+    assert [row['listing_id'] for row in sql.results] == memory.results
+    plan = sqlite3.connect(storage.path).execute(
+        "EXPLAIN QUERY PLAN SELECT * FROM properties WHERE lower(trim(city)) IN (?)", ('mumbai',)).fetchall()
+    assert any('idx_properties_city_label' in row[-1] for row in plan)
+    storage.close()
@@ -0,0 +1,154 @@
+import asyncio
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+os.environ.setdefault('GROQ_API_KEY', 'test')
+
+from tornado.httpclient import AsyncHTTPClient, HTTPClientError
+from tornado.httpserver import HTTPServer
+from tornado.testing import bind_unused_port
+from tornado.websocket import websocket_connect
+
+from chat_engine import ChatEngine, ChatSession
+from fake_llm import FakeGroqClient
+from helpers import FAQHelper, PropertyHelper
+from llm_cache import ResponseCache
+from llm_gateway import LLMGateway
+from server import make_app
+from session_store import MemorySessionStore
+from write_behind import WriteBehindQueue
+
+class ListSink:
+    def __init__(self):
+        self.rows = []
+
+    def write_rows(self, rows):
+        self.rows.extend(rows)
+
+    def flush(self):
+        pass
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def make_engine():
+    client = FakeGroqClient(reply=lambda messages: f"Polished: {messages[-1]['content']}", first_token_delay=0.05)
+    helper = PropertyHelper(cache=ResponseCache(max_entries=0), llm=LLMGateway(client=client, max_concurrency=64),
+                            write_queue=WriteBehindQueue())
+    for name in ('bookings', 'transcripts'):
+        helper.write_queue.register_sink(name, ListSink())
+    return ChatEngine(helper, FAQHelper())
+
+def test_session_store_is_bounded_and_expires():
+    clock = FakeClock()
+    store = MemorySessionStore(max_sessions=2, ttl=10, clock=clock)
+    first, second, third = (store.add(ChatSession()) for _ in range(3))
+    assert store.get(first.session_id) is None and store.stats()['evicted'] == 1
+    clock.now = 5
+    assert store.get(second.session_id) is second
+    clock.now = 12
+    assert store.expire() == 1 and store.get(third.session_id) is None
+    assert store.get(second.session_id) is second and len(store) == 1
+
+def test_http_and_websocket_turns():
+    async def scenario():
+        sock, port = bind_unused_port()
+        engine = make_engine()
+        server = HTTPServer(make_app(engine))
+        server.add_sockets([sock])
+        base = f"http://127.0.0.1:{port}"
+        client = AsyncHTTPClient()
+
+        async def call(method, path, body=None):
+            response = await client.fetch(base + path, method=method,
+                                          body=None if body is None else json.dumps(body))
+            return json.loads(response.body)
+
+        try:
+            session_id = (await call('POST', '/api/sessions', {'name': 'Jane', 'email': 'jane@example.com'}))['session_id']
+            turn = await call('POST', f'/api/sessions/{session_id}/turns', {'message': 'What is the price of P003?'})
+            assert turn['property_id'] == 'P003' and turn['response'].startswith('Polished: ')
+            assert (await call('GET', '/api/properties/P004'))['property_name'] == 'City Center Office'
+            template = (await call('GET', '/api/properties/P004?polish=1&tier=template'))['description']
+            assert template.startswith('City Center Office')
+            with pytest.raises(HTTPClientError) as error:
+                await call('GET', '/api/properties/P004?polish=1&tier=fancy')
+            assert error.value.code == 400
+            booking = await call('POST', '/api/bookings', {'name': 'Bob', 'phone': '1', 'property': 'Marina Studio'})
+            assert booking['property_id'] == 'P003'
+            with pytest.raises(HTTPClientError) as error:
+                await call('POST', '/api/sessions/0123abc/turns', {'message': 'hi'})
+            assert error.value.code == 404
+
+            async def conversation(i):
+                ws = await websocket_connect(f"ws://127.0.0.1:{port}/ws?name=User{i}")
+                assert json.loads(await ws.read_message())['type'] == 'session'
+                await ws.write_message(json.dumps({'message': f"Tell me about P{i % 12 + 1:03d}"}))
+                tokens = []
+                while True:
+                    message = json.loads(await ws.read_message())
+                    if message['type'] == 'done':
+                        break
+                    tokens.append(message['text'])
+                ws.close()
+                return tokens, message
+
+            results = await asyncio.gather(*(conversation(i) for i in range(20)))
+            for tokens, done in results:
+                assert len(tokens) > 1 and ''.join(tokens) == done['response']
+            health = await call('GET', '/health')
+            assert health['sessions'] == 21
+        finally:
+            server.stop()
+
+    asyncio.run(scenario())
+
+def test_concurrent_turns_for_one_session_run_one_at_a_time():
+    async def scenario():
+        sock, port = bind_unused_port()
+        engine = make_engine()
+        server = HTTPServer(make_app(engine))
+        server.add_sockets([sock])
+        base = f"http://127.0.0.1:{port}/api/sessions"
+        client = AsyncHTTPClient()
+
+        async def call(path, body):
+            response = await client.fetch(base + path, method='POST', body=json.dumps(body))
+            return json.loads(response.body)
+
+        try:
+            session_id = (await call('', {'name': 'Jane'}))['session_id']
+            questions = [f"What is the price of P00{i}?" for i in range(1, 7)]
+
+            async def socket_turn(question):
+                ws = await websocket_connect(f"ws://127.0.0.1:{port}/ws?session_id={session_id}")
+                assert json.loads(await ws.read_message())['session_id'] == session_id
+                await ws.write_message(json.dumps({'message': question}))
+                while True:
+                    message = json.loads(await ws.read_message())
+                    if message['type'] == 'done':
+                        ws.close()
+                        return message
+
+            turns = await asyncio.gather(*(call(f'/{session_id}/turns', {'message': q}) for q in questions[:5]),
+                                         socket_turn(questions[5]))
+            assert [turn['property_id'] for turn in turns] == [f"P00{i}" for i in range(1, 7)]
+            messages = list(engine.sessions.get(session_id).messages)
+            pairs = [(question.content, answer.content) for question, answer in zip(messages[::2], messages[1::2])]
+            assert [message.role for message in messages] == ['user', 'assistant'] * 6
+            assert sorted(pairs) == sorted(zip(questions, (turn['response'] for turn in turns)))
+            with pytest.raises(HTTPClientError) as error:
+                await client.fetch(f"http://127.0.0.1:{port}/api/properties?q=marina&k=abc")
+            assert error.value.code == 400
+        finally:
+            server.stop()
+
+    asyncio.run(scenario())
@@ -0,0 +1,78 @@
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+os.environ.setdefault('GROQ_API_KEY', 'test')
+
+from chat_engine import ChatEngine, ChatSession
+from helpers import FAQHelper, PropertyHelper
+from llm_cache import ResponseCache
+from metrics import Metrics
+from session_store import MemorySessionStore, SQLiteSessionStore
+from write_behind import WriteBehindQueue
+
+class ListSink:
+    def __init__(self):
+        self.rows = []
+
+    def write_rows(self, rows):
+        self.rows.extend(rows)
+
+    def flush(self):
+        pass
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+def make_engine(sessions):
+    helper = PropertyHelper(cache=ResponseCache(max_entries=0), write_queue=WriteBehindQueue())
+    sinks = {'bookings': ListSink(), 'transcripts': ListSink()}
+    for name, sink in sinks.items():
+        helper.write_queue.register_sink(name, sink)
+    return ChatEngine(helper, FAQHelper(), sessions=sessions), sinks
+
+def test_memory_store_accounts_bytes():
+    store = MemorySessionStore(max_sessions=2)
+    registry = Metrics()
+    store.register_gauges(registry)
+    sessions = [store.add(ChatSession({'name': f"User {i}"}, history_size=4)) for i in range(2)]
+    empty = store.nbytes
+    for i in range(10):
+        sessions[0].messages.append({'role': 'user', 'content': 'x' * 1000})
+    store.save(sessions[0])
+    assert 4000 < store.nbytes - empty < 5000  # only the 4 retained messages count
+    store.add(ChatSession())  # evicts sessions[1]
+    store.delete(sessions[0].session_id)
+    assert len(store) == 1 and 0 < store.nbytes < empty
+    assert "zorever_sessions_live 1" in registry.render_prometheus()
+    assert registry.gauges()[('sessions_bytes', ())] == store.nbytes
+
+def test_booking_survives_a_restart(tmp_path):
+    path = str(tmp_path / 'sessions.sqlite')
+    clock = FakeClock()
+    first_store = SQLiteSessionStore(path, ttl=60, clock=clock)
+    engine, _ = make_engine(first_store)
+    session = engine.new_session({'name': 'Jane Doe', 'email': 'jane@example.com'})
+    for prompt in ["Show me all properties", "I want to book a visit", "Jane Doe", "555-0100"]:
+        engine.handle_turn(session, prompt)
+    assert session.booking_state == 'waiting_property'
+
+    # A new process (or another worker) finds the session where it was left, minus its messages
+    engine, sinks = make_engine(SQLiteSessionStore(path, ttl=60, clock=clock))
+    restored = engine.session(session.session_id)
+    assert restored is not None and restored is not session and len(restored.messages) == 0
+    assert (restored.booking_state, restored.booking_data) == ('waiting_property', {'name': 'Jane Doe', 'phone': '555-0100'})
+    assert restored.user_info['email'] == 'jane@example.com' and restored.last_search == session.last_search
+    result = engine.handle_turn(restored, "Marina Studio")
+    assert result.property_id == 'P003' and restored.booking_state is None
+    assert engine.handle_turn(restored, "more").kind == 'more'
+
+    # The first store's copy is stale now and is refreshed on its next lookup
+    assert first_store.get(session.session_id) is session
+    assert session.booking_state is None and session.last_search[1] == 1 and len(session.messages) == 8
+    clock.now += 61
+    assert first_store.get(session.session_id) is None and first_store.stats()['persisted'] == 0
@@ -0,0 +1,31 @@
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+os.environ.setdefault('GROQ_API_KEY', 'test')
+
+from startup import BackgroundLoader, StartupTimer
+
+def test_background_loader_returns_or_reraises():
+    release = threading.Event()
+    timer = StartupTimer()
+
+    def load():
+        with timer.phase('catalogue'):
+            release.wait(5)
+        return 'helpers'
+
+    loader = BackgroundLoader(load)
+    assert not loader.ready()  # the caller gets control back while loading
+    release.set()
+    assert loader.result(timeout=5) == 'helpers'
+    assert [name for name, _ in timer.phases] == ['catalogue']
+    assert timer.report().startswith('Startup: catalogue ')
+
+    failing = BackgroundLoader(lambda: 1 / 0)
+    with pytest.raises(ZeroDivisionError):
+        failing.result(timeout=5)
+    assert failing.failed()
@@ -0,0 +1,86 @@
+import csv
+import os
+import sqlite3
+import sys
+
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+os.environ.setdefault('GROQ_API_KEY', 'test')
+
+from helpers import PropertyHelper
+from migrate_to_sqlite import migrate
+from storage import SQLiteStorage
+from transcript import BOOKING_FIELDS, TRANSCRIPT_FIELDS
+from write_behind import WriteBehindQueue
+
+def write_mixed_visits(path):
+    """A visits.csv with both layouts, like the app produced before the split"""
+    with open(path, 'w', newline='', encoding='utf-8') as file:
+        writer = csv.writer(file)
+        writer.writerow(TRANSCRIPT_FIELDS)
+        writer.writerow(['2025-08-29 22:11:00', 'P003', 'Marina Studio', 'Sushant', 's@x.com', '801',
+                         'What is the price of P003?', 'Marina Studio — Studio\nPrice: 95,000 USD.'])
+        writer.writerow(['2025-08-29 22:12:00', 'P003', 'Marina Studio', 'Sushant', '801',
+                         'Visit booking for Marina Studio'])
+
+def test_migration_splits_visits_and_builds_indexes(tmp_path):
+    visits = str(tmp_path / 'visits.csv')
+    write_mixed_visits(visits)
+    db = str(tmp_path / 'zorever.db')
+    counts = migrate(db, visits_path=visits)
+    assert counts == {'properties': 12, 'transcripts': 1, 'bookings': 1, 'skipped': 0}
+
+    conn = sqlite3.connect(db)
+    assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+    indexed = {row[4] for row in conn.execute("SELECT * FROM sqlite_master WHERE type = 'index'")}
+    assert any('ON properties(lower(trim(city)))' in sql for sql in indexed if sql)
+    assert any('ON transcripts(timestamp)' in sql for sql in indexed if sql)
+    assert conn.execute('SELECT user_message FROM bookings').fetchone()[0] == 'Visit booking for Marina Studio'
+    assert 'Price: 95,000' in conn.execute('SELECT bot_response FROM transcripts').fetchone()[0]
+
+def test_property_helper_queries_sqlite_without_dataframe(tmp_path):
+    db = str(tmp_path / 'zorever.db')
+    migrate(db, visits_path=str(tmp_path / 'missing.csv'))
+    helper = PropertyHelper(storage=SQLiteStorage(db), write_queue=WriteBehindQueue())
+    assert helper.properties_df is None
+    assert helper.get_property_by_id('P003')['price'] == 95000
+    assert helper.get_property_by_id('P999') is None
+    assert helper.get_property_by_name('sunrise apartments')['listing_id'] == 'P001'
+    assert helper.get_property_by_name('studio', first_match=True)['listing_id'] == 'P003'
+    assert [match.kind for _, match in helper.search_properties_by_name('villa', k=2)] == ['word', 'word']
+    assert 'Marina Studio' in helper.render_template(helper.get_property_by_id('P003'))
+
+def test_bookings_and_transcripts_land_in_separate_tables(tmp_path):
+    db = str(tmp_path / 'zorever.db')
+    storage = SQLiteStorage(db)
+    write_queue = WriteBehindQueue()
+    helper = PropertyHelper(storage=storage, write_queue=write_queue)
+    helper.save_visit_booking('Jane', '555', 'P003', 'Marina Studio', 'Visit booking for Marina Studio')
+    write_queue.submit('transcripts', dict.fromkeys(TRANSCRIPT_FIELDS, 'x'))
+    write_queue.close()
+
+    conn = sqlite3.connect(db)
+    assert conn.execute('SELECT name, listing_id FROM bookings').fetchall() == [('Jane', 'P003')]
+    assert conn.execute('SELECT COUNT(*) FROM transcripts').fetchone()[0] == 1
+    assert set(BOOKING_FIELDS) <= {row[1] for row in conn.execute('PRAGMA table_info(bookings)')}
+
+def test_remigration_removes_rows_and_reload_applies_the_csv(tmp_path):
+    db = str(tmp_path / 'zorever.db')
+    csv_path = tmp_path / 'properties.csv'
+    df = pd.read_csv(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'properties.csv'))
+    df.to_csv(csv_path, index=False)
+    migrate(db, properties_path=str(csv_path), visits_path=str(tmp_path / 'missing.csv'))
+    df[df['listing_id'] != 'P003'].to_csv(csv_path, index=False)
+    migrate(db, properties_path=str(csv_path), visits_path=str(tmp_path / 'missing.csv'))
+    storage = SQLiteStorage(db, properties_path=str(csv_path))
+    assert len(storage) == 11 and storage.get('P003') is None
+
+    helper = PropertyHelper(storage=storage, write_queue=WriteBehindQueue())
+    edited = df.copy()
+    edited.loc[edited['listing_id'] == 'P001', 'city'] = 'Lisbon'
+    edited[edited['listing_id'] != 'P002'].to_csv(csv_path, index=False)
+    delta = helper.reload_properties()
+    assert delta == {'added': ['P003'], 'changed': ['P001'], 'removed': ['P002']}
+    assert helper.get_property_by_id('P002') is None and helper.get_property_by_id('P003') is not None
+    assert helper.extract("villas in Lisbon").categories['city'] == ('Lisbon',)
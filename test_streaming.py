@@ -0,0 +1,75 @@
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+os.environ.setdefault('GROQ_API_KEY', 'test')
+
+from fake_llm import FakeGroqClient
+from helpers import PropertyHelper
+from llm_cache import ResponseCache
+from llm_gateway import LLMGateway
+
+def make_helper(client):
+    return PropertyHelper(cache=ResponseCache(), llm=LLMGateway(client=client, retries=0))
+
+def test_first_token_arrives_before_full_completion():
+    helper = make_helper(FakeGroqClient(first_token_delay=0.01, chunk_delay=0.01))
+    prop = helper.get_property_by_id('P001')
+
+    start = time.perf_counter()
+    stream = helper.stream_property_details(prop)
+    first = next(stream)
+    ttft = time.perf_counter() - start
+    text = first + ''.join(stream)
+    total = time.perf_counter() - start
+
+    assert text.startswith('Here are the details: Sunrise Apartments')
+    assert ttft < total / 5
+
+def test_streamed_text_matches_blocking_and_is_cached():
+    client = FakeGroqClient()
+    helper = make_helper(client)
+    prop = helper.get_property_by_id('P002')
+    streamed = ''.join(helper.stream_property_details(prop))
+    assert client.calls == 1
+    assert helper.format_property_details(prop) == streamed
+    assert list(helper.stream_property_details(prop)) == [streamed]
+    assert client.calls == 1
+
+def test_stream_falls_back_to_template_on_error():
+    helper = make_helper(FakeGroqClient(error=RuntimeError('upstream down')))
+    prop = helper.get_property_by_id('P003')
+    assert ''.join(helper.stream_property_details(prop)) == helper.render_template(prop)
+
+def test_render_tiers_and_latency_budget():
+    client = FakeGroqClient(first_token_delay=0.02)
+    helper = make_helper(client)
+    prop = helper.get_property_by_id('P004')
+    template = helper.listing_template(prop)
+    assert template == helper.render_template(prop) and helper.listing_template(prop) is template
+    assert helper.format_property_details(prop, tier='template') == template
+    assert client.calls == 0
+
+    # A cache miss at the cached tier answers with the template and polishes in the background
+    assert helper.format_property_details(prop, tier='cached') == template
+    deadline = time.monotonic() + 2
+    while helper.format_property_details(prop, tier='cached') == template and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert helper.format_property_details(prop, tier='cached').startswith('Here are the details:')
+    assert client.calls == 1
+
+    # Once the recent p95 of live polishing exceeds the budget, uncached listings get their template
+    other = helper.get_property_by_id('P005')
+    for _ in range(20):
+        helper.polish_latency['complete'].record(0.5)
+    assert helper.choose_tier(budget=0.1) == 'cached' and helper.choose_tier(budget=1.0) == 'llm'
+    assert helper.format_property_details(other, budget=0.1) == helper.render_template(other)
+    assert helper.choose_tier(budget=0.1, mode='stream') == 'llm'  # judged by the first token, not yet measured
+
+    # A reload drops the rendered templates of changed rows only
+    df = helper.properties_df.copy()
+    df.loc[df['listing_id'] == 'P004', 'price'] = 1
+    helper.set_properties(df)
+    assert 'Price: 1 ' in helper.listing_template(helper.get_property_by_id('P004'))
+    assert helper._templates.keys() <= {'P004', 'P005'} and 'P005' in helper._templates
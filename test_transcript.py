@@ -0,0 +1,62 @@
+import csv
+import multiprocessing
+import os
+import sys
+import threading
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+
+from transcript import TRANSCRIPT_FIELDS, TranscriptWriter
+
+def make_row(writer_id, i):
+    return {
+        'timestamp': '2025-01-01 00:00:00', 'listing_id': 'P001', 'property_name': 'Sunrise Apartments',
+        'name': f"user{writer_id}", 'email': 'a@b.com', 'phone': '1', 'user_query': f"query {i}",
+        'bot_response': f"line one\nline two, {i}"
+    }
+
+def write_from_process(path, writer_id, count):
+    writer = TranscriptWriter(path, batch_size=7, flush_interval=0)
+    for i in range(count):
+        writer.write(make_row(writer_id, i))
+    writer.close()
+
+def read_rows(path):
+    with open(path, newline='', encoding='utf-8') as file:
+        return list(csv.DictReader(file))
+
+def test_batches_and_writes_header_once(tmp_path):
+    path = str(tmp_path / 'visits.csv')
+    writer = TranscriptWriter(path, batch_size=3, flush_interval=0)
+    writer.write(make_row(0, 0))
+    writer.write(make_row(0, 1))
+    assert not os.path.exists(path)
+    writer.write(make_row(0, 2))
+    assert len(read_rows(path)) == 3
+    writer.write(make_row(0, 3))
+    writer.close()
+    rows = read_rows(path)
+    assert [row['user_query'] for row in rows] == [f"query {i}" for i in range(4)]
+    assert list(rows[0].keys()) == TRANSCRIPT_FIELDS
+
+def test_concurrent_threads_lose_no_rows(tmp_path):
+    path = str(tmp_path / 'visits.csv')
+    writer = TranscriptWriter(path, batch_size=5, flush_interval=0.01)
+    threads = [threading.Thread(target=lambda n=n: [writer.write(make_row(n, i)) for i in range(200)]) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    writer.close()
+    assert len(read_rows(path)) == 1600
+
+def test_concurrent_processes_lose_no_rows(tmp_path):
+    path = str(tmp_path / 'visits.csv')
+    processes = [multiprocessing.Process(target=write_from_process, args=(path, n, 150)) for n in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    rows = read_rows(path)
+    assert len(rows) == 600
+    assert sum(1 for row in rows if row['name'] == 'user3') == 150
@@ -0,0 +1,109 @@
+import os
+import sys
+import threading
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+os.environ.setdefault('GROQ_API_KEY', 'test')
+
+from helpers import PropertyHelper
+from write_behind import WriteBehindQueue
+
+class ListSink:
+    """Collects committed batches; optionally blocks until released"""
+    def __init__(self, delay=0.0, gate=None):
+        self.batches = []
+        self.flushes = 0
+        self.delay = delay
+        self.gate = gate
+
+    def write_rows(self, rows):
+        if self.gate is not None:
+            self.gate.wait()
+        time.sleep(self.delay)
+        self.batches.append(list(rows))
+
+    def flush(self):
+        self.flushes += 1
+
+    @property
+    def rows(self):
+        return [row for batch in self.batches for row in batch]
+
+def test_submit_does_not_wait_for_io_and_commits_in_batches():
+    write_queue = WriteBehindQueue(batch_size=50, flush_interval=0.05)
+    sink = ListSink(delay=0.05)
+    write_queue.register_sink('transcripts', sink)
+    start = time.perf_counter()
+    for i in range(100):
+        write_queue.submit('transcripts', {'i': i})
+    assert time.perf_counter() - start < 0.05
+    write_queue.flush()
+    assert [row['i'] for row in sink.rows] == list(range(100))
+    assert len(sink.batches) < 100
+    assert sink.flushes == len(sink.batches)
+    assert write_queue.metrics()['written'] == 100
+    write_queue.close()
+
+def test_depth_and_lag_metrics():
+    gate = threading.Event()
+    write_queue = WriteBehindQueue(batch_size=1, flush_interval=0)
+    write_queue.register_sink('bookings', ListSink(gate=gate))
+    for i in range(5):
+        write_queue.submit('bookings', {'i': i})
+    time.sleep(0.05)
+    metrics = write_queue.metrics()
+    assert metrics['depth'] >= 3
+    assert metrics['lag_seconds'] > 0
+    gate.set()
+    write_queue.flush()
+    assert write_queue.metrics()['depth'] == 0
+    write_queue.close()
+
+def test_full_queue_drop_policy():
+    gate = threading.Event()
+    write_queue = WriteBehindQueue(maxsize=2, batch_size=1, flush_interval=0, policy='drop')
+    sink = ListSink(gate=gate)
+    write_queue.register_sink('transcripts', sink)
+    results = [write_queue.submit('transcripts', {'i': i}) for i in range(10)]
+    gate.set()
+    write_queue.flush()
+    assert results.count(False) == write_queue.metrics()['dropped'] > 0
+    assert len(sink.rows) == results.count(True)
+    write_queue.close()
+
+def test_full_queue_spill_policy_and_replay(tmp_path):
+    gate = threading.Event()
+    spill_path = str(tmp_path / 'spill.jsonl')
+    write_queue = WriteBehindQueue(maxsize=2, batch_size=1, flush_interval=0, policy='spill', spill_path=spill_path)
+    sink = ListSink(gate=gate)
+    write_queue.register_sink('transcripts', sink)
+    for i in range(10):
+        write_queue.submit('transcripts', {'i': i})
+    assert write_queue.metrics()['spilled'] > 0
+    gate.set()
+    write_queue.flush()
+    write_queue.replay_spill()
+    write_queue.flush()
+    assert sorted(row['i'] for row in sink.rows) == list(range(10))
+    write_queue.close()
+
+def test_close_drains_pending_rows():
+    write_queue = WriteBehindQueue(batch_size=10, flush_interval=1.0)
+    sink = ListSink()
+    write_queue.register_sink('transcripts', sink)
+    for i in range(25):
+        write_queue.submit('transcripts', {'i': i})
+    write_queue.close()
+    assert len(sink.rows) == 25
+
+def test_bookings_go_through_the_queue():
+    write_queue = WriteBehindQueue()
+    helper = PropertyHelper(write_queue=write_queue)
+    sink = ListSink()
+    write_queue.register_sink('bookings', sink)
+    helper.save_visit_booking('Jane', '555', 'P003', 'Marina Studio', 'Visit booking for Marina Studio')
+    write_queue.flush()
+    assert sink.rows[0]['listing_id'] == 'P003'
+    assert sink.rows[0]['name'] == 'Jane'
+    write_queue.close()